@@ -0,0 +1,115 @@
+"""
+Benchmark the GraphQL payloads of a cold issue crawl from the mock API (see `mock_server.py`): history pages with the labels of
+every item (as fetched before `GitMetrics.sync_open_labels`), against history pages without labels and a separate query for the
+labels of open items only. Reports the number of requests, response bytes, JSON decode time of the responses and cache size
+(as written, and once compacted by 'VACUUM', as updating labels in place leaves partly filled pages).
+
+Run with
+
+    python benchmarks/bench_issue_payloads.py [--n-items 33000]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+
+from mock_server import MockAPIServer
+from synthetic import issue_PR_nodes, synthetic_issues_PRs
+
+from repo_stats.git_metrics import GitMetrics
+
+# issue and pull request fields of history pages with labels
+FIELDS_WITH_LABELS = GitMetrics.issue_PR_fields + """
+                            labels(first: 25) {
+                                edges {
+                                    node {
+                                        name
+                                    }
+                                }
+                            }
+    """
+
+
+def crawl(server, labels_in_history):
+    """Cold crawl of the mock API's issues, returning the response contents and the cache size (bytes), as written and compacted"""
+    Gits = GitMetrics("token", "owner", "repo", tempfile.mkdtemp())
+    Gits.graphql_url = f"{server.url}/graphql"
+    columns = GitMetrics.issue_PR_columns
+    if labels_in_history:
+        Gits.issue_PR_fields = FIELDS_WITH_LABELS
+        Gits.issue_PR_nested = [(25, [])]
+        # labels are cached from the history pages, rather than synced for open items
+        columns = [cc for cc in columns if cc != "labels"]
+
+    contents = []
+    post = Gits.client.post
+
+    def capture(url, **kwargs):
+        response = post(url, **kwargs)
+        contents.append(response.content)
+        return response
+
+    Gits.client.post = capture
+    Gits.get_issues_PRs("issues", columns)
+
+    cache_size = os.path.getsize(Gits.cache.cache_file)
+    with closing(sqlite3.connect(Gits.cache.cache_file)) as conn:
+        conn.execute("VACUUM")
+
+    return contents, (cache_size, os.path.getsize(Gits.cache.cache_file))
+
+
+def decode_time(contents, repeat=20):
+    """Best time (s) to decode all response 'contents' as JSON"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for cc in contents:
+            json.loads(cc)
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n-items", type=int, default=33000)
+    args = parser.parse_args()
+
+    items = synthetic_issues_PRs(args.n_items)
+    n_open = int((items["state"] == "OPEN").sum())
+    nodes = {"commits": [], "issues": issue_PR_nodes(items), "pullRequests": []}
+
+    results = []
+    with MockAPIServer(repos={("owner", "repo"): nodes}) as server:
+        for name, labels_in_history in [
+            ("labels in history", True),
+            ("open labels only", False),
+        ]:
+            contents, cache_size = crawl(server, labels_in_history)
+            results.append(
+                (
+                    name,
+                    len(contents),
+                    sum(len(cc) for cc in contents),
+                    decode_time(contents),
+                    cache_size,
+                )
+            )
+
+    print(f"\n{args.n_items - n_open} closed and {n_open} open issues")
+    print(
+        f"\n{'strategy':>20} {'requests':>10} {'response (MB)':>14} {'decode (ms)':>12} {'cache (MB)':>11} {'compacted (MB)':>15}"
+    )
+    for name, n_requests, n_bytes, decode, (cache_size, compacted) in results:
+        print(
+            f"{name:>20} {n_requests:>10} {n_bytes / 1e6:>14.2f} {decode * 1e3:>12.1f} {cache_size / 1e6:>11.2f} {compacted / 1e6:>15.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
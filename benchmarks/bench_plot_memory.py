@@ -0,0 +1,76 @@
+"""
+Benchmark memory use of repeatedly rendering a figure (`plot.author_time_plot`), with a new figure per render
+and with one figure reused across renders. Resident memory (RSS) should stay flat as renders accumulate.
+
+Run with
+
+    python benchmarks/bench_plot_memory.py [--renders 1000] [--every 100] [--modes new reuse]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from synthetic import synthetic_commits
+
+from repo_stats.git_metrics import GitMetrics
+from repo_stats.instrument import peak_rss
+from repo_stats.plot import author_time_plot
+
+
+def rss_mb():
+    """Current resident memory of this process in MB (peak resident memory where /proc isn't available, None if neither is)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        return peak_rss()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--renders", type=int, default=1000)
+    parser.add_argument("--every", type=int, default=100)
+    parser.add_argument("--modes", nargs="+", default=["new", "reuse"])
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp()
+    Gits = GitMetrics("", "owner", "repo", cache_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = Gits.process_commits(synthetic_commits(10**4))
+
+    for mode in args.modes:
+        fig = None
+        rss = []
+        start = time.perf_counter()
+        for ii in range(args.renders + 1):
+            with contextlib.redirect_stdout(io.StringIO()):
+                out = author_time_plot(
+                    stats,
+                    "owner",
+                    "repo",
+                    cache_dir,
+                    fig=fig if mode == "reuse" else None,
+                )
+            if mode == "reuse":
+                fig = out
+            if ii % args.every == 0:
+                rss.append((ii, rss_mb()))
+        tt = time.perf_counter() - start
+
+        print(f"\n{mode} figure per render ({tt / (args.renders + 1):.3f} s / render)")
+        print(f"{'renders':>10} {'RSS (MB)':>10}")
+        for nn, mm in rss:
+            print(f"{nn:>10} {'n/a' if mm is None else f'{mm:.1f}':>10}")
+        if None not in (rss[1][1], rss[-1][1]):
+            # growth after the first renders (which load fonts, caches, etc.)
+            print(
+                f"RSS growth from render {rss[1][0]}: {rss[-1][1] - rss[1][1]:+.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
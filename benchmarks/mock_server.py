@@ -0,0 +1,320 @@
+"""
+Local mock of the GitHub GraphQL and ADS search APIs, serving synthetic histories (see `synthetic.py`) over HTTP,
+so that fetching can be benchmarked offline and without rate limits.
+"""
+
+import bisect
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class MockAPIServer:
+    def __init__(self, repos=None, citations=None, latency=0):
+        """
+        Serve the GitHub GraphQL API at '{url}/graphql' and the ADS search API at '{url}/search/query' from a local thread.
+        Supports the queries sent by `GitMetrics` (commit history and issue and pull request connections, with cursors, '@include'
+        and ordering by update time; commit history since or until a time, and counts of an author's commits; and issue and pull
+        request searches by creation or closing time, with counts and at most 1000 results) and `ADSCitations` (pages of citations,
+        and counts of citing papers). Use as a context manager.
+
+        Arguments
+        ---------
+        repos : dict, default=None
+            For each repository as (owner, name), a dict of GraphQL nodes for 'commits' (newest first), 'issues' and 'pullRequests'
+            (oldest first) (see `synthetic.commit_nodes` and `synthetic.issue_PR_nodes`)
+        citations : dict, default=None
+            For each cited bibcode, a list of citation docs (see `synthetic.synthetic_citations`)
+        latency : float, default=0
+            Seconds to wait before each response, to simulate network latency
+        """
+        self.repos = {} if repos is None else repos
+        self.citations = {} if citations is None else citations
+        self.latency = latency
+        self.n_requests = 0
+        self._lock = threading.Lock()
+
+        # items in order of most recently updated, for syncs
+        self._by_updated = {}
+        # creation time (s) of items, for searches
+        self._created = {}
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                server.respond(self, server.graphql(body["query"], body["variables"]))
+
+            def do_GET(self):
+                server.respond(self, server.search(parse_qs(urlparse(self.path).query)))
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def respond(self, handler, data):
+        """Send 'data' as a JSON response with rate limit headers"""
+        with self._lock:
+            self.n_requests += 1
+            n_requests = self.n_requests
+        if self.latency:
+            time.sleep(self.latency)
+
+        content = json.dumps(data).encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(content)))
+        handler.send_header("X-RateLimit-Limit", "1000000")
+        handler.send_header("X-RateLimit-Remaining", str(1000000 - n_requests))
+        handler.send_header("X-RateLimit-Used", str(n_requests))
+        handler.send_header("X-RateLimit-Reset", str(int(time.time()) + 3600))
+        handler.end_headers()
+        handler.wfile.write(content)
+
+    @staticmethod
+    def _project(nodes, query):
+        """
+        Issue or pull request 'nodes' with only the fields selected by 'query', so responses are the size of the API's
+        (e.g. without labels, unless queried; and with labels as 'nodes' rather than 'edges' if queried so)
+        """
+        fields = (
+            [kk for kk in nodes[0] if re.search(rf"\b{kk}\b", query)] if nodes else []
+        )
+        if "labels" not in fields:
+            return [{kk: x[kk] for kk in fields} for x in nodes]
+
+        labels_as_nodes = re.search(r"labels\([^)]*\)\s*{\s*nodes", query) is not None
+        projected = []
+        for x in nodes:
+            node = {kk: x[kk] for kk in fields}
+            if labels_as_nodes:
+                node["labels"] = {"nodes": [ll["node"] for ll in x["labels"]["edges"]]}
+            projected.append(node)
+
+        return projected
+
+    @staticmethod
+    def _page(nodes, arguments, variables, as_nodes=False):
+        """
+        A page of a GraphQL connection over 'nodes', for the connection's 'arguments' (e.g. 'first: 100, after: $after'),
+        with the nodes under 'nodes' if 'as_nodes', otherwise under 'edges'
+        """
+        first = re.search(r"first:\s*(\$?\w+)", arguments).group(1)
+        first = int(variables[first[1:]] if first.startswith("$") else first)
+        after = re.search(r"after:\s*\$(\w+)", arguments)
+        after = variables.get(after.group(1)) if after else None
+
+        # cursors are indices
+        start = int(after) if after else 0
+        end = min(start + first, len(nodes))
+
+        page = {
+            "totalCount": len(nodes),
+            "pageInfo": {"hasNextPage": end < len(nodes), "endCursor": str(end)},
+        }
+        if as_nodes:
+            page["nodes"] = nodes[start:end]
+        else:
+            page["edges"] = [{"node": x} for x in nodes[start:end]]
+
+        return page
+
+    @staticmethod
+    def _commits(nodes, arguments, variables):
+        """Commit 'nodes' matching the history 'arguments' (e.g. 'since: $since' or 'author: {id: "U_1"}'), with 'variables'"""
+        since = re.search(r"since:\s*\$(\w+)", arguments)
+        if since:
+            nodes = [x for x in nodes if x["authoredDate"] >= variables[since.group(1)]]
+        until = re.search(r"until:\s*\$(\w+)", arguments)
+        if until:
+            nodes = [x for x in nodes if x["authoredDate"] <= variables[until.group(1)]]
+
+        author = re.search(r"author:\s*{\s*(id|emails):\s*([^}]*)}", arguments)
+        if author and author.group(1) == "id":
+            # user node IDs are 'U_' and the user's database ID
+            user_id = int(json.loads(author.group(2))[2:])
+            nodes = [
+                x
+                for x in nodes
+                if (x["author"]["user"] or {}).get("databaseId") == user_id
+            ]
+        elif author:
+            emails = json.loads(author.group(2))
+            nodes = [x for x in nodes if x["author"]["email"] in emails]
+
+        return nodes
+
+    def graphql(self, query, variables):
+        """Respond to a GraphQL 'query' with 'variables'"""
+        if re.search(r"\bsearch\(", query):
+            return self.graphql_search(query, variables)
+
+        repo = self.repos[(variables["owner"], variables["name"])]
+        data = {}
+
+        history = re.search(r"history\(([^)]*)\)", query)
+        aliases = re.findall(r"(\w+):\s*history\(([^)]*)\)", query)
+        if aliases:
+            # counts of commits (see `GitMetrics.count_recent_authors`)
+            data["branch"] = {
+                "target": {
+                    alias: {
+                        "totalCount": len(
+                            self._commits(repo["commits"], arguments, variables)
+                        )
+                    }
+                    for alias, arguments in aliases
+                }
+            }
+        elif history and variables.get("include_commits", True):
+            page = self._page(
+                self._commits(repo["commits"], history.group(1), variables),
+                history.group(1),
+                variables,
+            )
+            if re.search(r"user\s*{\s*id\s*}", query):
+                # users by node ID rather than database ID
+                for edge in page["edges"]:
+                    user = edge["node"]["author"]["user"]
+                    user = None if user is None else {"id": f"U_{user['databaseId']}"}
+                    edge["node"] = {
+                        **edge["node"],
+                        "author": {**edge["node"]["author"], "user": user},
+                    }
+            data["branch"] = {"target": {"history": page}}
+
+        for item_type in ["issues", "pullRequests"]:
+            connection = re.search(rf"\b{item_type}\(([^)]*)\)", query)
+            if not connection or not variables.get(f"include_{item_type}", True):
+                continue
+
+            nodes = repo[item_type]
+            if "UPDATED_AT" in connection.group(1):
+                key = (variables["owner"], variables["name"], item_type)
+                if key not in self._by_updated:
+                    self._by_updated[key] = sorted(
+                        nodes, key=lambda x: x["updatedAt"], reverse=True
+                    )
+                nodes = self._by_updated[key]
+            if "states: OPEN" in connection.group(1):
+                nodes = [x for x in nodes if x["state"] == "OPEN"]
+
+            page = self._page(
+                nodes, connection.group(1), variables, as_nodes="edges" not in query
+            )
+            items = (
+                page["nodes"] if "nodes" in page else [x["node"] for x in page["edges"]]
+            )
+            items = self._project(items, query)
+            if "nodes" in page:
+                page["nodes"] = items
+            else:
+                page["edges"] = [{"node": x} for x in items]
+            data[item_type] = page
+
+        result = {"repository": data}
+        if re.search(r"\brateLimit\b", query):
+            # consistent with the rate limit headers (see `MockAPIServer.respond`), counting each query as 1 point
+            result["rateLimit"] = {
+                "cost": 1,
+                "remaining": 1000000 - self.n_requests - 1,
+                "resetAt": datetime.fromtimestamp(
+                    time.time() + 3600, tz=timezone.utc
+                ).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }
+
+        return {"data": result}
+
+    def graphql_search(self, query, variables):
+        """Respond to a GraphQL 'query' of (optionally aliased) issue and pull request searches, with 'variables'"""
+        data = {}
+        for alias, arguments in re.findall(r"(?:(\w+):\s*)?search\(([^)]*)\)", query):
+            search = re.search(r'query:\s*("(?:[^"\\]|\\.)*"|\$\w+)', arguments).group(
+                1
+            )
+            search = (
+                variables[search[1:]] if search.startswith("$") else json.loads(search)
+            )
+
+            # e.g. "repo:owner/name is:issue created:2024-01-01T00:00:00+00:00..2024-02-01T00:00:00+00:00 sort:created-asc",
+            # or "repo:owner/name is:pr closed:>=2024-01-01"
+            owner, name = re.search(r"repo:(\S+)/(\S+)", search).groups()
+            item_type = "issues" if "is:issue" in search else "pullRequests"
+            nodes = self.repos[(owner, name)][item_type]
+
+            created = re.search(r"created:(\S+)\.\.(\S+)", search)
+            if created:
+                start, end = (
+                    datetime.fromisoformat(x).timestamp() for x in created.groups()
+                )
+                key = (owner, name, item_type)
+                if key not in self._created:
+                    # items are oldest first
+                    self._created[key] = [
+                        datetime.fromisoformat(x["createdAt"]).timestamp()
+                        for x in nodes
+                    ]
+                created = self._created[key]
+                found = nodes[
+                    bisect.bisect_left(created, start) : bisect.bisect_right(
+                        created, end
+                    )
+                ]
+            else:
+                field, since = re.search(r"(created|closed):>=(\S+)", search).groups()
+                found = [x for x in nodes if (x[f"{field}At"] or "") >= since]
+
+            # a search returns at most 1000 results
+            page = self._page(self._project(found[:1000], query), arguments, variables)
+            data[alias or "search"] = {"issueCount": len(found), **page}
+
+        return {"data": data}
+
+    def search(self, params):
+        """
+        Respond to an ADS search query with parameters 'params': citations of one or more papers (e.g.
+        'citations(a) OR citations(b)', each citing paper once), optionally filtered by 'year:2024' or 'pubdate:[2024-01 TO 2024-03]'
+        """
+        query = params["q"][0]
+        docs = {}
+        for bib in re.findall(r"citations\(([^)]*)\)", query):
+            for x in self.citations.get(bib, []):
+                docs.setdefault(x["bibcode"], x)
+        docs = list(docs.values())
+
+        year = re.search(r"\byear:(\d{4})", query)
+        if year:
+            docs = [x for x in docs if x["pubdate"][:4] == year.group(1)]
+        pubdate = re.search(r"\bpubdate:\[(\S+) TO (\S+)\]", query)
+        if pubdate:
+            docs = [
+                x
+                for x in docs
+                if pubdate.group(1) <= x["pubdate"][:7] <= pubdate.group(2)
+            ]
+
+        start, rows = int(params.get("start", [0])[0]), int(params.get("rows", [10])[0])
+
+        return {
+            "response": {
+                "numFound": len(docs),
+                "start": start,
+                "docs": docs[start : start + rows],
+            }
+        }
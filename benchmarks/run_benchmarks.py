@@ -0,0 +1,366 @@
+"""
+Benchmark each stage of a run (fetching, caching, processing and rendering) on synthetic histories, offline
+(fetching is from a local mock of the GitHub and ADS APIs, see `mock_server.py`). For each stage and size, the wall time
+and peak memory (of Python and NumPy allocations, from a separate traced run) are reported and optionally saved as JSON,
+so that results can be compared between commits.
+
+Run with
+
+    python benchmarks/run_benchmarks.py [--sizes 10000 100000 1000000] [--stages process_commits ...] [--latency 0.1] [--output results.json] [--compare baseline.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+from mock_server import MockAPIServer
+from synthetic import (
+    LABELS,
+    commit_nodes,
+    issue_PR_nodes,
+    synthetic_citations,
+    synthetic_commits,
+    synthetic_issues_PRs,
+)
+
+import repo_stats
+from repo_stats.cache import SQLiteCache, commit_record
+from repo_stats.citation_metrics import ADSCitations
+from repo_stats.git_metrics import GitMetrics
+from repo_stats.plot import author_time_plot, issue_PR_time_plot
+from repo_stats.utilities import fill_missed_months
+
+# largest size at which each stage is run by default (e.g. fetching 1M items over HTTP is slow)
+MAX_SIZE = {
+    "fetch_git": 10**5,
+    "fetch_ads": 10**5,
+    "crawl_issues": 10**5,
+    "backfill_issues": 10**5,
+    "update_cache": 10**5,
+}
+# seconds the mock APIs wait before each response (see `mock_server.MockAPIServer`)
+LATENCY = 0
+
+
+def _gits(cache_dir):
+    return GitMetrics("token", "owner", "repo", cache_dir)
+
+
+def stage_fetch_git(nn, tmp):
+    """Cold crawl of commit, issue and pull request histories from the mock GraphQL API (`GitMetrics.get_histories`)"""
+    nodes = {
+        "commits": commit_nodes(synthetic_commits(nn)),
+        "issues": issue_PR_nodes(synthetic_issues_PRs(nn, seed=1)),
+        "pullRequests": issue_PR_nodes(synthetic_issues_PRs(nn, seed=2)),
+    }
+    server = MockAPIServer(
+        repos={("owner", "repo"): nodes}, latency=LATENCY
+    ).__enter__()
+
+    def run():
+        cache_dir = tempfile.mkdtemp(dir=tmp)
+        Gits = _gits(cache_dir)
+        Gits.graphql_url = f"{server.url}/graphql"
+        Gits.get_histories()
+
+    return run, server.__exit__
+
+
+def _issues_server(nn):
+    """Mock GraphQL API serving 'nn' issues"""
+    nodes = {
+        "commits": [],
+        "issues": issue_PR_nodes(synthetic_issues_PRs(nn)),
+        "pullRequests": [],
+    }
+
+    return MockAPIServer(repos={("owner", "repo"): nodes}, latency=LATENCY).__enter__()
+
+
+def stage_crawl_issues(nn, tmp):
+    """Cold crawl of an issue history page by page from the mock GraphQL API (`GitMetrics.get_issues_PRs`)"""
+    server = _issues_server(nn)
+
+    def run():
+        Gits = _gits(tempfile.mkdtemp(dir=tmp))
+        Gits.graphql_url = f"{server.url}/graphql"
+        Gits.get_issues_PRs("issues")
+
+    return run, server.__exit__
+
+
+def stage_backfill_issues(nn, tmp):
+    """Cold crawl of an issue history by windows of creation time, 4 at once, from the mock GraphQL API (`GitMetrics.backfill_issues_PRs`)"""
+    server = _issues_server(nn)
+
+    def run():
+        Gits = _gits(tempfile.mkdtemp(dir=tmp))
+        Gits.graphql_url = f"{server.url}/graphql"
+        Gits.backfill_issues_PRs("issues", max_workers=4)
+
+    return run, server.__exit__
+
+
+def stage_fetch_ads(nn, tmp):
+    """Cold fetch of citations to 3 papers from the mock ADS API (`ADSCitations.aggregate_citations`)"""
+    citations = synthetic_citations(nn)
+    server = MockAPIServer(citations=citations, latency=LATENCY).__enter__()
+
+    def run():
+        Cites = ADSCitations("token", tempfile.mkdtemp(dir=tmp))
+        Cites.search_url = f"{server.url}/search/query"
+        Cites.aggregate_citations(list(citations))
+
+    return run, server.__exit__
+
+
+def stage_cache_append(nn, tmp):
+    """Add commit records to an empty SQLite cache (`cache.SQLiteCache.append`)"""
+    records = [commit_record({"node": x}) for x in commit_nodes(synthetic_commits(nn))]
+
+    def run():
+        SQLiteCache(tempfile.mkdtemp(dir=tmp)).append("commits", "repo", records)
+
+    return run, None
+
+
+def stage_cache_load(nn, tmp):
+    """Load the columns used for processing from a SQLite cache of commits (`cache.SQLiteCache.load`)"""
+    cache = SQLiteCache(tempfile.mkdtemp(dir=tmp))
+    cache.append(
+        "commits",
+        "repo",
+        [commit_record({"node": x}) for x in commit_nodes(synthetic_commits(nn))],
+    )
+
+    def run():
+        cache.load("commits", "repo", GitMetrics.commit_columns)
+
+    return run, None
+
+
+def stage_process_commits(nn, tmp):
+    """Commit statistics (`GitMetrics.process_commits`)"""
+    Gits, commits = _gits(tmp), synthetic_commits(nn)
+
+    return lambda: Gits.process_commits(commits), None
+
+
+def stage_process_issues_PRs(nn, tmp):
+    """Issue and pull request statistics (`GitMetrics.process_issues_PRs`)"""
+    Gits = _gits(tmp)
+    items = [synthetic_issues_PRs(nn, seed=1), synthetic_issues_PRs(nn, seed=2)]
+
+    return (
+        lambda: Gits.process_issues_PRs(items, ["issues", "pullRequests"], LABELS),
+        None,
+    )
+
+
+def stage_fill_missed_months(nn, tmp):
+    """Monthly counts of dates, filling months without any (`utilities.fill_missed_months`)"""
+    months = synthetic_commits(nn)["authoredDate"].astype("U7")
+
+    return lambda: fill_missed_months(np.unique(months, return_counts=True)), None
+
+
+def stage_update_cache(nn, tmp):
+    """Add commit records to an empty SQLite cache and load them back, as a crawl does (`cache.SQLiteCache.append` and `cache.SQLiteCache.load`)"""
+    records = [commit_record({"node": x}) for x in commit_nodes(synthetic_commits(nn))]
+
+    def run():
+        cache = SQLiteCache(tempfile.mkdtemp(dir=tmp))
+        cache.append("commits", "repo", records)
+        cache.load("commits", "repo", GitMetrics.commit_columns)
+
+    return run, None
+
+
+def stage_aggregate_citations(nn, tmp):
+    """Citation statistics from a full cache (`ADSCitations.aggregate_citations`, one query per paper to the mock ADS API)"""
+    citations = synthetic_citations(nn)
+    server = MockAPIServer(citations=citations, latency=LATENCY).__enter__()
+    Cites = ADSCitations("token", tempfile.mkdtemp(dir=tmp))
+    Cites.search_url = f"{server.url}/search/query"
+    Cites.aggregate_citations(list(citations))
+
+    return lambda: Cites.aggregate_citations(list(citations)), server.__exit__
+
+
+def stage_plots(nn, tmp):
+    """Render commit author and issue and pull request figures (`plot.author_time_plot`, `plot.issue_PR_time_plot`)"""
+    Gits = _gits(tmp)
+    stats = {
+        **Gits.process_commits(synthetic_commits(nn)),
+        **Gits.process_issues_PRs(
+            [synthetic_issues_PRs(nn, seed=1), synthetic_issues_PRs(nn, seed=2)],
+            ["issues", "pullRequests"],
+            LABELS,
+        ),
+    }
+
+    def run():
+        author_time_plot(stats, "owner", "repo", tmp)
+        issue_PR_time_plot(stats, "owner", "repo", tmp)
+
+    return run, None
+
+
+STAGES = {
+    "fetch_git": stage_fetch_git,
+    "fetch_ads": stage_fetch_ads,
+    "crawl_issues": stage_crawl_issues,
+    "backfill_issues": stage_backfill_issues,
+    "cache_append": stage_cache_append,
+    "cache_load": stage_cache_load,
+    "process_commits": stage_process_commits,
+    "process_issues_PRs": stage_process_issues_PRs,
+    "fill_missed_months": stage_fill_missed_months,
+    "update_cache": stage_update_cache,
+    "aggregate_citations": stage_aggregate_citations,
+    "plots": stage_plots,
+}
+
+
+def run_stage(stage, nn, memory=True):
+    """
+    Benchmark a stage at size 'nn'
+
+    Arguments
+    ---------
+    stage : str
+        One of the keys of STAGES
+    nn : int
+        Number of items (commits, issues and pull requests each, or citations)
+    memory : bool, default=True
+        Whether to measure peak memory, in a second run traced with 'tracemalloc' (which slows execution)
+
+    Returns
+    -------
+    result : dict
+        'stage', 'n', 'time' (s) and 'peak_memory' (MB; None if not measured)
+    """
+    tmp = tempfile.mkdtemp()
+    try:
+        # don't print progress
+        with contextlib.redirect_stdout(io.StringIO()):
+            run, teardown = STAGES[stage](nn, tmp)
+            try:
+                start = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - start
+
+                peak = None
+                if memory:
+                    tracemalloc.start()
+                    run()
+                    peak = tracemalloc.get_traced_memory()[1] / 1e6
+                    tracemalloc.stop()
+            finally:
+                if teardown is not None:
+                    teardown()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    return {"stage": stage, "n": nn, "time": elapsed, "peak_memory": peak}
+
+
+def metadata():
+    """Versions and git commit of the benchmarked code"""
+    try:
+        commit = subprocess.run(
+            ["git", "-C", os.path.dirname(repo_stats.__file__), "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        commit = None
+
+    return {
+        "date": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "commit": commit,
+        "repo_stats": repo_stats.__version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "latency": LATENCY,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10**4, 10**5, 10**6])
+    parser.add_argument(
+        "--stages", nargs="+", choices=list(STAGES), default=list(STAGES)
+    )
+    parser.add_argument(
+        "--all-sizes",
+        action="store_true",
+        help="run every stage at every size, ignoring MAX_SIZE",
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="don't measure peak memory"
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0,
+        help="seconds the mock APIs wait before each response, to simulate network latency",
+    )
+    parser.add_argument("--output", help="save results to this .json file")
+    parser.add_argument("--compare", help="compare to results in this .json file")
+    args = parser.parse_args()
+
+    global LATENCY
+    LATENCY = args.latency
+
+    results = []
+    print(f"\n{'stage':>20} {'n':>9} {'time (s)':>10} {'peak (MB)':>10}")
+    for stage in args.stages:
+        for nn in args.sizes:
+            if not args.all_sizes and nn > MAX_SIZE.get(stage, nn):
+                continue
+
+            rr = run_stage(stage, nn, not args.no_memory)
+            results.append(rr)
+            peak = "-" if rr["peak_memory"] is None else f"{rr['peak_memory']:.1f}"
+            print(f"{stage:>20} {nn:>9} {rr['time']:>10.3f} {peak:>10}", flush=True)
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({"metadata": metadata(), "results": results}, f, indent=4)
+        print(f"\nSaved results to {args.output}")
+
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        old = {(x["stage"], x["n"]): x for x in baseline["results"]}
+
+        print(
+            f"\nCompared to {args.compare} (commit {baseline['metadata']['commit']}); ratio < 1 is faster / less memory"
+        )
+        print(f"{'stage':>20} {'n':>9} {'time ratio':>11} {'memory ratio':>13}")
+        for rr in results:
+            oo = old.get((rr["stage"], rr["n"]))
+            if oo is None:
+                continue
+            memory = "-"
+            if rr["peak_memory"] and oo["peak_memory"]:
+                memory = f"{rr['peak_memory'] / oo['peak_memory']:.2f}"
+            print(
+                f"{rr['stage']:>20} {rr['n']:>9} {rr['time'] / oo['time']:>11.2f} {memory:>13}"
+            )
+
+
+if __name__ == "__main__":
+    main()
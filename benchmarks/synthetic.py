@@ -0,0 +1,193 @@
+"""
+Generators of synthetic commit, issue, pull request and citation histories for benchmarks, as cached columns
+(see `cache.SCHEMAS`) and as items in the format returned by the GitHub GraphQL and ADS APIs.
+"""
+
+import numpy as np
+
+LABELS = ["coordinates", "io.fits", "modeling", "table", "time", "units", "wcs"]
+
+
+def _dates(rng, n, start="2011-07-01"):
+    """'n' random days from 'start' to today, in reverse chronological order (as days since 1970-01-01)"""
+    start = np.datetime64(start).astype(np.int64)
+    end = np.datetime64("today").astype(np.int64)
+
+    return np.sort(rng.integers(start, end, n))[::-1]
+
+
+def _timestamps(days):
+    """Days since 1970-01-01 as strings of the format '2024-01-01T12:00:00Z'"""
+    return np.char.add(days.astype("datetime64[D]").astype(str), "T12:00:00Z")
+
+
+def synthetic_commits(n_commits, n_authors=None, seed=0):
+    """
+    Generate the cached columns of a synthetic commit history (see `GitMetrics.get_commits`), in reverse chronological order
+
+    Arguments
+    ---------
+    n_commits : int
+        Number of commits
+    n_authors : int, default=None
+        Number of distinct authors. If None, ~sqrt(n_commits)
+    seed : int, default=0
+        Random seed
+
+    Returns
+    -------
+    commits : dict of array
+        'oid', 'authoredDate', 'author_name', 'author_email' and 'databaseId' of each commit
+    """
+    rng = np.random.default_rng(seed)
+    if n_authors is None:
+        n_authors = int(np.sqrt(n_commits)) + 1
+
+    dates = _timestamps(_dates(rng, n_commits))
+
+    # a few prolific authors and a long tail
+    author = np.minimum(rng.zipf(1.5, n_commits) - 1, n_authors - 1)
+    names = np.char.add("author ", author.astype(str))
+    # ~10% of commits have no linked GitHub user
+    userIDs = np.where(rng.random(n_commits) < 0.1, -1, author)
+
+    return {
+        "oid": np.char.zfill(np.arange(n_commits).astype(str), 40),
+        "authoredDate": dates,
+        "author_name": names,
+        "author_email": np.char.add(names, "@example.com"),
+        "databaseId": userIDs,
+    }
+
+
+def synthetic_issues_PRs(n_items, labels=LABELS, seed=0):
+    """
+    Generate the cached columns of a synthetic issue or pull request history (see `GitMetrics.get_issues_PRs`), oldest first
+
+    Arguments
+    ---------
+    n_items : int
+        Number of issues or pull requests
+    labels : list of str, default=LABELS
+        Labels to randomly assign (0-2 per item)
+    seed : int, default=0
+        Random seed
+
+    Returns
+    -------
+    items : dict of array
+        'number', 'state', 'createdAt', 'updatedAt', 'closedAt' and 'labels' of each item
+    """
+    rng = np.random.default_rng(seed)
+
+    created = _dates(rng, n_items)[::-1]
+    # ~10% of items are open; the others were closed up to a year after being opened
+    is_open = rng.random(n_items) < 0.1
+    closed = np.minimum(
+        created + rng.integers(0, 365, n_items), np.datetime64("today").astype(np.int64)
+    )
+    updated = np.where(is_open, created, closed)
+
+    n_labels = rng.integers(0, 3, n_items)
+    label_idx = rng.integers(0, len(labels), (n_items, 2))
+    item_labels = np.empty(n_items, dtype=object)
+    item_labels[:] = [
+        [labels[jj] for jj in label_idx[ii, : n_labels[ii]]] for ii in range(n_items)
+    ]
+
+    return {
+        "number": np.arange(1, n_items + 1),
+        "state": np.where(is_open, "OPEN", "CLOSED"),
+        "createdAt": _timestamps(created),
+        "updatedAt": _timestamps(updated),
+        "closedAt": np.where(is_open, "", _timestamps(closed)),
+        "labels": item_labels,
+    }
+
+
+def synthetic_citations(n_citations, n_papers=3, overlap=0.2, seed=0):
+    """
+    Generate synthetic citations to papers, in the format returned by the ADS API (see `ADSCitations.get_citations`)
+
+    Arguments
+    ---------
+    n_citations : int
+        Total number of citations, across all papers
+    n_papers : int, default=3
+        Number of cited papers
+    overlap : float, default=0.2
+        Fraction of citing papers that cite more than one paper
+    seed : int, default=0
+        Random seed
+
+    Returns
+    -------
+    citations : dict
+        For each cited paper's bibcode, a list of citation docs ('bibcode' and 'pubdate')
+    """
+    rng = np.random.default_rng(seed)
+
+    n_unique = int(n_citations / (1 + overlap)) + 1
+    citing = rng.integers(0, n_unique, n_citations)
+    paper = rng.integers(0, n_papers, n_citations)
+    year = rng.integers(2013, np.datetime64("today", "Y").astype(int) + 1971, n_unique)
+    month = rng.integers(1, 13, n_unique)
+
+    citations = {}
+    for pp in range(n_papers):
+        bib = f"20{13 + 5 * pp}BENCH...{pp}A"
+        # each citing paper cites a paper at most once
+        ids = np.unique(citing[paper == pp])
+        citations[bib] = [
+            {
+                "bibcode": f"{year[ii]}CITE.{ii:010d}",
+                "pubdate": f"{year[ii]}-{month[ii]:02d}-00",
+            }
+            for ii in ids
+        ]
+
+    return citations
+
+
+def commit_nodes(commits):
+    """Convert synthetic commit columns (see `synthetic_commits`) to commit nodes as returned by the GitHub GraphQL API"""
+    return [
+        {
+            "oid": oid,
+            "authoredDate": date,
+            "author": {
+                "name": name,
+                "email": email,
+                "user": None if uid == -1 else {"databaseId": int(uid)},
+            },
+        }
+        for oid, date, name, email, uid in zip(
+            commits["oid"].tolist(),
+            commits["authoredDate"].tolist(),
+            commits["author_name"].tolist(),
+            commits["author_email"].tolist(),
+            commits["databaseId"].tolist(),
+        )
+    ]
+
+
+def issue_PR_nodes(items):
+    """Convert synthetic issue or pull request columns (see `synthetic_issues_PRs`) to nodes as returned by the GitHub GraphQL API"""
+    return [
+        {
+            "number": number,
+            "state": state,
+            "createdAt": created,
+            "updatedAt": updated,
+            "closedAt": closed or None,
+            "labels": {"edges": [{"node": {"name": x}} for x in labels]},
+        }
+        for number, state, created, updated, closed, labels in zip(
+            items["number"].tolist(),
+            items["state"].tolist(),
+            items["createdAt"].tolist(),
+            items["updatedAt"].tolist(),
+            items["closedAt"].tolist(),
+            items["labels"],
+        )
+    ]
@@ -0,0 +1,514 @@
+import ast
+import json
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+from contextlib import closing
+
+import numpy as np
+
+from repo_stats.instrument import traced
+
+# Typed columns stored for each cached item type, the column that uniquely identifies an item, and the columns whose stored
+# values aren't overwritten by missing ones (e.g. labels, which are fetched separately from the rest of an issue, see
+# `GitMetrics.sync_open_labels`). For each column, the value in 'load' output when the stored value is missing (NULL) is set by 'FILL'
+SCHEMAS = {
+    "commits": {
+        "key": "oid",
+        "columns": {
+            "oid": "TEXT",
+            "authoredDate": "TEXT",
+            "author_name": "TEXT",
+            "author_email": "TEXT",
+            "databaseId": "INTEGER",
+            "endCursor": "TEXT",
+        },
+        "preserve": ["endCursor"],
+    },
+    "issues": {
+        "key": "number",
+        "columns": {
+            "number": "INTEGER",
+            "state": "TEXT",
+            "createdAt": "TEXT",
+            "updatedAt": "TEXT",
+            "closedAt": "TEXT",
+            "labels": "JSON",
+            "endCursor": "TEXT",
+        },
+        "preserve": ["labels", "endCursor"],
+    },
+    "citations": {
+        "key": "bibcode",
+        "columns": {
+            "bibcode": "TEXT",
+            "pubdate": "TEXT",
+            "doc": "JSON",
+        },
+        "preserve": [],
+    },
+}
+SCHEMAS["pullRequests"] = SCHEMAS["issues"]
+
+FILL = {"TEXT": "", "INTEGER": -1, "JSON": None}
+
+
+def commit_record(edge):
+    """
+    Flatten a commit 'edge' returned by the GitHub GraphQL API (see `GitMetrics.get_commits`) to a cache record
+
+    Arguments
+    ---------
+    edge : dict
+        Commit data, with the commit's fields under the key 'node'
+
+    Returns
+    -------
+    record : dict
+        The commit's entries for each column in SCHEMAS['commits']
+    """
+    node = edge["node"]
+    author = node["author"]
+    # some authors have None in 'user' field
+    user = author.get("user") or {}
+
+    record = {
+        "oid": node["oid"],
+        "authoredDate": node["authoredDate"],
+        "author_name": author["name"],
+        "author_email": author.get("email"),
+        "databaseId": user.get("databaseId"),
+        "endCursor": edge.get("endCursor"),
+    }
+
+    return record
+
+
+def issue_PR_record(edge):
+    """
+    Flatten an issue or pull request 'edge' returned by the GitHub GraphQL API (see `GitMetrics.get_issues_PRs`) to a cache record
+
+    Arguments
+    ---------
+    edge : dict
+        Issue or pull request data, with the item's fields under the key 'node'
+
+    Returns
+    -------
+    record : dict
+        The item's entries for each column in SCHEMAS['issues']
+    """
+    node = edge["node"]
+
+    labels = None
+    if node.get("labels") is not None:
+        labels = [x["node"]["name"] for x in node["labels"]["edges"]]
+
+    record = {
+        "number": node["number"],
+        "state": node["state"],
+        "createdAt": node["createdAt"],
+        "updatedAt": node.get("updatedAt"),
+        "closedAt": node["closedAt"],
+        "labels": labels,
+        "endCursor": edge.get("endCursor"),
+    }
+
+    return record
+
+
+def citation_record(doc):
+    """
+    Flatten a citation 'doc' returned by the ADS API (see `ADSCitations.get_citations`) to a cache record
+
+    Arguments
+    ---------
+    doc : dict
+        Citation data, with an entry for each requested ADS metric
+
+    Returns
+    -------
+    record : dict
+        The citation's entries for each column in SCHEMAS['citations']
+    """
+    record = {
+        "bibcode": doc["bibcode"],
+        "pubdate": doc.get("pubdate"),
+        "doc": doc,
+    }
+
+    return record
+
+
+RECORDS = {
+    "commits": commit_record,
+    "issues": issue_PR_record,
+    "pullRequests": issue_PR_record,
+    "citations": citation_record,
+}
+
+
+def to_columns(table, items, columns=None):
+    """
+    Convert a list of items in the format returned by the GitHub or ADS API to the columnar format returned by `Cache.load`
+
+    Arguments
+    ---------
+    table : str
+        Item type, one of the keys of SCHEMAS
+    items : list of dict
+        Items (e.g. commit edges or citation docs)
+    columns : list of str, default=None
+        Columns to return. If None, all columns in the table's schema
+
+    Returns
+    -------
+    data : dict of array
+        An array for each column in 'columns'
+    """
+    schema = SCHEMAS[table]["columns"]
+    if columns is None:
+        columns = list(schema)
+
+    records = [RECORDS[table](i) for i in items]
+
+    data = {}
+    for cc in columns:
+        fill = FILL[schema[cc]]
+        values = [fill if r[cc] is None else r[cc] for r in records]
+        data[cc] = _column_array(values, schema[cc])
+
+    return data
+
+
+def _column_array(values, column_type):
+    """Convert a list of column 'values' to an array with a dtype set by the column's SQL 'column_type'"""
+    if column_type == "INTEGER":
+        return np.array(values, dtype=np.int64)
+    if column_type == "TEXT":
+        return np.array(values, dtype=str)
+    # JSON entries (e.g. lists of labels) are kept as Python objects
+    arr = np.empty(len(values), dtype=object)
+    arr[:] = values
+    return arr
+
+
+class Cache(ABC):
+    """
+    Interface for a cache of repository and citation data. Items are stored per 'table' (one of the keys of SCHEMAS) and
+    per 'dataset' (a repository's "owner/name" or cited bibcode), as typed columns that can be loaded individually.
+
+    Alongside items, named 'state' values (e.g. the time of the last sync) are stored per 'dataset'.
+
+    To add a backend, subclass this, set 'cache_file' (path to the cache, used in messages) and implement the abstract methods
+    'count', 'last_cursor', 'append', 'update', 'load' and 'get_state'; then add it to CACHE_BACKENDS.
+    """
+
+    cache_file = None
+
+    @abstractmethod
+    def count(self, table, dataset):
+        """Number of items cached for 'dataset' in 'table'"""
+
+    @abstractmethod
+    def last_cursor(self, table, dataset):
+        """Most recently cached GraphQL 'endCursor' for 'dataset' in 'table' (None if there isn't one)"""
+
+    @abstractmethod
+    def append(self, table, dataset, records, state=None):
+        """
+        Add 'records' (see e.g. `commit_record`) for 'dataset' to 'table', updating any existing items with the same key.
+        Together with the records, set each 'state' (dict) name to its value for 'dataset'.
+        """
+
+    @abstractmethod
+    def update(self, table, dataset, records, state=None):
+        """
+        Set the columns in 'records' (each with the key column of 'table' and the same other columns) of the items already cached
+        for 'dataset' in 'table', e.g. only the labels of open issues; records of items not cached are ignored.
+        Together with the records, set each 'state' (dict) name to its value for 'dataset'.
+        """
+
+    @abstractmethod
+    def get_state(self, dataset, name):
+        """Value of the state 'name' for 'dataset' (None if it hasn't been set)"""
+
+    @abstractmethod
+    def load(self, table, dataset, columns=None):
+        """Load 'columns' (all columns if None) for 'dataset' in 'table', as a dict of arrays in cache order"""
+
+    @traced("cache", detail="table")
+    def migrate_text_cache(self, text_file, table, dataset):
+        """
+        One-time migration of a legacy ASCII cache file (one 'str(dict)' API item per line, as written by earlier versions)
+        into this cache. Does nothing if 'text_file' doesn't exist or the cache already has entries for 'dataset'.
+
+        Arguments
+        ---------
+        text_file : str
+            Path to legacy cache file, e.g. '{cache_dir}/astropy_commits.txt'
+        table : str
+            Item type of the entries in 'text_file', one of the keys of SCHEMAS
+        dataset : str
+            Repository name or cited bibcode of the entries in 'text_file'
+
+        Returns
+        -------
+        n_migrated : int
+            Number of migrated entries
+        """
+        if not os.path.exists(text_file) or self.count(table, dataset) > 0:
+            return 0
+
+        with open(text_file, "r") as f:
+            items = [ast.literal_eval(i.rstrip("\n")) for i in f if i.strip() != ""]
+
+        self.append(table, dataset, [RECORDS[table](i) for i in items])
+        print(f"  Migrated {len(items)} entries from legacy cache {text_file}")
+
+        return len(items)
+
+
+class SQLiteCache(Cache):
+    def __init__(self, cache_dir):
+        """
+        Cache of repository and citation data in a single SQLite database, '{cache_dir}/cache.sqlite'.
+        Each item type is a table of typed columns, so that only the columns needed for processing are loaded.
+
+        Arguments
+        ---------
+        cache_dir : str
+            Path to directory in which the database is stored
+        """
+        self.cache_file = f"{cache_dir}/cache.sqlite"
+
+        with closing(self._connect()) as conn, conn:
+            for table, schema in SCHEMAS.items():
+                columns = ", ".join(
+                    f"{cc} {'TEXT' if ct == 'JSON' else ct}"
+                    for cc, ct in schema["columns"].items()
+                )
+                # rowid (implicit) preserves the order in which items were first cached
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} (dataset TEXT NOT NULL, {columns}, PRIMARY KEY (dataset, {schema['key']}))"
+                )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sync_state (dataset TEXT NOT NULL, name TEXT NOT NULL, value TEXT, PRIMARY KEY (dataset, name))"
+            )
+
+    def _connect(self):
+        # connect per operation, so the cache can be shared across threads
+        return sqlite3.connect(self.cache_file, timeout=60)
+
+    def count(self, table, dataset):
+        with closing(self._connect()) as conn:
+            (n,) = conn.execute(
+                f"SELECT COUNT(*) FROM {table} WHERE dataset = ?", (dataset,)
+            ).fetchone()
+
+        return n
+
+    def last_cursor(self, table, dataset):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                f"SELECT endCursor FROM {table} WHERE dataset = ? AND endCursor IS NOT NULL ORDER BY rowid DESC LIMIT 1",
+                (dataset,),
+            ).fetchone()
+
+        return None if row is None else row[0]
+
+    @traced("cache", detail="table")
+    def append(self, table, dataset, records, state=None):
+        schema = SCHEMAS[table]
+        columns = list(schema["columns"])
+        json_columns = [cc for cc in columns if schema["columns"][cc] == "JSON"]
+
+        updates = ", ".join(
+            # don't overwrite e.g. a stored cursor with an item that has none
+            (
+                f"{cc} = COALESCE(excluded.{cc}, {cc})"
+                if cc in schema["preserve"]
+                else f"{cc} = excluded.{cc}"
+            )
+            for cc in columns
+            if cc != schema["key"]
+        )
+        statement = (
+            f"INSERT INTO {table} (dataset, {', '.join(columns)}) VALUES (?{', ?' * len(columns)}) "
+            f"ON CONFLICT (dataset, {schema['key']}) DO UPDATE SET {updates}"
+        )
+
+        rows = []
+        for rr in records:
+            row = [dataset]
+            for cc in columns:
+                value = rr.get(cc)
+                if cc in json_columns and value is not None:
+                    value = json.dumps(value)
+                row.append(value)
+            rows.append(row)
+
+        if state is None:
+            state = {}
+
+        # a single transaction: either all records and state are written or none are
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(statement, rows)
+            conn.executemany(
+                "INSERT OR REPLACE INTO sync_state (dataset, name, value) VALUES (?, ?, ?)",
+                [(dataset, kk, vv) for kk, vv in state.items()],
+            )
+
+    @traced("cache", detail="table")
+    def update(self, table, dataset, records, state=None):
+        schema = SCHEMAS[table]
+        key = schema["key"]
+        columns = [
+            cc for cc in schema["columns"] if cc != key and records and cc in records[0]
+        ]
+        json_columns = [cc for cc in columns if schema["columns"][cc] == "JSON"]
+
+        rows = []
+        for rr in records:
+            row = []
+            for cc in columns:
+                value = rr[cc]
+                if cc in json_columns and value is not None:
+                    value = json.dumps(value)
+                row.append(value)
+            rows.append(row + [dataset, rr[key]])
+
+        if state is None:
+            state = {}
+
+        with closing(self._connect()) as conn, conn:
+            if columns:
+                conn.executemany(
+                    f"UPDATE {table} SET {', '.join(f'{cc} = ?' for cc in columns)} WHERE dataset = ? AND {key} = ?",
+                    rows,
+                )
+            conn.executemany(
+                "INSERT OR REPLACE INTO sync_state (dataset, name, value) VALUES (?, ?, ?)",
+                [(dataset, kk, vv) for kk, vv in state.items()],
+            )
+
+    def get_state(self, dataset, name):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT value FROM sync_state WHERE dataset = ? AND name = ?",
+                (dataset, name),
+            ).fetchone()
+
+        return None if row is None else row[0]
+
+    @traced("cache", detail="table")
+    def load(self, table, dataset, columns=None):
+        schema = SCHEMAS[table]["columns"]
+        if columns is None:
+            columns = list(schema)
+
+        # fill missing values in SQL rather than per item in Python
+        selected = ", ".join(
+            cc if schema[cc] == "JSON" else f"COALESCE({cc}, {FILL[schema[cc]]!r})"
+            for cc in columns
+        )
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT {selected} FROM {table} WHERE dataset = ? ORDER BY rowid",
+                (dataset,),
+            ).fetchall()
+
+        values = list(zip(*rows)) if rows else [()] * len(columns)
+
+        data = {}
+        for cc, vv in zip(columns, values):
+            if schema[cc] == "JSON":
+                vv = [None if v is None else json.loads(v) for v in vv]
+            data[cc] = _column_array(vv, schema[cc])
+
+        return data
+
+
+CACHE_BACKENDS = {"sqlite": SQLiteCache}
+
+
+class CheckpointBuffer:
+    def __init__(self, cache, table, dataset, max_items=1000):
+        """
+        Bounded buffer of the records from pages of a crawl, written to a cache in checkpoints of whole pages.
+        Each checkpoint adds its records together with any state (e.g. the GraphQL cursor of its last page, in its last record)
+        in a single transaction, so an interrupted crawl can resume from its last checkpoint.
+
+        Use as a context manager: on exit, including on an error, buffered pages are written.
+
+        Arguments
+        ---------
+        cache : `Cache` instance
+            Cache that records are written to
+        table : str
+            One of the keys of SCHEMAS
+        dataset : str
+            Repository name or cited bibcode of the records
+        max_items : int, default=1000
+            Number of records buffered before a checkpoint is written
+        """
+        self.cache = cache
+        self.table = table
+        self.dataset = dataset
+        self.max_items = max_items
+
+        self.records = []
+        self.state = {}
+        self.n_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
+
+    def add(self, records, state=None):
+        """
+        Add the records of a page (see e.g. `commit_record`), and any 'state' (dict) to set with them, writing a checkpoint
+        if 'max_items' records are buffered
+        """
+        self.records.extend(records)
+        if state is not None:
+            self.state.update(state)
+
+        if len(self.records) >= self.max_items:
+            self.flush()
+
+    def flush(self, state=None):
+        """Write buffered records, together with buffered state and any 'state' (dict), to the cache"""
+        if state is not None:
+            self.state.update(state)
+
+        if self.records or self.state:
+            self.cache.append(self.table, self.dataset, self.records, state=self.state)
+            self.n_written += len(self.records)
+        self.records, self.state = [], {}
+
+
+def get_cache(cache_dir, backend="sqlite"):
+    """
+    Create a cache of repository and citation data
+
+    Arguments
+    ---------
+    cache_dir : str
+        Path to directory that will be populated with the cache
+    backend : str, default="sqlite"
+        One of the keys of CACHE_BACKENDS
+
+    Returns
+    -------
+    cache : `Cache` instance
+        The cache
+    """
+    if backend not in CACHE_BACKENDS:
+        raise ValueError(
+            f"cache backend {backend} invalid; must be one of {list(CACHE_BACKENDS)}"
+        )
+
+    return CACHE_BACKENDS[backend](cache_dir)
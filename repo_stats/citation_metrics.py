@@ -1,16 +1,31 @@
-import os
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from urllib.parse import urlencode
 
 import numpy as np
-import requests
 
-from repo_stats.utilities import update_cache
+from repo_stats.cache import CheckpointBuffer, citation_record, get_cache, to_columns
+from repo_stats.client import APIClient
+from repo_stats.instrument import traced
+from repo_stats.rate_limit import RateLimitBudget
+from repo_stats.utilities import ordered_map
 
 
 class ADSCitations:
-    def __init__(self, token, cache_dir):
+    # ADS search API endpoint (can be overridden, e.g. by a local mock server for benchmarks)
+    search_url = "https://api.adsabs.harvard.edu/v1/search/query"
+    # cached columns used by 'process_citations'
+    citation_columns = ["bibcode", "pubdate"]
+    # citations per ADS query (page)
+    rows = 100
+    # citations fetched before they're written to the cache, so an interrupted fetch resumes from the last write
+    # and at most this many citations (plus pages fetched out of order) are held in memory (see `cache.CheckpointBuffer`)
+    checkpoint_size = 1000
+
+    def __init__(
+        self, token, cache_dir, cache_backend="sqlite", client=None, max_workers=4
+    ):
         """
         Class for getting, processing and aggregating citation data from the NASA ADS database for a given set of papers.
 
@@ -20,11 +35,33 @@ class ADSCitations:
             Authorization token for ADS queries
         cache_dir : str, default=None
             Path to directory that will be populated with caches of citation data
+        cache_backend : str, default="sqlite"
+            Cache backend, one of the keys of `cache.CACHE_BACKENDS`
+        client : `client.APIClient` instance, default=None
+            Client used for ADS queries. If None, a new client authorized with 'token' and with its own rate limit budget
+        max_workers : int, default=4
+            Maximum number of ADS queries sent at once (across all papers and pages of citations)
         """
         self.token = token
         self.cache_dir = cache_dir
+        self.cache = get_cache(cache_dir, cache_backend)
+
+        if client is None:
+            client = APIClient(
+                headers={
+                    "Authorization": "Bearer " + token,
+                    "Content-type": "application/json",
+                },
+                budget=RateLimitBudget(),
+                pool_size=max_workers,
+            )
+        self.client = client
+
+        self.max_workers = max_workers
+        self.query_slots = threading.BoundedSemaphore(max_workers)
 
-    def get_citations(self, bib, metric):
+    @traced("fetch", detail="bib")
+    def get_citations(self, bib, metric, columns=None):
         """
         Get citation data for a paper with the identifier 'bib' by quering the ADS API.
 
@@ -33,71 +70,194 @@ class ADSCitations:
         bib : str
             Bibcode identifier of the paper being cited, e.g., "2013A&A...558A..33A"
         metric : str
-            Metrics to return for each citation to the paper, e.g. "bibcode, pubdate, pub, author, title"
+            Metrics to return for each citation to the paper, e.g. "bibcode, pubdate, pub, author, title". Must include "bibcode"
+        columns : list of str, default=None
+            Cached columns to return (see `cache.SCHEMAS`); all 'metric' data is in the column 'doc'. If None, those used by `ADSCitations.process_citations`
 
         Returns
         -------
-        all_cites : list of dict
-            For each citation to the paper 'bib', a dictionary of 'metric' data
+        all_cites : dict of array
+            An array for each column in 'columns', with an entry for each citation to the paper 'bib'
         """
-        cache_file = f"{self.cache_dir}/{bib}.txt"
-        if not os.path.exists(cache_file):
-            open(cache_file, "w").close()
+        if columns is None:
+            columns = self.citation_columns
 
-        with open(cache_file, "r") as f:
-            old_cites = f.readlines()
-            print(f"  {len(old_cites)} citations found in ADS cache at {cache_file}")
+        self.cache.migrate_text_cache(f"{self.cache_dir}/{bib}.txt", "citations", bib)
+        n_old = self.cache.count("citations", bib)
+        print(
+            f"  {n_old} citations to {bib} found in ADS cache at {self.cache.cache_file}"
+        )
+
+        # the first page gives the total number of citations, and so the start of each remaining page
+        result = self.query_citations(bib, metric, n_old)
+        starts = range(n_old + len(result["docs"]), result["numFound"], self.rows)
 
-        if old_cites is None:
-            end, start = 1, 0
+        # pages are written in order, so that cached citations are always the first 'n_old' and a fetch resumes from there;
+        # at most 'max_workers' pages are fetched ahead of those written, so they aren't held in memory
+        with (
+            CheckpointBuffer(
+                self.cache, "citations", bib, self.checkpoint_size
+            ) as buffer,
+            ThreadPoolExecutor(max_workers=self.max_workers) as pool,
+        ):
+            buffer.add([citation_record(x) for x in result["docs"]])
+            pages = ordered_map(
+                pool,
+                lambda x: self.query_citations(bib, metric, x),
+                starts,
+                self.max_workers,
+            )
+            for page in pages:
+                buffer.add([citation_record(x) for x in page["docs"]])
+
+        if buffer.n_written == 0:
+            print(f"  No new entries found for {bib} - cache not updated")
         else:
-            end, start = len(old_cites) + 1, len(old_cites)
-
-        new_cites = []
-        while end > start:
-            encoded_query = urlencode(
-                {
-                    "q": f"citations({bib})",
-                    "fl": metric,
-                    "rows": 100,
-                    "start": start,
-                }
+            print(
+                f"  Updated cache at {self.cache.cache_file} with {buffer.n_written} entries for {bib}"
             )
 
-            query_tries = 0 
-            while True:
-                response = requests.get(
-                    f"https://api.adsabs.harvard.edu/v1/search/query?{encoded_query}",
-                    headers={
-                        "Authorization": "Bearer " + self.token,
-                        "Content-type": "application/json",
-                    },
-                )
-                
-                if response.status_code == 200:
-                    break
-                else:
-                    if query_tries == 3:
-                        raise Exception(f"Query failed after 3 attempts -- return code {response.status_code}")
-                    time.sleep(300)
-                    query_tries += 1                    
-                
-            result = response.json()["response"]
-            new_cites.extend(result["docs"])
-            end, start = result["numFound"], result["start"] + len(result["docs"])
-
-        all_cites = update_cache(cache_file, old_cites, new_cites)
+        all_cites = self.cache.load("citations", bib, columns)
 
         return all_cites
 
-    def process_citations(self, citations):
+    def query_citations(self, bib, metric, start):
+        """
+        Query the ADS API for a page of citations to the paper with the identifier 'bib'.
+        At most 'max_workers' queries are sent at once across threads.
+
+        Arguments
+        ---------
+        bib : str
+            Bibcode identifier of the paper being cited
+        metric : str
+            Metrics to return for each citation to the paper
+        start : int
+            Index of the first citation on the page
+
+        Returns
+        -------
+        result : dict
+            The 'response' entry of the query response, including 'numFound' (total number of citations) and 'docs' (citations on the page)
+        """
+        encoded_query = urlencode(
+            {
+                "q": f"citations({bib})",
+                "fl": metric,
+                "rows": self.rows,
+                "start": start,
+            }
+        )
+
+        # failed queries are retried with backoff by 'self.client'
+        with self.query_slots:
+            response = self.client.get(f"{self.search_url}?{encoded_query}")
+        if response.status_code != 200:
+            raise Exception(
+                f"Query failed after {self.client.max_retries} retries -- return code {response.status_code}"
+            )
+
+        result = response.json()["response"]
+
+        return result
+
+    def count_papers(self, query):
+        """
+        Query the ADS API for the number of papers matching 'query', without returning any of them
+
+        Arguments
+        ---------
+        query : str
+            ADS search query, e.g. "citations(2013A&A...558A..33A) AND year:2024"
+
+        Returns
+        -------
+        n_papers : int
+            Number of matching papers
+        """
+        encoded_query = urlencode({"q": query, "fl": "bibcode", "rows": 0})
+
+        with self.query_slots:
+            response = self.client.get(f"{self.search_url}?{encoded_query}")
+        if response.status_code != 200:
+            raise Exception(
+                f"Query failed after {self.client.max_retries} retries -- return code {response.status_code}"
+            )
+
+        n_papers = response.json()["response"]["numFound"]
+
+        return n_papers
+
+    @traced("fetch")
+    def count_citations(self, bibcode):
+        """
+        Obtain the aggregate citation statistics shown in dashboard images ('cite_all', 'cite_year' and 'cite_month',
+        see `ADSCitations.process_citations`) for all papers in 'bibcode', with a count query for each rather than all citations
+
+        Arguments
+        ---------
+        bibcode : list of str
+            Bibcode identifiers of the papers being cited
+
+        Returns
+        -------
+        stats : dict
+            'cite_all', 'cite_year' and 'cite_month' of unique citing papers, in 'aggregate'
+        """
+        print(f"\nCounting citations for {len(bibcode)} papers")
+
+        time_utc = datetime.now(timezone.utc)
+        last_month = (time_utc.replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+
+        # a paper citing several papers in 'bibcode' matches once
+        # (for query syntax, see https://ui.adsabs.harvard.edu/help/search/search-syntax)
+        cited = " OR ".join(f"citations({bb})" for bb in bibcode)
+        queries = {
+            "cite_all": cited,
+            "cite_year": f"({cited}) AND year:{time_utc.year}",
+            "cite_month": f"({cited}) AND pubdate:[{last_month} TO {last_month}]",
+        }
+        with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+            counts = dict(zip(queries, pool.map(self.count_papers, queries.values())))
+
+        print(
+            f"  {counts['cite_all']} citations, {counts['cite_year']} this year, {counts['cite_month']} last month"
+        )
+
+        return {"aggregate": counts}
+
+    def citation_dates(self, pubdate):
+        """
+        Parse citation publication dates
+
+        Arguments
+        ---------
+        pubdate : array of str
+            Publication date of each citation, with the ADS format "2024-01-00"
+
+        Returns
+        -------
+        year, month : array of int
+            Publication year and month of each citation
+        """
+        # view each date as its characters to slice out the year and month without a loop over dates
+        chars = np.asarray(pubdate, dtype="U7").view("U1").reshape(-1, 7)
+        year = chars[:, :4].copy().view("U4").ravel().astype(int)
+        month = chars[:, 5:7].copy().view("U2").ravel().astype(int)
+
+        return year, month
+
+    @traced("process")
+    def process_citations(self, citations, dates=None):
         """
         Process (obtain statistics for) citation data in 'citations'
 
         Arguments
         ---------
-        citations : list of dict
-            Dictionary of data for each citation to the reference paper
+        citations : dict of array or list of dict
+            Cached columns for each citation to the reference paper (see `ADSCitations.get_citations`), or a dictionary of data for each citation as returned by the ADS API
+        dates : tuple of array, default=None
+            Publication year and month of each citation (see `ADSCitations.citation_dates`), if already parsed
 
         Returns
         -------
@@ -109,20 +269,25 @@ class ADSCitations:
                 - 'cite_per_year': citations per year
                 - 'cite_bibcodes': bibcodes of all citations
         """
-        # [year, month] of each citation
-        dates = [x["pubdate"][:7].split("-") for x in citations]
-        dates = [[int(x[0]), int(x[1])] for x in dates]
+        if not isinstance(citations, dict):
+            citations = to_columns("citations", citations, self.citation_columns)
+
+        if dates is None:
+            dates = self.citation_dates(citations["pubdate"])
+        year, month = dates
 
         time_utc = datetime.now(timezone.utc)
-        cite_total = len(citations)
-        cite_this_year = [x[0] for x in dates].count(time_utc.year)
+        cite_total = len(year)
+        cite_this_year = int(np.sum(year == time_utc.year))
 
         last_month = time_utc.replace(day=1) - timedelta(days=1)
-        cite_last_month = dates.count([last_month.year, last_month.month])
+        cite_last_month = int(
+            np.sum((year == last_month.year) & (month == last_month.month))
+        )
 
-        cite_year, cite_per_year = np.unique([x[0] for x in dates], return_counts=True)
+        cite_year, cite_per_year = np.unique(year, return_counts=True)
 
-        cite_bibcodes = [x["bibcode"] for x in citations]
+        cite_bibcodes = list(citations["bibcode"])
 
         stats = {
             "cite_all": cite_total,
@@ -150,27 +315,67 @@ class ADSCitations:
         Returns
         -------
         all_stats : dict
-            Individual and aggregated citation statistics across all papers in 'bibcode'
+            Individual and aggregated citation statistics across all papers in 'bibcode' (see `ADSCitations.process_citations`). Additionally:
+                - for each paper, 'cite_shared': number of its citations that also cite another paper in 'bibcode'
+                - for the aggregate, 'cite_overlap': number of citing papers that cite each number (1, 2, ...) of papers in 'bibcode'
         """
-        all_citations, all_stats = [], {}
-        for ii, bb in enumerate(bibcode):
-            print(
-                f"\nCollecting and processing citations for paper {ii + 1} of {len(bibcode)}: {bb}"
+        print(f"\nCollecting citations for {len(bibcode)} papers")
+        # papers are fetched concurrently, with at most 'max_workers' queries at once (see `ADSCitations.query_citations`)
+        with ThreadPoolExecutor(max_workers=len(bibcode)) as pool:
+            all_citations = list(
+                pool.map(lambda x: self.get_citations(x, metric), bibcode)
             )
-            citations = self.get_citations(bb, metric)
-            all_citations.extend(citations)
 
-            stats = self.process_citations(citations)
-            all_stats[bb] = stats
+        all_stats, all_dates = {}, []
+        for ii, bb in enumerate(bibcode):
+            print(f"\nProcessing citations for paper {ii + 1} of {len(bibcode)}: {bb}")
+            dates = self.citation_dates(all_citations[ii]["pubdate"])
+            all_dates.append(dates)
+            all_stats[bb] = self.process_citations(all_citations[ii], dates)
 
         print("\nAggregating citations for all papers")
-        # remove duplicates of papers that cite multiple references in 'bibcode'
-        all_citations_unique = [
-            x for i, x in enumerate(all_citations) if x not in all_citations[i + 1 :]
-        ]
-        all_stats["aggregate"] = self.process_citations(all_citations_unique)
+        # index of each unique citing paper's first citation, and the number of papers in 'bibcode' it cites
+        citing = np.concatenate([x["bibcode"] for x in all_citations])
+        index, idx_unique, n_cited = {}, [], []
+        item_to_unique = np.empty(len(citing), dtype=int)
+        for ii, cc in enumerate(citing):
+            jj = index.get(cc)
+            if jj is None:
+                jj = index[cc] = len(idx_unique)
+                idx_unique.append(ii)
+                n_cited.append(0)
+            n_cited[jj] += 1
+            item_to_unique[ii] = jj
+        n_cited = np.array(n_cited, dtype=int)
+
+        # reuse the parsed dates of each paper's citations
+        year, month = (np.concatenate([x[kk] for x in all_dates]) for kk in range(2))
+        all_stats["aggregate"] = self.process_citations(
+            {"bibcode": citing[idx_unique]}, (year[idx_unique], month[idx_unique])
+        )
+
+        # overlap: number of citing papers that cite 1, 2, ... of the papers in 'bibcode'
+        overlap = np.bincount(n_cited, minlength=len(bibcode) + 1)[1:]
+        all_stats["aggregate"]["cite_overlap"] = {
+            kk + 1: int(x) for kk, x in enumerate(overlap)
+        }
+        # for each paper, number of its citations that also cite another paper in 'bibcode'
+        n_cited_per_item = n_cited[item_to_unique]
+        offsets = np.cumsum([0] + [len(x["bibcode"]) for x in all_citations])
+        for ii, bb in enumerate(bibcode):
+            all_stats[bb]["cite_shared"] = int(
+                np.sum(n_cited_per_item[offsets[ii] : offsets[ii + 1]] > 1)
+            )
+
         print(
-            f"  {len(all_citations_unique)} unique of {len(all_citations)} total citations - returning only unique citations"
+            f"  {len(idx_unique)} unique of {len(citing)} total citations - returning only unique citations"
+        )
+        print(
+            "  "
+            + ", ".join(
+                f"{x} cite {kk} of {len(bibcode)} papers"
+                for kk, x in all_stats["aggregate"]["cite_overlap"].items()
+            )
         )
 
         return all_stats
@@ -0,0 +1,202 @@
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# response codes for which a request is retried
+RETRY_CODES = [429, 500, 502, 503, 504]
+
+
+class APIClient:
+    def __init__(
+        self,
+        headers=None,
+        budget=None,
+        max_retries=5,
+        backoff=2.0,
+        max_backoff=600,
+        pool_size=10,
+        timeout=60,
+    ):
+        """
+        Class for sending requests to a web API over a persistent (keep-alive) session with pooled connections.
+        Failed requests are retried with exponential backoff (with jitter), honouring the 'Retry-After' and 'X-RateLimit-Reset' headers,
+        and the latency and size of each response is recorded.
+
+        Arguments
+        ---------
+        headers : dict, default=None
+            Headers sent with every request (e.g. authorization)
+        budget : `rate_limit.RateLimitBudget` instance, default=None
+            Rate limit budget to acquire before each request and update from each response. If None, not used
+        max_retries : int, default=5
+            Maximum number of times a failed request is retried
+        backoff : float, default=2.0
+            Base wait in seconds before retrying a failed request, doubled for each subsequent retry
+        max_backoff : float, default=600
+            Maximum wait in seconds before retrying a failed request
+        pool_size : int, default=10
+            Maximum number of connections kept open (should be at least the number of threads sharing the client)
+        timeout : float, default=60
+            Timeout in seconds for each request
+        """
+        self.budget = budget
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if headers is not None:
+            self.session.headers.update(headers)
+
+        # per-request metrics
+        self.metrics = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request, retrying on connection errors and on responses with a code in RETRY_CODES or a spent rate limit
+
+        Arguments
+        ---------
+        method : str
+            HTTP method, e.g. "GET"
+        url : str
+            Request URL
+        **kwargs
+            Passed to 'requests.Session.request'
+
+        Returns
+        -------
+        response : 'requests.Response' instance
+            The first successful response, or the last response if all retries fail
+        """
+        for attempt in range(self.max_retries + 1):
+            if self.budget is not None:
+                self.budget.acquire()
+
+            start = time.perf_counter()
+            try:
+                response = self.session.request(
+                    method, url, timeout=self.timeout, **kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout) as err:
+                if attempt == self.max_retries:
+                    raise err
+                wait = self.retry_wait(None, attempt)
+                print(f"\n  Request failed ({err}) - retrying in {wait:.0f} s")
+                time.sleep(wait)
+                continue
+
+            with self._lock:
+                self.metrics.append(
+                    {
+                        "url": url,
+                        "status": response.status_code,
+                        "latency": time.perf_counter() - start,
+                        "bytes": len(response.content),
+                    }
+                )
+            if self.budget is not None:
+                self.budget.update(response.headers)
+
+            if not self.should_retry(response) or attempt == self.max_retries:
+                return response
+
+            wait = self.retry_wait(response, attempt)
+            print(
+                f"\n  Query failed -- return code {response.status_code} - retrying in {wait:.0f} s"
+            )
+            time.sleep(wait)
+
+    def get(self, url, **kwargs):
+        """Send a GET request (see `APIClient.request`)"""
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """Send a POST request (see `APIClient.request`)"""
+        return self.request("POST", url, **kwargs)
+
+    def should_retry(self, response):
+        """
+        Whether a request should be retried given its 'response'
+
+        Arguments
+        ---------
+        response : 'requests.Response' instance
+            Response to the request
+
+        Returns
+        -------
+        retry : bool
+            True for a code in RETRY_CODES, or a 403 code for an exceeded (primary or secondary) rate limit
+        """
+        if response.status_code in RETRY_CODES:
+            return True
+
+        # GitHub signals an exceeded rate limit with 403
+        return response.status_code == 403 and (
+            "Retry-After" in response.headers
+            or response.headers.get("X-RateLimit-Remaining") == "0"
+        )
+
+    def retry_wait(self, response, attempt):
+        """
+        Time to wait before retrying a failed request
+
+        Arguments
+        ---------
+        response : 'requests.Response' instance or None
+            Response to the failed request (None if there was no response)
+        attempt : int
+            Number of retries already made
+
+        Returns
+        -------
+        wait : float
+            Seconds to wait: that given by a 'Retry-After' header, or until the rate limit resets if it's spent;
+            otherwise exponential backoff with random jitter
+        """
+        if response is not None:
+            if "Retry-After" in response.headers:
+                return float(response.headers["Retry-After"])
+
+            if (
+                response.headers.get("X-RateLimit-Remaining") == "0"
+                and "X-RateLimit-Reset" in response.headers
+            ):
+                return (
+                    max(int(response.headers["X-RateLimit-Reset"]) - time.time(), 0) + 1
+                )
+
+        wait = min(self.backoff * 2**attempt, self.max_backoff)
+
+        # jitter, so that concurrent retries don't coincide
+        return random.uniform(wait / 2, wait)
+
+    def summary(self):
+        """
+        Summarize the metrics of all requests sent
+
+        Returns
+        -------
+        summary : dict
+            Number of requests, total response bytes and total and maximum latency (in seconds)
+        """
+        with self._lock:
+            latency = [x["latency"] for x in self.metrics]
+            summary = {
+                "n_requests": len(self.metrics),
+                "n_failed": sum(x["status"] != 200 for x in self.metrics),
+                "bytes": sum(x["bytes"] for x in self.metrics),
+                "latency_total": sum(latency),
+                "latency_max": max(latency, default=0),
+            }
+
+        return summary
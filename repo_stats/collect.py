@@ -0,0 +1,212 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from repo_stats.client import APIClient
+from repo_stats.git_metrics import GitMetrics
+from repo_stats.instrument import tracer
+from repo_stats.rate_limit import RateLimitBudget
+
+
+def collect_git_stats(
+    repos,
+    token,
+    cache_dir,
+    labels,
+    age_recent_commit=90,
+    age_recent_issue_pr=90,
+    max_workers=4,
+    cache_backend="sqlite",
+    incremental=True,
+    batch_queries=True,
+    commit_source="graphql",
+    repo_dir=None,
+    branches=None,
+    partitioned_crawl=False,
+):
+    """
+    Get and process the commit, issue and pull request histories of multiple GitHub repositories, fetching concurrently
+    under a shared rate limit budget. Statistics are obtained for each repository and aggregated across all of them.
+
+    Arguments
+    ---------
+    repos : list of str
+        Repositories, each as "owner/name"
+    token : str
+        Authorization token for GitHub queries
+    cache_dir : str
+        Path to directory that will be populated with caches of git data
+    labels : list of str
+        GitHub labels to obtain additional issue and pull request statistics for (see `GitMetrics.process_issues_PRs`)
+    age_recent_commit, age_recent_issue_pr : int, default=90
+        Days before present used to categorize recent commit, and issue and pull request, statistics
+    max_workers : int, default=4
+        Maximum number of histories fetched at once
+    cache_backend : str, default="sqlite"
+        Cache backend, one of the keys of `cache.CACHE_BACKENDS`
+    incremental : bool, default=True
+        Whether to incrementally sync cached issues and pull requests (see `GitMetrics.get_issues_PRs`)
+    batch_queries : bool, default=True
+        If True, fetch each repository's commit, issue and pull request histories with the same queries (see `GitMetrics.get_histories`).
+        If False, fetch the three histories concurrently with separate queries
+    commit_source : str, default="graphql"
+        Source of commit histories: "graphql" (the GitHub GraphQL API, see `GitMetrics.get_commits`) or
+        "git" (a local copy of each repository, see `GitMetrics.get_commits_via_git_log`), which takes no queries
+    repo_dir : str, default=None
+        Path to directory containing a local copy of each repository (as '{repo_dir}/{repository name}'). Used if 'commit_source' is "git"
+    branches : dict, default=None
+        Branch whose commit history is obtained for any repository in 'repos' (keys). For other repositories, the default branch
+    partitioned_crawl : bool, default=False
+        If True, issue and pull request histories not yet in the cache are first crawled concurrently by windows of creation time
+        (see `GitMetrics.backfill_issues_PRs`), with 'max_workers' windows at once, then synced as usual
+
+    Returns
+    -------
+    per_repo_stats : dict
+        For each repository in 'repos', its commit statistics (see `GitMetrics.process_commits`) and issue and pull request
+        statistics (see `GitMetrics.process_issues_PRs`)
+    aggregate_stats : dict
+        The same statistics for the combined histories of all repositories in 'repos'
+    """
+    # one session and rate limit budget shared by all queries
+    budget = RateLimitBudget()
+    client = APIClient(
+        headers={"Authorization": f"token {token}"},
+        budget=budget,
+        pool_size=max_workers,
+    )
+    if commit_source not in ["graphql", "git"]:
+        raise ValueError(
+            f"commit_source {commit_source} invalid; must be one of ['graphql', 'git']"
+        )
+    if commit_source == "git" and repo_dir is None:
+        raise ValueError("repo_dir must be set if commit_source is 'git'")
+    if branches is None:
+        branches = {}
+
+    gits, get_commits = {}, {}
+    for rr in repos:
+        owner, name = rr.split("/")
+        gits[rr] = GitMetrics(
+            token, owner, name, cache_dir, cache_backend, client, branches.get(rr)
+        )
+        if commit_source == "git":
+            get_commits[rr] = partial(
+                gits[rr].get_commits_via_git_log, f"{repo_dir}/{name}"
+            )
+        else:
+            get_commits[rr] = gits[rr].get_commits
+
+    print(
+        f"\nCollecting git histories of {len(repos)} repositories with {max_workers} workers"
+    )
+    if partitioned_crawl:
+        for gg in gits.values():
+            for item_type in ["issues", "pullRequests"]:
+                gg.backfill_issues_PRs(item_type, max_workers)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        if batch_queries:
+            # with commits from a local copy, only issue and pull request histories are queried
+            columns = None
+            if commit_source == "git":
+                columns = {
+                    "issues": GitMetrics.issue_PR_columns,
+                    "pullRequests": GitMetrics.issue_PR_columns,
+                }
+
+            futures = {}
+            for rr, gg in gits.items():
+                futures[rr] = {
+                    "histories": pool.submit(gg.get_histories, columns, incremental)
+                }
+                if commit_source == "git":
+                    futures[rr]["commits"] = pool.submit(get_commits[rr])
+
+            histories = {}
+            for rr, ffs in futures.items():
+                histories[rr] = ffs["histories"].result()
+                if "commits" in ffs:
+                    histories[rr]["commits"] = ffs["commits"].result()
+
+        else:
+            futures = {}
+            for rr, gg in gits.items():
+                futures[rr] = {
+                    "commits": pool.submit(get_commits[rr]),
+                    "issues": pool.submit(
+                        gg.get_issues_PRs, "issues", incremental=incremental
+                    ),
+                    "pullRequests": pool.submit(
+                        gg.get_issues_PRs, "pullRequests", incremental=incremental
+                    ),
+                }
+            histories = {
+                rr: {kk: ff.result() for kk, ff in ffs.items()}
+                for rr, ffs in futures.items()
+            }
+    summary = client.summary()
+    tracer.record_client("github", client)
+    print(
+        f"\n  Used {summary['n_requests']} queries ({summary['bytes'] / 1e6:.1f} MB in {summary['latency_total']:.1f} s; rate limit used: {budget.used} of {budget.limit})"
+    )
+
+    per_repo_stats = {}
+    for rr, hh in histories.items():
+        print(f"\nProcessing git history of {rr}")
+        per_repo_stats[rr] = process_git_history(
+            gits[rr], hh, labels, age_recent_commit, age_recent_issue_pr
+        )
+
+    print(f"\nProcessing combined git history of {len(repos)} repositories")
+    combined = {}
+    for kk in ["commits", "issues", "pullRequests"]:
+        combined[kk] = {
+            cc: np.concatenate([hh[kk][cc] for hh in histories.values()])
+            for cc in histories[repos[0]][kk]
+        }
+    # 'process_commits' expects commits in reverse chronological order
+    order = np.argsort(combined["commits"]["authoredDate"], kind="stable")[::-1]
+    combined["commits"] = {cc: vv[order] for cc, vv in combined["commits"].items()}
+
+    aggregate_stats = process_git_history(
+        gits[repos[0]], combined, labels, age_recent_commit, age_recent_issue_pr
+    )
+
+    return per_repo_stats, aggregate_stats
+
+
+def process_git_history(
+    gits, history, labels, age_recent_commit=90, age_recent_issue_pr=90
+):
+    """
+    Process (obtain statistics for) the commit, issue and pull request history of a repository
+
+    Arguments
+    ---------
+    gits : `GitMetrics` instance
+        Used to process the history
+    history : dict
+        Cached columns for 'commits', 'issues' and 'pullRequests' (see `GitMetrics.get_commits` and `GitMetrics.get_issues_PRs`)
+    labels : list of str
+        GitHub labels to obtain additional issue and pull request statistics for
+    age_recent_commit, age_recent_issue_pr : int, default=90
+        Days before present used to categorize recent commit, and issue and pull request, statistics
+
+    Returns
+    -------
+    stats : dict
+        Commit, issue and pull request statistics
+    """
+    commit_stats = gits.process_commits(history["commits"], age_recent_commit)
+    issue_pr_stats = gits.process_issues_PRs(
+        [history["issues"], history["pullRequests"]],
+        ["issues", "pullRequests"],
+        labels,
+        age_recent_issue_pr,
+    )
+
+    stats = {**commit_stats, **issue_pr_stats}
+
+    return stats
@@ -1,16 +1,85 @@
+import json
 import os
-import time
-from datetime import datetime, timezone
 import subprocess
-import requests
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime, timedelta, timezone
+
 import numpy as np
-import ast
 
-from repo_stats.utilities import fill_missed_months, update_cache
+from repo_stats.cache import (
+    CheckpointBuffer,
+    commit_record,
+    get_cache,
+    issue_PR_record,
+    to_columns,
+)
+from repo_stats.client import APIClient
+from repo_stats.instrument import traced
+from repo_stats.query_plan import MAX_FIRST, CrawlPlan, remaining_items
+from repo_stats.rate_limit import RateLimitBudget
+from repo_stats.utilities import month_index, monthly_counts, ordered_map
 
 
 class GitMetrics:
-    def __init__(self, token, repo_owner, repo_name, cache_dir):
+    # GitHub GraphQL API endpoint (can be overridden, e.g. by a local mock server for benchmarks)
+    graphql_url = "https://api.github.com/graphql"
+    # cached columns used by 'process_commits' and 'process_issues_PRs'
+    commit_columns = ["authoredDate", "author_name", "databaseId"]
+    issue_PR_columns = ["state", "createdAt", "closedAt", "labels"]
+    # commit author names that aren't counted as authors
+    bots = [
+        "dependabot[bot]",
+        "github-actions",
+        "github-actions[bot]",
+        "meeseeksmachine",
+        "odidev",
+        "pre-commit-ci[bot]",
+        "unknown",
+    ]
+    # items fetched before they're written to the cache (with the cursor of their last page), so an interrupted crawl
+    # resumes from the last write and at most this many items are held in memory (see `cache.CheckpointBuffer`)
+    checkpoint_size = 1000
+    # maximum number of results of a GitHub search, see https://docs.github.com/en/rest/search/search#about-search
+    search_limit = 1000
+    # fields queried for each commit, and each issue and pull request
+    commit_fields = """
+                                        oid
+                                        authoredDate
+                                        author {
+                                            name
+                                            email
+                                            user {
+                                                databaseId
+                                            }
+                                        }
+    """
+    # (issues and pull requests without labels, which are only processed for open items and so are fetched for those alone,
+    # see `GitMetrics.sync_open_labels`)
+    issue_PR_fields = """
+                            number
+                            state
+                            createdAt
+                            updatedAt
+                            closedAt
+    """
+    # nested connections of each commit, and each issue and pull request, in the fields above (see `query_plan.plan_page_sizes`)
+    commit_nested = []
+    issue_PR_nested = []
+    # and of each open issue and pull request in label syncs (see `GitMetrics.sync_open_labels`)
+    open_label_nested = [(25, [])]
+
+    def __init__(
+        self,
+        token,
+        repo_owner,
+        repo_name,
+        cache_dir,
+        cache_backend="sqlite",
+        client=None,
+        branch=None,
+    ):
         """
         Class for getting and processing repository data (commit history, issues, pull requests, contributors) from GitHub for a given repository.
 
@@ -24,11 +93,29 @@ class GitMetrics:
             Name of repository on GitHub
         cache_dir : str, default=None
             Path to directory that will be populated with caches of git data
+        cache_backend : str, default="sqlite"
+            Cache backend, one of the keys of `cache.CACHE_BACKENDS`
+        client : `client.APIClient` instance, default=None
+            Client used for GitHub queries, shared by instances that query concurrently with the same 'token'.
+            If None, a new client authorized with 'token' and with its own rate limit budget
+        branch : str, default=None
+            Branch whose commit history is obtained. If None, the repository's default branch
+            (on GitHub, or checked out in a local copy of the repository)
         """
         self.token = token
         self.repo_owner = repo_owner
         self.repo_name = repo_name
+        # cached items and sync state are keyed by the full name, as repositories of different owners can share a name
+        self.dataset = f"{repo_owner}/{repo_name}"
         self.cache_dir = cache_dir
+        self.branch = branch
+        self.cache = get_cache(cache_dir, cache_backend)
+
+        if client is None:
+            client = APIClient(
+                headers={"Authorization": f"token {token}"}, budget=RateLimitBudget()
+            )
+        self.client = client
 
     def get_age(self, date):
         """
@@ -45,7 +132,8 @@ class GitMetrics:
             Age of the item (int if 'days_since' is True)
 
         """
-        if date is None:
+        # missing dates are None (API response) or "" (cache)
+        if not date:
             return -1
 
         now = datetime.now(timezone.utc)
@@ -54,80 +142,142 @@ class GitMetrics:
 
         return age
 
-    def parse_log_line(self, line):
+    def query_graphql(self, query, variables):
         """
-        Break an individual 'git log' line 'line' into its component parts (commit hash, date, author).
+        Send a query to the GitHub GraphQL API
 
         Arguments
         ---------
-        line : str
-            Dates with assumed string format "2024-01-01..."
+        query : str
+            GraphQL query
+        variables : dict
+            Values of the variables in 'query'
+
+        Returns
+        -------
+        data : dict
+            The 'data' entry of the query response
+        headers : dict
+            The response headers (including rate limit information)
+        """
+        response = self.client.post(
+            self.graphql_url,
+            json={"query": query, "variables": variables},
+        )
+
+        if response.status_code != 200:
+            raise Exception(f"Query failed -- return code {response.status_code}")
+
+        result = response.json()
+        try:
+            data = result["data"]
+        except KeyError as err:
+            print(f"Query syntax is likely wrong. Reponse to query: {result}")
+            raise err
+
+        if self.client.budget is not None:
+            self.client.budget.update_graphql(data.get("rateLimit"))
+
+        return data, response.headers
+
+    def rate_limit_status(self, headers):
+        """
+        Summarize GitHub API rate limit usage from the response 'headers' of a query (see `GitMetrics.query_graphql`)
+
+        Arguments
+        ---------
+        headers : dict
+            Response headers
+
+        Returns
+        -------
+        status : str
+            Rate limit used and time to reset
+        """
+        time_to_reset = datetime.fromtimestamp(
+            int(headers["X-RateLimit-Reset"]) - time.time(),
+            tz=timezone.utc,
+        ).strftime("%M:%S")
+
+        status = f"rate limit used: {headers['X-RateLimit-Used']} of {headers['X-RateLimit-Limit']} - resets in {time_to_reset}"
+
+        return status
+
+    def branch_ref(self):
+        """
+        GraphQL field for the branch whose commit history is obtained (see https://docs.github.com/en/graphql/reference/objects#ref)
 
         Returns
         -------
-        parsed : list of str
-            The commit's hash, date, author
+        field : str
+            'ref' field for the branch 'self.branch', or 'defaultBranchRef' if it's None
         """
-        line = line.split(",")
-        parsed = []
-        for ii in range(3):
-            parsed.append(line[ii].lstrip('"').rstrip('"\n'))
+        if self.branch is None:
+            return "defaultBranchRef"
 
-        return parsed
+        return f"ref(qualifiedName: {json.dumps(self.branch)})"
 
-    def get_commits(self):
+    @traced("fetch")
+    def get_commits(self, columns=None):
         """
-        Obtain the commit history for a repository with 'git log', and parse the output.
+        Obtain the commit history for a repository by querying the GraphQL API, and update the cache with new commits.
+
+        Arguments
+        ---------
+        columns : list of str, default=None
+            Cached columns to return (see `cache.SCHEMAS`). If None, those used by `GitMetrics.process_commits`
 
         Returns
         -------
-        all_items : list of dict
-            A dictionary entry for each commit in the history, including the identifiers below in 'query'
+        all_items : dict of array
+            An array for each column in 'columns', with an entry for each commit in the history
         """
         print("\nCollecting git commit history")
 
-        cache_file = f"{self.cache_dir}/{self.repo_name}_commits.txt"
-        if not os.path.exists(cache_file):
-            open(cache_file, "w").close()
+        if columns is None:
+            columns = self.commit_columns
 
-        with open(cache_file, "r") as f:
-            old_items = f.readlines()
-            print(f"  {len(old_items)} commits found in cache at {cache_file}")
-        if old_items == []:
-            # NOTE: 'after' here differs from GitMetrics.get_issues_PRs, as does its type in 'query' below ('String' vs. 'String!') - see https://github.com/orgs/community/discussions/24443
-            after = None
-        else:
-            # convert string to dict and get relevant key
-            after = ast.literal_eval(old_items[-1].rstrip("\n"))["endCursor"]
+        self.cache.migrate_text_cache(
+            f"{self.cache_dir}/{self.repo_name}_commits.txt", "commits", self.dataset
+        )
+        n_cached = self.cache.count("commits", self.dataset)
+        print(f"  {n_cached} commits found in cache at {self.cache.cache_file}")
+        # NOTE: 'after' here differs from GitMetrics.get_issues_PRs, as does its type in 'query' below ('String' vs. 'String!') - see https://github.com/orgs/community/discussions/24443
+        after = self.cache.last_cursor("commits", self.dataset)
 
         # For query syntax, see https://docs.github.com/en/graphql/reference/objects#repository
         # and https://docs.github.com/en/graphql/reference/objects#commit
         # and https://docs.github.com/en/graphql/reference/objects#gitactor
         # and https://docs.github.com/en/graphql/guides/using-pagination-in-the-graphql-api
         # To quickly test a query, try https://docs.github.com/en/graphql/overview/explorer
-        query = """
-        query($owner: String!, $name: String!, $after: String) {
+        query = (
+            """
+        query($owner: String!, $name: String!, $after: String, $first: Int!) {
+            rateLimit {
+                cost
+                remaining
+                resetAt
+            }
+
             repository(name: $name, owner: $owner) {
-                ref(qualifiedName: "main") {
+                branch: """
+            + self.branch_ref()
+            + """ {
                     target {
-                        ... on Commit {                    
-                            history(first: 100, after: $after) {
+                        ... on Commit {
+                            history(first: $first, after: $after) {
+                                totalCount
+
                                 pageInfo {
                                     hasNextPage
                                     endCursor
                                 }
-                        
+
                                 edges {
                                     node {
-                                        oid
-                                        authoredDate
-                                        author {
-                                            name
-                                            email
-                                            user {
-                                                databaseId
-                                            }
-                                        }
+                                        """
+            + self.commit_fields
+            + """
                                     }
                                 }
                             }
@@ -135,10 +285,10 @@ class GitMetrics:
                     }
                 }
             }
-        }                
+        }
         """
+        )
 
-        headers = {"Authorization": f"token {self.token}"}
         # with 'after', traverse through items (issues or PRs) from oldest to newest
         variables = {
             "owner": self.repo_owner,
@@ -148,126 +298,260 @@ class GitMetrics:
         # must traverse through pages of items
         hasNextPage = True
 
-        new_items = []
         items_retrieved = 0
-        while hasNextPage is True:
-            response = requests.post(
-                "https://api.github.com/graphql",
-                json={"query": query, "variables": variables},
-                headers=headers,
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                try:
-                    result["data"]
-                except KeyError as err:
-                    print(f"Query syntax is likely wrong. Reponse to query: {result}")
-                    raise err
-
-                items_retrieved += len(
-                    result["data"]["repository"]["ref"]["target"]["history"]["edges"]
-                )
-
-                time_to_reset = datetime.fromtimestamp(
-                    int(response.headers["X-RateLimit-Reset"]) - time.time(),
-                    tz=timezone.utc,
-                ).strftime("%M:%S")
-
-                if (
-                    len(
-                        result["data"]["repository"]["ref"]["target"]["history"][
-                            "edges"
-                        ]
-                    )
-                    > 0
+        # page sizes and pacing of the queries (see `query_plan.CrawlPlan`)
+        with (
+            CrawlPlan({"commits": self.commit_nested}, self.client.budget) as plan,
+            CheckpointBuffer(
+                self.cache, "commits", self.dataset, self.checkpoint_size
+            ) as buffer,
+        ):
+            while hasNextPage is True:
+                variables["first"] = plan.next_query()["commits"]
+                data, headers = self.query_graphql(query, variables)
+                history = data["repository"]["branch"]["target"]["history"]
+
+                items_retrieved += len(history["edges"])
+                if plan.update(
+                    {
+                        "commits": remaining_items(
+                            history["totalCount"], n_cached + items_retrieved
+                        )
+                    }
                 ):
+                    self.print_crawl_plan(plan)
+
+                if len(history["edges"]) > 0:
                     print(
-                        f"\r  Retrieved {items_retrieved} new commits (rate limit used: {response.headers['X-RateLimit-Used']} of {response.headers['X-RateLimit-Limit']} - resets in {time_to_reset})",
+                        f"\r  Retrieved {items_retrieved} new commits ({self.rate_limit_status(headers)})",
                         end="",
                         flush=True,
                     )
 
                     # store ID of the chronologically newest commit on current page, used to later reference newest item in cache
-                    result["data"]["repository"]["ref"]["target"]["history"]["edges"][
-                        -1
-                    ]["endCursor"] = result["data"]["repository"]["ref"]["target"][
-                        "history"
-                    ][
-                        "pageInfo"
-                    ][
-                        "endCursor"
-                    ]
-                    new_items.extend(
-                        result["data"]["repository"]["ref"]["target"]["history"][
-                            "edges"
-                        ]
-                    )
-
-                hasNextPage = result["data"]["repository"]["ref"]["target"]["history"][
-                    "pageInfo"
-                ]["hasNextPage"]
+                    history["edges"][-1]["endCursor"] = history["pageInfo"]["endCursor"]
+                    buffer.add([commit_record(x) for x in history["edges"]])
 
-                variables["after"] = result["data"]["repository"]["ref"]["target"][
-                    "history"
-                ]["pageInfo"]["endCursor"]
-
-            else:
-                raise Exception(f"Query failed -- return code {response.status_code}")
+                hasNextPage = history["pageInfo"]["hasNextPage"]
+                variables["after"] = history["pageInfo"]["endCursor"]
 
         # prevent last flush, without printing new line
         print("", end="")
 
-        all_items = update_cache(cache_file, old_items, new_items)
+        self.print_cache_update(buffer.n_written)
+        all_items = self.cache.load("commits", self.dataset, columns)
 
         return all_items
 
-    def get_commits_via_git_log(self, repo_local_path):
+    def update_cache(self, item_type, records, state=None):
+        """
+        Add 'records' of type 'item_type' for this repository to the cache
+
+        Arguments
+        ---------
+        item_type : str
+            One of ['commits', 'issues', 'pullRequests']
+        records : list of dict
+            New cache entries (see `cache.commit_record` and `cache.issue_PR_record`)
+        state : dict, default=None
+            Cache state values (e.g. time of last sync) to set together with 'records'
+        """
+        self.cache.append(item_type, self.dataset, records, state=state)
+        self.print_cache_update(len(records))
+
+    def print_crawl_plan(self, plan):
+        """Print the predicted cost of the rest of a crawl (see `query_plan.CrawlPlan`)"""
+        print(
+            f"  Predicted cost of the rest of the crawl: {plan.planned_cost} rate limit points in {plan.planned_queries} queries"
+        )
+
+    def print_cache_update(self, n_records):
+        """Print the number of entries added to the cache ('n_records')"""
+        if n_records == 0:
+            print("  No new entries found - cache not updated")
+        else:
+            print(
+                f"\n  Updated cache at {self.cache.cache_file} with {n_records} entries"
+            )
+
+    def stream_git_log(
+        self, repo_local_path, since=None, last_hash=None, batch_size=10000
+    ):
+        """
+        Stream the commit history of the branch 'self.branch' (if None, the checked out branch) from 'git log' on a local copy of the repository, reading its output
+        incrementally through a pipe. Fields and commits are NUL-delimited, so names containing commas, quotes or newlines are parsed correctly.
+
+        Arguments
+        ---------
+        repo_local_path : str
+            Path to local copy of repository
+        since : str, default=None
+            If not None, only read commits more recent than this date (passed to 'git log --since', e.g. "2024-01-01")
+        last_hash : str, default=None
+            If not None, only read commits not reachable from this commit (e.g. the newest commit read by a previous run)
+        batch_size : int, default=10000
+            Number of commits in each yielded batch
+
+        Yields
+        ------
+        batch : dict of array
+            An array for each of 'oid', 'authoredDate' (UTC, e.g. "2024-01-01T00:00:00Z"), 'author_name' and 'author_email',
+            with an entry for each commit in the batch, in reverse chronological order
+        """
+        fields = ["oid", "authoredDate", "author_name", "author_email"]
+        branch = "HEAD" if self.branch is None else self.branch
+
+        args = [
+            "git",
+            "-C",
+            repo_local_path,
+            "log",
+            "--use-mailmap",
+            "-z",
+            "--date=format-local:%Y-%m-%dT%H:%M:%SZ",
+            "--format=%H%x00%ad%x00%aN%x00%aE",
+        ]
+        if since is not None:
+            args.append(f"--since={since}")
+        if last_hash is not None:
+            args.append(f"{last_hash}..{branch}")
+        else:
+            args.append(branch)
+
+        git_log = subprocess.Popen(
+            args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            # dates in UTC, consistent with the GraphQL API
+            env={**os.environ, "TZ": "UTC"},
+        )
+        # drain stderr concurrently, so git can't block on a full stderr pipe while stdout is read
+        stderr_reader = ThreadPoolExecutor(max_workers=1)
+        stderr = stderr_reader.submit(git_log.stderr.read)
+        stderr_reader.shutdown(wait=False)
+
+        n_fields = len(fields)
+        tokens, remainder = [], b""
+        while True:
+            chunk = git_log.stdout.read(1 << 20)
+            if chunk:
+                # the last token may be incomplete, so carry it to the next chunk
+                *complete, remainder = (remainder + chunk).split(b"\0")
+                tokens.extend(complete)
+            elif remainder:
+                tokens.append(remainder)
+
+            while len(tokens) >= batch_size * n_fields or (
+                not chunk and len(tokens) >= n_fields
+            ):
+                n_batch = min(len(tokens) // n_fields, batch_size)
+                batch = np.char.decode(
+                    np.array(tokens[: n_batch * n_fields], dtype=bytes),
+                    # preserve non-English letters in names
+                    "utf-8",
+                    errors="replace",
+                ).reshape(n_batch, n_fields)
+                del tokens[: n_batch * n_fields]
+
+                yield {ff: batch[:, ii] for ii, ff in enumerate(fields)}
+
+            if not chunk:
+                break
+
+        if git_log.wait() != 0:
+            raise RuntimeError(
+                f"git log failed for repository at {repo_local_path}: {stderr.result().decode().strip()}"
+            )
+
+    @traced("fetch")
+    def get_commits_via_git_log(
+        self,
+        repo_local_path,
+        columns=None,
+        incremental=True,
+        since=None,
+        batch_size=10000,
+    ):
         """
-        Obtain the commit history for a repository with 'git log' and a local copy of the repository; and parse the output.
+        Obtain the commit history for a repository with 'git log' and a local copy of the repository (see `GitMetrics.stream_git_log`),
+        and update the cache with new commits. Commits are cached separately from those obtained by `GitMetrics.get_commits`.
 
         Arguments
         ---------
         repo_local_path : str
             Path to local copy of repository
+        columns : list of str, default=None
+            Cached columns to return (see `cache.SCHEMAS`). If None, those used by `GitMetrics.process_commits`
+        incremental : bool, default=True
+            If True, only read commits newer than the newest commit read by the previous run
+        since : str, default=None
+            If not None, only read commits more recent than this date (e.g. "2024-01-01")
+        batch_size : int, default=10000
+            Number of commits read from 'git log' and added to the cache at once
 
         Returns
         -------
-        dates : list of str
-            Date of each commit
-        authors : list of str
-            Author of each commit
+        all_items : dict of array
+            An array for each column in 'columns', with an entry for each commit in the history, in reverse chronological order
         """
         print("\nCollecting git commit history")
 
-        git_log = subprocess.run(
-            args=f'git -C {repo_local_path} log --use-mailmap --date=iso-local --format="%H","%as","%aN"'.split(),
-            stdout=subprocess.PIPE,
-            # preserve non-English letters in names
-            text=True,
+        if columns is None:
+            columns = self.commit_columns
+
+        # 'databaseId' isn't available from git, so don't mix these commits with those from the GraphQL API
+        dataset = f"{self.dataset}@git"
+        print(
+            f"  {self.cache.count('commits', dataset)} commits found in cache at {self.cache.cache_file}"
         )
 
-        dates, authors = [], []
-        for line in git_log.stdout.splitlines():
-            commit_hash, date, author = self.parse_log_line(line)
-            dates.append(date)
-            authors.append(author)
+        last_hash = None
+        if incremental:
+            last_hash = self.cache.get_state(dataset, "git_log_head")
+
+        head = last_hash
+        items_retrieved = 0
+        for batch in self.stream_git_log(repo_local_path, since, last_hash, batch_size):
+            if items_retrieved == 0:
+                head = str(batch["oid"][0])
+            items_retrieved += len(batch["oid"])
+            print(f"\r  Read {items_retrieved} new commits", end="", flush=True)
+
+            records = [dict(zip(batch, x)) for x in zip(*batch.values())]
+            self.cache.append("commits", dataset, records)
+
+        # only mark commits as read once all batches are cached
+        self.cache.append("commits", dataset, [], state={"git_log_head": head})
+        if items_retrieved == 0:
+            print("  No new entries found - cache not updated")
+        else:
+            print(
+                f"\n  Updated cache at {self.cache.cache_file} with {items_retrieved} entries"
+            )
 
-        if len(dates) == 0:
+        if self.cache.count("commits", dataset) == 0:
             raise RuntimeError(
                 f"0 commits found for repository in git log. Check that 'repo_dir' {repo_local_path} in the .json parameter file is correct."
             )
 
-        return dates, authors
+        all_items = self.cache.load(
+            "commits", dataset, list(set(columns) | {"authoredDate"})
+        )
+        # commits from later runs are cached after older ones
+        order = np.argsort(all_items["authoredDate"], kind="stable")[::-1]
+        all_items = {cc: all_items[cc][order] for cc in columns}
+
+        return all_items
 
+    @traced("process")
     def process_commits(self, results, age_recent=90):
         """
         Process (obtain statistics for) git commit data
 
         Arguments
         ---------
-        results : list of dict
-            A dictionary entry for each commit in the history (see `Git_metrics.get_commits`)
+        results : dict of array or list of dict
+            Cached columns for each commit in the history (see `Git_metrics.get_commits`), or a dictionary entry for each commit as returned by the GraphQL API
         age_recent : int, default=90
             Days before present used to categorize recent commit statistics
 
@@ -283,97 +567,88 @@ class GitMetrics:
                 - 'new_authors_per_month': number of new commit authors per month, over time
                 - 'multi_authors_per_month': number of commit authors per month with >1 commit that month, over time
         """
-        dates, authors, userIDs = [], [], []
-        bots = [
-            "dependabot[bot]",
-            "github-actions",
-            "github-actions[bot]",
-            "meeseeksmachine",
-            "odidev",
-            "pre-commit-ci[bot]",
-            "unknown",
-        ]
+        if not isinstance(results, dict):
+            results = to_columns("commits", results, self.commit_columns)
+
+        names = np.asarray(results["author_name"], dtype=str)
+        keep = ~np.isin(names, self.bots)
+        names = names[keep]
+        userIDs = np.asarray(results["databaseId"])[keep]
+        # dates as days since 1970-01-01 ('datetime64[D]' as int)
+        days = (
+            np.asarray(results["authoredDate"], dtype="U10")[keep]
+            .astype("datetime64[D]")
+            .astype(np.int64)
+        )
+        n_commits = len(names)
 
-        for ii in results:
-            if ii["node"]["author"]["name"] not in bots:
-                dates.append(ii["node"]["authoredDate"])
-                authors.append(ii["node"]["author"]["name"])
-                # some authors have None in 'user' field
-                try:
-                    userIDs.append(ii["node"]["author"]["user"]["databaseId"])
-                except TypeError:
-                    userIDs.append(ii["node"]["author"]["name"])
+        print(f"  {n_commits} total commits")
 
-        print(f"  {len(dates)} total commits")
+        # integer code for each author name, in alphabetical order of names
+        name_list, name_code = np.unique(names, return_inverse=True)
 
         # assuming we don't have a .mailmap file to connect unique authors to multiple versions of their name and/or emails,
-        # use their GitHub IDs (likely won't catch all variations)
-        uniqueIDs = np.unique(userIDs, return_index=True, return_counts=True)
-        # IDs that occur in commit history at least twice
-        uniqueIDs_repeat = [
-            x for i, x in enumerate(uniqueIDs[0]) if uniqueIDs[2][i] > 1
-        ]
-        # set author name for all instances of the ID repeat to their name at last (most recent) instance
-        for i in uniqueIDs_repeat:
-            idxs = np.where(np.array(userIDs) == i)[0]
-            for j in idxs:
-                authors[j] = authors[idxs[-1]]
-
-        dates_strip_day = [d[:7] for d in dates]
-        zipped = list(zip(dates_strip_day, authors))
-
-        unique_month_author_pairs = np.unique(zipped, axis=0, return_counts=True)
-
-        # number of unique commit authors per month
-        authors_per_month = np.unique(
-            [x[0] for x in unique_month_author_pairs[0]], axis=0, return_counts=True
+        # use their GitHub IDs (likely won't catch all variations).
+        # authors without a 'user' (ID of -1) are identified by name, coded as negative IDs
+        userIDs = np.where(userIDs == -1, -(name_code + 2), userIDs)
+        _, ID_code = np.unique(userIDs, return_inverse=True)
+        # set author name for all instances of an ID to their name at its last instance
+        _, idx_last_rev = np.unique(ID_code[::-1], return_index=True)
+        author_code = name_code[n_commits - 1 - idx_last_rev][ID_code]
+
+        # per author: number of commits, date of first and last commit
+        n_names = len(name_list)
+        n_author_commits = np.bincount(author_code, minlength=n_names)
+        day_first_commit = np.full(n_names, np.iinfo(np.int64).max)
+        np.minimum.at(day_first_commit, author_code, days)
+        day_last_commit = np.full(n_names, np.iinfo(np.int64).min)
+        np.maximum.at(day_last_commit, author_code, days)
+
+        # dates as months since 1970-01
+        months = month_index(days.astype("datetime64[D]"))
+        month_min = months.min()
+
+        # number of commits by each (month, author) pair
+        pair_code, pair_counts = np.unique(
+            (months - month_min) * n_names + author_code, return_counts=True
         )
-        # possible that not every month has commits,
-        # so insert months without commits and 0 for their number of authors
-        authors_per_month = fill_missed_months(authors_per_month)
+        pair_month = pair_code // n_names + month_min
+
+        # number of unique commit authors per month.
+        # possible that not every month has commits, so months without commits have 0 authors;
+        # all monthly series span the same months (first commit to present)
+        authors_per_month = monthly_counts(pair_month, start=month_min)
 
         # number of authors per month with >1 commit that month
-        multi_authors_per_month = np.unique(
-            [
-                x[0]
-                for i, x in enumerate(unique_month_author_pairs[0])
-                if unique_month_author_pairs[1][i] > 1
-            ],
-            axis=0,
-            return_counts=True,
+        multi_authors_per_month = monthly_counts(
+            pair_month[pair_counts > 1], start=month_min
         )
-        multi_authors_per_month = fill_missed_months(multi_authors_per_month)
 
-        # '*last*' and '*first*' variables assume the git log is in reverse chronological order
-        unique_authors_last_commit = np.unique(
-            authors, return_index=True, return_counts=True
-        )
-        unique_authors_first_commit = np.unique(
-            authors[::-1], return_index=True, return_counts=True
+        authors = np.flatnonzero(n_author_commits)
+        # for each author, index of their first commit in the reversed 'results' (assuming reverse chronological order)
+        _, idx_first_commit = np.unique(author_code[::-1], return_index=True)
+        unique_authors_first_commit = (
+            name_list[authors],
+            idx_first_commit,
+            n_author_commits[authors],
         )
 
-        # last and first commit dates per author
-        date_last_commit = [dates[i] for i in unique_authors_last_commit[1]]
-        date_first_commit = [dates[::-1][i] for i in unique_authors_first_commit[1]]
-
         # number of new authors per month
-        new_authors_per_month = np.unique(
-            [x[:7] for x in date_first_commit], return_counts=True
+        new_authors_per_month = monthly_counts(
+            month_index(day_first_commit[authors].astype("datetime64[D]")),
+            start=month_min,
         )
-        new_authors_per_month = fill_missed_months(new_authors_per_month)
-
-        n_recent_authors, new_authors = 0, []
 
-        for ii, jj in enumerate(unique_authors_last_commit[0]):
-            last_commit_age = self.get_age(date_last_commit[ii])
-            first_commit_age = self.get_age(date_first_commit[ii])
+        # commit ages as days before present
+        today = np.datetime64(datetime.now(timezone.utc).date(), "D").astype(np.int64)
+        last_commit_age = today - day_last_commit[authors]
+        first_commit_age = today - day_first_commit[authors]
 
-            if last_commit_age.days <= age_recent:
-                n_recent_authors += 1
-
-                # authors with their first commit(s) in this period
-                if first_commit_age.days <= age_recent:
-                    new_authors.append(str(jj))
+        n_recent_authors = int(np.sum(last_commit_age <= age_recent))
+        # authors with their first commit(s) in this period
+        new_authors = [
+            str(x) for x in name_list[authors[first_commit_age <= age_recent]]
+        ]
 
         stats = {
             "age_recent_commit": age_recent,
@@ -387,19 +662,26 @@ class GitMetrics:
 
         return stats
 
-    def get_issues_PRs(self, item_type):
+    @traced("fetch", detail="item_type")
+    def get_issues_PRs(self, item_type, columns=None, incremental=True):
         """
-        Obtain the issue or pull request history for a GitHub repository by querying the GraphQL API.
+        Obtain the issue or pull request history for a GitHub repository by querying the GraphQL API, and update the cache with new items.
 
         Arguments
         ---------
         item_type : str
             One of ['issues', 'pullRequests'] to obtain the corresponding history
+        columns : list of str, default=None
+            Cached columns to return (see `cache.SCHEMAS`). If None, those used by `GitMetrics.process_issues_PRs`
+        incremental : bool, default=True
+            If True and the cache isn't empty, fetch only items created or updated (e.g. closed or relabelled) since the last sync
+            (see `GitMetrics.sync_issues_PRs`). If False, fetch only items created after the newest cached item.
+            If 'columns' includes 'labels', those of open items are then synced (see `GitMetrics.sync_open_labels`)
 
         Returns
         -------
-        all_items : list of dict
-            A dictionary entry for each issue or pull request in the history, including the identifiers below in 'query'
+        all_items : dict of array
+            An array for each column in 'columns', with an entry for each issue or pull request in the history
         """
         print(f"\nCollecting GitHub {item_type} history")
 
@@ -409,18 +691,47 @@ class GitMetrics:
                 f"item_type {item_type} invalid; must be one of {supported_items}"
             )
 
-        cache_file = f"{self.cache_dir}/{self.repo_name}_{item_type}.txt"
-        if not os.path.exists(cache_file):
-            open(cache_file, "w").close()
+        if columns is None:
+            columns = self.issue_PR_columns
+
+        self.cache.migrate_text_cache(
+            f"{self.cache_dir}/{self.repo_name}_{item_type}.txt",
+            item_type,
+            self.dataset,
+        )
+        n_cached = self.cache.count(item_type, self.dataset)
+        print(f"  {n_cached} {item_type} found in cache at {self.cache.cache_file}")
+
+        # any item updated after the start of this query will be picked up by the next sync
+        sync_start = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        state_name = f"{item_type}_synced_at"
+
+        since = None
+        if incremental and n_cached > 0:
+            since = self.get_last_sync(item_type)
+
+        if since:
+            new_items = self.sync_issues_PRs(item_type, since)
+            self.update_cache(
+                item_type,
+                [issue_PR_record(x) for x in new_items],
+                state={state_name: sync_start},
+            )
+            if "labels" in columns:
+                self.sync_open_labels(item_type, sync_start)
+
+            return self.cache.load(item_type, self.dataset, columns)
 
-        with open(cache_file, "r") as f:
-            old_items = f.readlines()
-            print(f"  {len(old_items)} {item_type} found in cache at {cache_file}")
-        if old_items == []:
+        after = self.cache.last_cursor(item_type, self.dataset)
+        if after is None:
             after = ""
-        else:
-            # convert string to dict and get relevant key
-            after = ast.literal_eval(old_items[-1].rstrip("\n"))["endCursor"]
+
+        # a crawl from an empty cache is up to date as of its start (also once resumed after an interruption),
+        # while one resumed from the cursor of a complete crawl misses updates to already cached items
+        crawl_state = f"{item_type}_crawl_started"
+        crawl_start = sync_start
+        if n_cached > 0:
+            crawl_start = self.cache.get_state(self.dataset, crawl_state)
 
         # For query syntax, see https://docs.github.com/en/graphql/reference/objects#repository
         # and https://docs.github.com/en/graphql/reference/objects#issue
@@ -429,11 +740,17 @@ class GitMetrics:
         # To quickly test a query, try https://docs.github.com/en/graphql/overview/explorer
         query = (
             """
-        query($owner: String!, $name: String!, $after: String!) {
+        query($owner: String!, $name: String!, $after: String!, $first: Int!) {
+            rateLimit {
+                cost
+                remaining
+                resetAt
+            }
+
             repository(owner: $owner, name: $name) {
                 """
             + item_type
-            + """(first: 100, after: $after) {
+            + """(first: $first, after: $after) {
                     totalCount
 
                     pageInfo {
@@ -443,19 +760,9 @@ class GitMetrics:
 
                     edges {
                         node {
-                            number
-                            state
-                            createdAt
-                            updatedAt
-                            closedAt
-
-                            labels(first: 25) {
-                                edges {
-                                    node {
-                                        name
-                                    }
-                                }
-                            }
+                            """
+            + self.issue_PR_fields
+            + """
                         }
                     }
                 }
@@ -464,7 +771,6 @@ class GitMetrics:
         """
         )
 
-        headers = {"Authorization": f"token {self.token}"}
         # with 'after', traverse through items (issues or PRs) from oldest to newest
         variables = {
             "owner": self.repo_owner,
@@ -474,126 +780,1149 @@ class GitMetrics:
         # must traverse through pages of items
         hasNextPage = True
 
-        new_items = []
         items_retrieved = 0
-        while hasNextPage is True:
-            response = requests.post(
-                "https://api.github.com/graphql",
-                json={"query": query, "variables": variables},
-                headers=headers,
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                try:
-                    result["data"]
-                except KeyError as err:
-                    print(f"Query syntax is likely wrong. Reponse to query: {result}")
-                    raise err
-
-                items_retrieved += len(result["data"]["repository"][item_type]["edges"])
-                items_total = result["data"]["repository"][item_type]["totalCount"]
-
-                time_to_reset = datetime.fromtimestamp(
-                    int(response.headers["X-RateLimit-Reset"]) - time.time(),
-                    tz=timezone.utc,
-                ).strftime("%M:%S")
+        with (
+            CrawlPlan({item_type: self.issue_PR_nested}, self.client.budget) as plan,
+            CheckpointBuffer(
+                self.cache, item_type, self.dataset, self.checkpoint_size
+            ) as buffer,
+        ):
+            if n_cached == 0:
+                # written with the first checkpoint: until the crawl completes, the cache is resumed rather than synced
+                buffer.add([], state={crawl_state: crawl_start})
+
+            while hasNextPage is True:
+                variables["first"] = plan.next_query()[item_type]
+                data, headers = self.query_graphql(query, variables)
+                connection = data["repository"][item_type]
+
+                items_retrieved += len(connection["edges"])
+                items_total = connection["totalCount"]
+                if plan.update(
+                    {
+                        item_type: remaining_items(
+                            items_total, n_cached + items_retrieved
+                        )
+                    }
+                ):
+                    self.print_crawl_plan(plan)
 
-                if len(result["data"]["repository"][item_type]["edges"]) > 0:
+                if len(connection["edges"]) > 0:
                     print(
-                        f"\r  Retrieved {items_retrieved} new of {items_total} total {item_type} (rate limit used: {response.headers['X-RateLimit-Used']} of {response.headers['X-RateLimit-Limit']} - resets in {time_to_reset})",
+                        f"\r  Retrieved {items_retrieved} new of {items_total} total {item_type} ({self.rate_limit_status(headers)})",
                         end="",
                         flush=True,
                     )
 
                     # store ID of the chronologically newest item (issue or PR) on current page, used to later reference newest item in cache
-                    result["data"]["repository"][item_type]["edges"][-1][
+                    connection["edges"][-1]["endCursor"] = connection["pageInfo"][
                         "endCursor"
-                    ] = result["data"]["repository"][item_type]["pageInfo"]["endCursor"]
-                    new_items.extend(result["data"]["repository"][item_type]["edges"])
-
-                hasNextPage = result["data"]["repository"][item_type]["pageInfo"][
-                    "hasNextPage"
-                ]
+                    ]
+                    buffer.add([issue_PR_record(x) for x in connection["edges"]])
 
-                variables["after"] = result["data"]["repository"][item_type][
-                    "pageInfo"
-                ]["endCursor"]
+                hasNextPage = connection["pageInfo"]["hasNextPage"]
+                variables["after"] = connection["pageInfo"]["endCursor"]
 
-            else:
-                raise Exception(f"Query failed -- return code {response.status_code}")
+            if crawl_start is not None:
+                buffer.flush(state={state_name: crawl_start, crawl_state: None})
 
         # prevent last flush, without printing new line
         print("", end="")
 
-        all_items = update_cache(cache_file, old_items, new_items)
+        self.print_cache_update(buffer.n_written)
+        if "labels" in columns:
+            self.sync_open_labels(item_type, sync_start)
+        all_items = self.cache.load(item_type, self.dataset, columns)
 
         return all_items
 
-    def process_issues_PRs(self, results, items, labels, age_recent=90):
+    def get_last_sync(self, item_type):
         """
-        Process (obtain statistics for) and aggregate issue and pull request data in 'results'.
+        Get the time of the last sync of cached issues or pull requests with GitHub (see `GitMetrics.sync_issues_PRs`)
 
         Arguments
         ---------
-        results : list of dict
-            A dictionary entry for each issue or pull request in the history (see `Git_metrics.get_issues_PRs`)
-        items : list of str
-            Names for the dictionary entries in the return 'issues_prs'
-        labels : list of str
-            GitHub labels (those added to an issue or pull request) to obtain additional statistics for
-        age_recent : int, default=90
-            Days before present used to categorize recent issue and pull request statistics
+        item_type : str
+            One of ['issues', 'pullRequests']
 
         Returns
         -------
-        issues_prs : list of dict
-            Statistics for issues and separately for pull requests:
-                - 'age_recent': the input arg 'age_recent'
-                - 'recent_open': number of items (issues or pull requests) opened in 'age_recent'
-                - 'recent_close': number of items closed in 'age_recent'
-                - 'open_per_month': number of items opened per month, over time
-                - 'close_per_month': number of items closed per month, over time
-                - 'label_open': the input arg 'labels' and the number of currently open items with each label
+        since : str
+            Timestamp of the last sync, with format "2024-01-01T00:00:00Z" ("" if the cache is empty or a crawl from an empty cache
+            was interrupted, and so is to be resumed)
         """
-        issues_prs = {}
+        since = self.cache.get_state(self.dataset, f"{item_type}_synced_at")
+        if since is None and self.cache.get_state(
+            self.dataset, f"{item_type}_crawl_started"
+        ):
+            # an interrupted crawl from an empty cache: resume it rather than sync
+            since = ""
+        elif since is None:
+            # cache from before syncs were tracked: resume from its most recently updated item
+            updated = self.cache.load(item_type, self.dataset, ["updatedAt"])[
+                "updatedAt"
+            ]
+            since = max(updated, default="")
+
+        return since
+
+    def sync_issues_PRs(self, item_type, since):
+        """
+        Obtain the issues or pull requests in a GitHub repository that were created or updated (e.g. closed or relabelled) since 'since',
+        by querying the GraphQL API for items in order of most recently updated.
 
-        for hh, ii in enumerate(results):
-            recent_open, recent_close, date_open, date_close = 0, 0, [], []
-            label_open_items = np.zeros(len(labels))
-
-            for jj in ii:
-                # store dates as year-month e.g. '2024-01'
-                date_open.append(jj["node"]["createdAt"][:7])
-                if not jj["node"]["state"] == "OPEN":
-                    date_close.append(jj["node"]["closedAt"][:7])
-
-                # store age as days before present
-                created_age = self.get_age(jj["node"]["createdAt"])
-                if created_age != -1:
-                    created_age = created_age.days
-                    if created_age <= age_recent:
-                        recent_open += 1
-
-                closed_age = self.get_age(jj["node"]["closedAt"])
-                if closed_age != -1:
-                    closed_age = closed_age.days
-                    if closed_age <= age_recent:
-                        recent_close += 1
-
-                if jj["node"]["state"] == "OPEN":
-                    for kk in jj["node"]["labels"]["edges"]:
-                        try:
-                            label_open_items[labels.index(kk["node"]["name"])] += 1
-                        except ValueError:
-                            pass
-
-            open_per_month = np.unique(date_open, return_counts=True)
-            close_per_month = np.unique(date_close, return_counts=True)
-            # not every month has newly opened/closed issues/PRs,
-            # so insert missed months
-            open_per_month = fill_missed_months(open_per_month)
-            close_per_month = fill_missed_months(close_per_month)
+        Arguments
+        ---------
+        item_type : str
+            One of ['issues', 'pullRequests']
+        since : str
+            Timestamp of the last sync, with format "2024-01-01T00:00:00Z"
+
+        Returns
+        -------
+        new_items : list of dict
+            A dictionary entry for each issue or pull request updated since 'since'
+        """
+        print(f"  Syncing {item_type} updated since {since}")
+
+        # orderBy is supported by both the 'issues' and 'pullRequests' connections,
+        # see https://docs.github.com/en/graphql/reference/input-objects#issueorder
+        query = (
+            """
+        query($owner: String!, $name: String!, $after: String, $first: Int!) {
+            rateLimit {
+                cost
+                remaining
+                resetAt
+            }
+
+            repository(owner: $owner, name: $name) {
+                """
+            + item_type
+            + """(first: $first, after: $after, orderBy: {field: UPDATED_AT, direction: DESC}) {
+                    pageInfo {
+                        hasNextPage
+                        endCursor
+                    }
+
+                    edges {
+                        node {
+                            """
+            + self.issue_PR_fields
+            + """
+                        }
+                    }
+                }
+            }
+        }
+        """
+        )
+
+        variables = {
+            "owner": self.repo_owner,
+            "name": self.repo_name,
+            "after": None,
+        }
+        hasNextPage = True
+
+        new_items = []
+        # the number of items updated since the last sync is unknown, so the plan sets page sizes but doesn't predict or pace
+        # (see `query_plan.CrawlPlan`)
+        with CrawlPlan({item_type: self.issue_PR_nested}, self.client.budget) as plan:
+            while hasNextPage is True:
+                variables["first"] = plan.next_query()[item_type]
+                data, headers = self.query_graphql(query, variables)
+                connection = data["repository"][item_type]
+
+                # timestamps of the same format compare correctly as strings
+                updated = [
+                    x for x in connection["edges"] if x["node"]["updatedAt"] >= since
+                ]
+                new_items.extend(updated)
+
+                print(
+                    f"\r  Retrieved {len(new_items)} updated {item_type} ({self.rate_limit_status(headers)})",
+                    end="",
+                    flush=True,
+                )
+
+                # items are ordered by update time, so stop at the first one older than the last sync
+                hasNextPage = connection["pageInfo"]["hasNextPage"] and len(
+                    updated
+                ) == len(connection["edges"])
+                variables["after"] = connection["pageInfo"]["endCursor"]
+                plan.update({item_type: None} if hasNextPage else {})
+
+        # prevent last flush, without printing new line
+        print("", end="")
+
+        return new_items
+
+    @traced("fetch", detail="item_type")
+    def sync_open_labels(self, item_type, sync_start=None):
+        """
+        Update the labels of cached open issues or pull requests (the only items whose labels are processed, see
+        `GitMetrics.process_issues_PRs`) by querying the GraphQL API for open items only, in order of most recently updated,
+        down to those updated (e.g. relabelled or reopened) before the last label sync. History queries don't fetch labels,
+        which would otherwise be fetched for every item ever created.
+
+        Arguments
+        ---------
+        item_type : str
+            One of ['issues', 'pullRequests']
+        sync_start : str, default=None
+            Time the cached history was last fetched from (e.g. the start of `GitMetrics.get_issues_PRs`), with format
+            "2024-01-01T00:00:00Z", from which the next label sync starts: items opened since then may not yet be cached, so their
+            labels aren't updated by this sync. If None, the current time
+
+        Returns
+        -------
+        n_updated : int
+            Number of items whose labels were updated
+        """
+        state_name = f"{item_type}_labels_synced_at"
+        since = self.cache.get_state(self.dataset, state_name) or ""
+        if sync_start is None:
+            sync_start = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        print(
+            f"  Syncing labels of open {item_type}"
+            + (f" updated since {since}" if since else "")
+        )
+
+        # 'nodes' rather than 'edges', as no cursor per item is needed
+        query = (
+            """
+        query($owner: String!, $name: String!, $after: String, $first: Int!) {
+            rateLimit {
+                cost
+                remaining
+                resetAt
+            }
+
+            repository(owner: $owner, name: $name) {
+                """
+            + item_type
+            + """(states: OPEN, first: $first, after: $after, orderBy: {field: UPDATED_AT, direction: DESC}) {
+                    totalCount
+
+                    pageInfo {
+                        hasNextPage
+                        endCursor
+                    }
+
+                    nodes {
+                        number
+                        updatedAt
+
+                        labels(first: 25) {
+                            nodes {
+                                name
+                            }
+                        }
+                    }
+                }
+            }
+        }
+        """
+        )
+
+        variables = {
+            "owner": self.repo_owner,
+            "name": self.repo_name,
+            "after": None,
+        }
+        hasNextPage = True
+
+        records = []
+        # page sizes and pacing of the queries (see `query_plan.CrawlPlan`); only the first label sync, of all open items,
+        # knows how many items remain
+        with CrawlPlan({item_type: self.open_label_nested}, self.client.budget) as plan:
+            while hasNextPage is True:
+                variables["first"] = plan.next_query()[item_type]
+                data, headers = self.query_graphql(query, variables)
+                connection = data["repository"][item_type]
+
+                # timestamps of the same format compare correctly as strings
+                updated = [x for x in connection["nodes"] if x["updatedAt"] >= since]
+                records.extend(
+                    {
+                        "number": x["number"],
+                        "labels": [ll["name"] for ll in x["labels"]["nodes"]],
+                    }
+                    for x in updated
+                )
+
+                # as in 'sync_issues_PRs', stop at the first item older than the last label sync
+                hasNextPage = connection["pageInfo"]["hasNextPage"] and len(
+                    updated
+                ) == len(connection["nodes"])
+                variables["after"] = connection["pageInfo"]["endCursor"]
+
+                remaining = {}
+                if hasNextPage:
+                    remaining[item_type] = None
+                    if not since:
+                        remaining[item_type] = remaining_items(
+                            connection["totalCount"], len(records)
+                        )
+                if plan.update(remaining):
+                    self.print_crawl_plan(plan)
+
+                print(
+                    f"\r  Retrieved labels of {len(records)} open {item_type} ({self.rate_limit_status(headers)})",
+                    end="",
+                    flush=True,
+                )
+
+        # prevent last flush, without printing new line
+        print("", end="")
+
+        # records of items not yet cached are ignored
+        self.cache.update(
+            item_type, self.dataset, records, state={state_name: sync_start}
+        )
+        print(
+            f"\n  Updated labels of {len(records)} open {item_type} in cache at {self.cache.cache_file}"
+        )
+
+        return len(records)
+
+    def search_query(self, item_type, start, end):
+        """
+        GitHub search query for the issues or pull requests in this repository created from 'start' to 'end' (inclusive), in order of creation
+        (see https://docs.github.com/en/search-github/searching-on-github/searching-issues-and-pull-requests)
+
+        Arguments
+        ---------
+        item_type : str
+            One of ['issues', 'pullRequests']
+        start, end : int
+            Creation time of the first and last items, as seconds since 1970-01-01 (UTC)
+
+        Returns
+        -------
+        search_query : str
+            The search query
+        """
+        created = "..".join(
+            datetime.fromtimestamp(x, tz=timezone.utc).strftime(
+                "%Y-%m-%dT%H:%M:%S+00:00"
+            )
+            for x in (start, end)
+        )
+        kind = "issue" if item_type == "issues" else "pr"
+
+        return f"repo:{self.repo_owner}/{self.repo_name} is:{kind} created:{created} sort:created-asc"
+
+    def partition_issues_PRs(self, item_type, start, end):
+        """
+        Partition the issues or pull requests in this repository created from 'start' to 'end' into windows of creation time
+        that each have at most 'search_limit' items (the most a search returns), by halving windows with more.
+        The number of items in each candidate window is obtained with GitHub search counts, many per query.
+
+        Arguments
+        ---------
+        item_type : str
+            One of ['issues', 'pullRequests']
+        start, end : int
+            Creation time of the first and last items, as seconds since 1970-01-01 (UTC)
+
+        Returns
+        -------
+        windows : list of tuple
+            (start, end, number of items) of each window with any items, in order of creation time
+        """
+        windows, pending = [], [(start, end)]
+        while len(pending) > 0:
+            batch, pending = pending[:50], pending[50:]
+            # an aliased count for each window, see https://docs.github.com/en/graphql/reference/queries#search
+            query = (
+                "query {\n"
+                + "\n".join(
+                    f"w{ii}: search(query: {json.dumps(self.search_query(item_type, *ww))}, type: ISSUE, first: 0) {{ issueCount }}"
+                    for ii, ww in enumerate(batch)
+                )
+                + "\n}"
+            )
+            data, _ = self.query_graphql(query, {})
+
+            for ii, (ws, we) in enumerate(batch):
+                count = data[f"w{ii}"]["issueCount"]
+                if count > self.search_limit and we > ws:
+                    mid = (ws + we) // 2
+                    pending += [(ws, mid), (mid + 1, we)]
+                elif count > 0:
+                    if count > self.search_limit:
+                        print(
+                            f"\n  WARNING: {count} {item_type} created at {self.search_query(item_type, ws, we)} - only {self.search_limit} can be obtained"
+                        )
+                    windows.append((ws, we, count))
+
+        return sorted(windows)
+
+    def search_issues_PRs(self, item_type, start, end):
+        """
+        Obtain the issues or pull requests in this repository created from 'start' to 'end' (inclusive) with GitHub search queries
+
+        Arguments
+        ---------
+        item_type : str
+            One of ['issues', 'pullRequests']
+        start, end : int
+            Creation time of the first and last items, as seconds since 1970-01-01 (UTC)
+
+        Returns
+        -------
+        new_items : list of dict
+            A dictionary entry for each issue or pull request, in order of creation (at most 'search_limit')
+        """
+        # For query syntax, see https://docs.github.com/en/graphql/reference/queries#search
+        # and https://docs.github.com/en/graphql/reference/objects#searchresultitemconnection
+        query = (
+            """
+        query($query: String!, $after: String, $first: Int!) {
+            rateLimit {
+                cost
+                remaining
+                resetAt
+            }
+
+            search(query: $query, type: ISSUE, first: $first, after: $after) {
+                issueCount
+
+                pageInfo {
+                    hasNextPage
+                    endCursor
+                }
+
+                edges {
+                    node {
+                        ... on """
+            + ("Issue" if item_type == "issues" else "PullRequest")
+            + """ {
+                            """
+            + self.issue_PR_fields
+            + """
+                        }
+                    }
+                }
+            }
+        }
+        """
+        )
+
+        variables = {"query": self.search_query(item_type, start, end), "after": None}
+        hasNextPage = True
+
+        new_items = []
+        # page sizes and pacing of the queries, with those of windows crawled concurrently (see `query_plan.CrawlPlan`)
+        with CrawlPlan({item_type: self.issue_PR_nested}, self.client.budget) as plan:
+            while hasNextPage is True:
+                variables["first"] = plan.next_query()[item_type]
+                data, _ = self.query_graphql(query, variables)
+                connection = data["search"]
+
+                new_items.extend(connection["edges"])
+                hasNextPage = connection["pageInfo"]["hasNextPage"]
+                variables["after"] = connection["pageInfo"]["endCursor"]
+
+                remaining = {}
+                if hasNextPage:
+                    # a search returns at most 'search_limit' items
+                    remaining[item_type] = remaining_items(
+                        min(connection["issueCount"], self.search_limit), len(new_items)
+                    )
+                plan.update(remaining)
+
+        return new_items
+
+    @traced("fetch", detail="item_type")
+    def backfill_issues_PRs(self, item_type, max_workers=4):
+        """
+        Crawl the issue or pull request history for a GitHub repository into an empty cache, concurrently: the history is partitioned
+        into windows of creation time (see `GitMetrics.partition_issues_PRs`) that are crawled in parallel with GitHub search queries
+        (see `GitMetrics.search_issues_PRs`), and written to the cache in order of creation. Unlike a crawl with `GitMetrics.get_issues_PRs`,
+        no page waits for the cursor of the previous one (except within a window).
+
+        The cache is then up to date as of the start of the crawl, and is synced by `GitMetrics.get_issues_PRs`.
+        An interrupted crawl (including one by `GitMetrics.get_issues_PRs`) is resumed from the newest cached item.
+        Does nothing if the cache already holds a complete crawl.
+
+        Arguments
+        ---------
+        item_type : str
+            One of ['issues', 'pullRequests']
+        max_workers : int, default=4
+            Maximum number of windows crawled at once
+
+        Returns
+        -------
+        n_new : int
+            Number of items added to the cache
+        """
+        print(f"\nBackfilling GitHub {item_type} history")
+
+        self.cache.migrate_text_cache(
+            f"{self.cache_dir}/{self.repo_name}_{item_type}.txt",
+            item_type,
+            self.dataset,
+        )
+        n_cached = self.cache.count(item_type, self.dataset)
+        crawl_state = f"{item_type}_crawl_started"
+        crawl_start = self.cache.get_state(self.dataset, crawl_state)
+        if n_cached > 0 and crawl_start is None:
+            print(
+                f"  {n_cached} {item_type} found in cache at {self.cache.cache_file} - nothing to backfill"
+            )
+            return 0
+
+        if crawl_start is None:
+            crawl_start = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+        def timestamp(date):
+            return int(
+                datetime.strptime(date, "%Y-%m-%dT%H:%M:%SZ")
+                .replace(tzinfo=timezone.utc)
+                .timestamp()
+            )
+
+        start = 0
+        if n_cached > 0:
+            # items are cached in order of creation, so a crawl resumes from the newest
+            created = self.cache.load(item_type, self.dataset, ["createdAt"])[
+                "createdAt"
+            ]
+            start = timestamp(max(created))
+            print(
+                f"  Resuming crawl from {max(created)} ({n_cached} {item_type} in cache)"
+            )
+
+        windows = self.partition_issues_PRs(item_type, start, timestamp(crawl_start))
+        n_total = sum(x[2] for x in windows)
+        print(
+            f"  Crawling {n_total} {item_type} in {len(windows)} windows with {max_workers} workers"
+        )
+
+        # windows are written in order, so that an interrupted crawl leaves no gaps before its newest cached item;
+        # at most 'max_workers' windows are crawled ahead of those written, so they aren't held in memory
+        with (
+            CheckpointBuffer(
+                self.cache, item_type, self.dataset, self.checkpoint_size
+            ) as buffer,
+            ThreadPoolExecutor(max_workers=max_workers) as pool,
+        ):
+            buffer.add([], state={crawl_state: crawl_start})
+            crawled = ordered_map(
+                pool,
+                lambda x: self.search_issues_PRs(item_type, x[0], x[1]),
+                windows,
+                max_workers,
+            )
+            for edges in crawled:
+                buffer.add([issue_PR_record(x) for x in edges])
+                print(
+                    f"\r  Retrieved {buffer.n_written + len(buffer.records)} of {n_total} {item_type}",
+                    end="",
+                    flush=True,
+                )
+
+            buffer.flush(
+                state={f"{item_type}_synced_at": crawl_start, crawl_state: None}
+            )
+
+        # prevent last flush, without printing new line
+        print("", end="")
+
+        self.print_cache_update(buffer.n_written)
+
+        return buffer.n_written
+
+    @traced("fetch")
+    def get_histories(self, columns=None, incremental=True):
+        """
+        Obtain the commit, issue and pull request histories for a GitHub repository, and update the cache with new items,
+        as in `GitMetrics.get_commits` and `GitMetrics.get_issues_PRs`. Each GraphQL query advances all three histories at once,
+        so that fetching them takes up to 3x fewer queries (and rate limit points).
+
+        Arguments
+        ---------
+        columns : dict of (list of str), default=None
+            Cached columns to return for each of ['commits', 'issues', 'pullRequests']. If None, those used by
+            `GitMetrics.process_commits` and `GitMetrics.process_issues_PRs`. Only histories that are keys of 'columns' are obtained
+        incremental : bool, default=True
+            If True, sync cached issues and pull requests (see `GitMetrics.get_issues_PRs`)
+
+        Returns
+        -------
+        histories : dict of (dict of array)
+            For each history in 'columns', an array for each of its columns with an entry for each item
+        """
+        if columns is None:
+            columns = {
+                "commits": self.commit_columns,
+                "issues": self.issue_PR_columns,
+                "pullRequests": self.issue_PR_columns,
+            }
+        print(f"\nCollecting git {', '.join(columns)} histories")
+
+        sync_start = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+        # state of each history's traversal
+        histories = {}
+        for item_type in ["commits", "issues", "pullRequests"]:
+            if item_type not in columns:
+                continue
+
+            self.cache.migrate_text_cache(
+                f"{self.cache_dir}/{self.repo_name}_{item_type}.txt",
+                item_type,
+                self.dataset,
+            )
+            n_cached = self.cache.count(item_type, self.dataset)
+            print(f"  {n_cached} {item_type} found in cache at {self.cache.cache_file}")
+
+            since = None
+            if item_type != "commits" and incremental and n_cached > 0:
+                since = self.get_last_sync(item_type)
+
+            # as in 'get_issues_PRs', a crawl from an empty cache (also once resumed) is up to date as of its start
+            crawl_start = None
+            if item_type != "commits" and not since:
+                crawl_start = self.cache.get_state(
+                    self.dataset, f"{item_type}_crawl_started"
+                )
+                if n_cached == 0:
+                    crawl_start = sync_start
+
+            histories[item_type] = {
+                "n_cached": n_cached,
+                "since": since,
+                "after": (
+                    None if since else self.cache.last_cursor(item_type, self.dataset)
+                ),
+                "crawl_start": crawl_start,
+                "n_new": 0,
+            }
+
+        # For query syntax, see `GitMetrics.get_commits` and `GitMetrics.get_issues_PRs`;
+        # and for '@include', https://spec.graphql.org/October2021/#sec--include
+        # once a history has no more pages, '@include' drops it from the query
+        arguments = {}
+        for item_type in ["commits", "issues", "pullRequests"]:
+            arguments[item_type] = (
+                f"first: $first_{item_type}, after: $after_{item_type}"
+            )
+            if histories.get(item_type, {}).get("since"):
+                arguments[
+                    item_type
+                ] += ", orderBy: {field: UPDATED_AT, direction: DESC}"
+
+        query = (
+            """
+        query($owner: String!, $name: String!, $after_commits: String, $after_issues: String, $after_pullRequests: String,
+              $first_commits: Int!, $first_issues: Int!, $first_pullRequests: Int!,
+              $include_commits: Boolean!, $include_issues: Boolean!, $include_pullRequests: Boolean!) {
+            rateLimit {
+                cost
+                remaining
+                resetAt
+            }
+
+            repository(owner: $owner, name: $name) {
+                branch: """
+            + self.branch_ref()
+            + """ @include(if: $include_commits) {
+                    target {
+                        ... on Commit {
+                            history("""
+            + arguments["commits"]
+            + """) {
+                                totalCount
+
+                                pageInfo {
+                                    hasNextPage
+                                    endCursor
+                                }
+
+                                edges {
+                                    node {
+                                        """
+            + self.commit_fields
+            + """
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+                """
+        )
+        for item_type in ["issues", "pullRequests"]:
+            query += (
+                item_type
+                + "("
+                + arguments[item_type]
+                + ") @include(if: $include_"
+                + item_type
+                + """) {
+                    totalCount
+
+                    pageInfo {
+                        hasNextPage
+                        endCursor
+                    }
+
+                    edges {
+                        node {
+                            """
+                + self.issue_PR_fields
+                + """
+                        }
+                    }
+                }
+                """
+            )
+        query += """
+            }
+        }
+        """
+
+        variables = {"owner": self.repo_owner, "name": self.repo_name}
+        for item_type in ["commits", "issues", "pullRequests"]:
+            # histories not requested are dropped from the query from the start
+            variables[f"after_{item_type}"] = histories.get(item_type, {}).get("after")
+            variables[f"include_{item_type}"] = item_type in histories
+            variables[f"first_{item_type}"] = MAX_FIRST
+
+        # each history's pages are written to the cache in checkpoints (see `GitMetrics.get_issues_PRs`)
+        with ExitStack() as stack:
+            # page sizes of each query are planned to fetch the most items per rate limit point (see `query_plan.CrawlPlan`)
+            plan = stack.enter_context(
+                CrawlPlan(
+                    {
+                        item_type: (
+                            self.commit_nested
+                            if item_type == "commits"
+                            else self.issue_PR_nested
+                        )
+                        for item_type in histories
+                    },
+                    self.client.budget,
+                )
+            )
+            buffers = {
+                item_type: stack.enter_context(
+                    CheckpointBuffer(
+                        self.cache, item_type, self.dataset, self.checkpoint_size
+                    )
+                )
+                for item_type in histories
+            }
+            for item_type, hh in histories.items():
+                if hh["n_cached"] == 0 and hh["crawl_start"] is not None:
+                    buffers[item_type].add(
+                        [], state={f"{item_type}_crawl_started": hh["crawl_start"]}
+                    )
+
+            n_queries = 0
+            while any(variables[f"include_{x}"] for x in histories):
+                for item_type, first in plan.next_query().items():
+                    variables[f"first_{item_type}"] = first
+                data, headers = self.query_graphql(query, variables)
+                n_queries += 1
+
+                remaining = {}
+
+                for item_type, hh in histories.items():
+                    if not variables[f"include_{item_type}"]:
+                        continue
+
+                    if item_type == "commits":
+                        connection = data["repository"]["branch"]["target"]["history"]
+                    else:
+                        connection = data["repository"][item_type]
+                    edges = connection["edges"]
+
+                    if hh["since"]:
+                        # items are ordered by update time, so stop at the first one older than the last sync
+                        new_edges = [
+                            x for x in edges if x["node"]["updatedAt"] >= hh["since"]
+                        ]
+                        hasNextPage = connection["pageInfo"]["hasNextPage"] and len(
+                            new_edges
+                        ) == len(edges)
+                    else:
+                        new_edges = edges
+                        if len(edges) > 0:
+                            # store ID of the chronologically newest item on current page, used to later reference newest item in cache
+                            edges[-1]["endCursor"] = connection["pageInfo"]["endCursor"]
+                        hasNextPage = connection["pageInfo"]["hasNextPage"]
+
+                    record = (
+                        commit_record if item_type == "commits" else issue_PR_record
+                    )
+                    buffers[item_type].add([record(x) for x in new_edges])
+                    hh["n_new"] += len(new_edges)
+                    variables[f"after_{item_type}"] = connection["pageInfo"][
+                        "endCursor"
+                    ]
+                    variables[f"include_{item_type}"] = hasNextPage
+
+                    if hasNextPage:
+                        # a sync's number of items updated since the last sync is unknown
+                        remaining[item_type] = None
+                        if not hh["since"]:
+                            remaining[item_type] = remaining_items(
+                                connection["totalCount"], hh["n_cached"] + hh["n_new"]
+                            )
+
+                if plan.update(remaining):
+                    self.print_crawl_plan(plan)
+
+                retrieved = ", ".join(
+                    f"{hh['n_new']} {item_type}" for item_type, hh in histories.items()
+                )
+                print(
+                    f"\r  Retrieved {retrieved} in {n_queries} queries ({self.rate_limit_status(headers)})",
+                    end="",
+                    flush=True,
+                )
+
+            # as in 'get_issues_PRs', only a complete crawl from an empty cache or a sync brings items up to date
+            for item_type, hh in histories.items():
+                if hh["since"]:
+                    buffers[item_type].flush(
+                        state={f"{item_type}_synced_at": sync_start}
+                    )
+                elif hh["crawl_start"] is not None:
+                    buffers[item_type].flush(
+                        state={
+                            f"{item_type}_synced_at": hh["crawl_start"],
+                            f"{item_type}_crawl_started": None,
+                        }
+                    )
+
+        # prevent last flush, without printing new line
+        print("", end="")
+
+        all_items = {}
+        for item_type in histories:
+            self.print_cache_update(buffers[item_type].n_written)
+            if item_type != "commits" and "labels" in columns[item_type]:
+                self.sync_open_labels(item_type, sync_start)
+            all_items[item_type] = self.cache.load(
+                item_type, self.dataset, columns[item_type]
+            )
+
+        return all_items
+
+    @traced("fetch")
+    def count_recent_authors(self, age_recent=90):
+        """
+        Obtain the commit author statistics shown in dashboard images ('n_recent_authors' and 'new_authors', see `GitMetrics.process_commits`)
+        without the full commit history: commits are queried only for the last 'age_recent' days, and each of their authors is checked
+        for earlier commits with a count query (many per query). As in `GitMetrics.process_commits`, bots are skipped and commits are
+        attributed to a GitHub user or otherwise to a name, with each user under a single name, and authors counted by name;
+        as commit history can't be filtered by author name, earlier commits of an author without a GitHub user are found by the
+        emails of their recent commits.
+
+        Arguments
+        ---------
+        age_recent : int, default=90
+            Days before present used to categorize recent commit statistics
+
+        Returns
+        -------
+        stats : dict
+            'age_recent_commit', 'new_authors' and 'n_recent_authors'
+        """
+        print(f"\nCounting git commit authors in last {age_recent} days")
+
+        since = datetime.now(timezone.utc).date() - timedelta(days=age_recent)
+
+        # For query syntax, see `GitMetrics.get_commits` and https://docs.github.com/en/graphql/reference/objects#commit (history arguments)
+        query = (
+            """
+        query($owner: String!, $name: String!, $since: GitTimestamp!, $after: String, $first: Int!) {
+            rateLimit {
+                cost
+                remaining
+                resetAt
+            }
+
+            repository(name: $name, owner: $owner) {
+                branch: """
+            + self.branch_ref()
+            + """ {
+                    target {
+                        ... on Commit {
+                            history(first: $first, since: $since, after: $after) {
+                                totalCount
+
+                                pageInfo {
+                                    hasNextPage
+                                    endCursor
+                                }
+
+                                edges {
+                                    node {
+                                        authoredDate
+                                        author {
+                                            name
+                                            email
+                                            user {
+                                                id
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+        """
+        )
+
+        variables = {
+            "owner": self.repo_owner,
+            "name": self.repo_name,
+            "since": f"{since}T00:00:00Z",
+            "after": None,
+        }
+        hasNextPage = True
+
+        # for each author, their name (at their oldest recent commit), and GitHub user ID or emails to find their other commits
+        authors = {}
+        n_retrieved = 0
+        # page sizes and pacing of the queries (see `query_plan.CrawlPlan`)
+        with CrawlPlan({"commits": self.commit_nested}, self.client.budget) as plan:
+            while hasNextPage is True:
+                variables["first"] = plan.next_query()["commits"]
+                data, _ = self.query_graphql(query, variables)
+                history = data["repository"]["branch"]["target"]["history"]
+
+                for edge in history["edges"]:
+                    node = edge["node"]
+                    # as in 'process_commits', commits are dated by when they were authored
+                    if node["authoredDate"][:10] < str(since):
+                        continue
+
+                    author = node["author"]
+                    if author["name"] in self.bots:
+                        continue
+
+                    user = author["user"]["id"] if author["user"] is not None else None
+                    key = (
+                        ("user", user) if user is not None else ("name", author["name"])
+                    )
+                    aa = authors.setdefault(key, {"user": user, "emails": set()})
+                    aa["name"] = author["name"]
+                    aa["emails"].add(author["email"])
+
+                hasNextPage = history["pageInfo"]["hasNextPage"]
+                variables["after"] = history["pageInfo"]["endCursor"]
+
+                n_retrieved += len(history["edges"])
+                remaining = {}
+                if hasNextPage:
+                    remaining["commits"] = remaining_items(
+                        history["totalCount"], n_retrieved
+                    )
+                plan.update(remaining)
+
+        # authors without commits before 'since' are new.
+        # see https://docs.github.com/en/graphql/reference/input-objects#commitauthor
+        authors = list(authors.values())
+        for aa in authors:
+            if aa["user"] is not None:
+                aa["filter"] = f"{{id: {json.dumps(aa['user'])}}}"
+            else:
+                aa["filter"] = f"{{emails: {json.dumps(sorted(aa['emails']))}}}"
+
+        n_earlier = []
+        for bb in range(0, len(authors), 50):
+            batch = authors[bb : bb + 50]
+            query = (
+                """
+        query($owner: String!, $name: String!, $until: GitTimestamp!) {
+            repository(name: $name, owner: $owner) {
+                branch: """
+                + self.branch_ref()
+                + """ {
+                    target {
+                        ... on Commit {
+                            """
+                + "\n                            ".join(
+                    f"a{ii}: history(first: 0, until: $until, author: {aa['filter']}) {{ totalCount }}"
+                    for ii, aa in enumerate(batch)
+                )
+                + """
+                        }
+                    }
+                }
+            }
+        }
+        """
+            )
+            variables = {
+                "owner": self.repo_owner,
+                "name": self.repo_name,
+                "until": f"{since - timedelta(days=1)}T23:59:59Z",
+            }
+            data, _ = self.query_graphql(query, variables)
+            target = data["repository"]["branch"]["target"]
+
+            n_earlier += [target[f"a{ii}"]["totalCount"] for ii in range(len(batch))]
+
+        # as in 'process_commits', a user and commits without a user under the same name are one author,
+        # new if none of their commits are before 'since'
+        n_earlier_by_name = {}
+        for aa, nn in zip(authors, n_earlier):
+            n_earlier_by_name[aa["name"]] = n_earlier_by_name.get(aa["name"], 0) + nn
+        new_authors = [kk for kk, nn in n_earlier_by_name.items() if nn == 0]
+
+        print(f"  {len(n_earlier_by_name)} authors, {len(new_authors)} new")
+
+        stats = {
+            "age_recent_commit": age_recent,
+            "new_authors": new_authors,
+            "n_recent_authors": len(n_earlier_by_name),
+        }
+
+        return stats
+
+    @traced("fetch")
+    def count_issues_PRs(self, age_recent=90):
+        """
+        Obtain the issue and pull request statistics shown in dashboard images ('recent_open' and 'recent_close', see `GitMetrics.process_issues_PRs`)
+        without the full histories, with GitHub search counts in a single query
+
+        Arguments
+        ---------
+        age_recent : int, default=90
+            Days before present used to categorize recent issue and pull request statistics
+
+        Returns
+        -------
+        stats : dict
+            For each of 'issues' and 'pullRequests', 'age_recent', 'recent_open' and 'recent_close'
+        """
+        print(f"\nCounting GitHub issues and pull requests in last {age_recent} days")
+
+        since = datetime.now(timezone.utc).date() - timedelta(days=age_recent)
+
+        # an aliased count for each statistic, see `GitMetrics.partition_issues_PRs`
+        counts = {}
+        for item_type, kind in [("issues", "issue"), ("pullRequests", "pr")]:
+            for stat, qualifier in [
+                ("recent_open", "created"),
+                ("recent_close", "closed"),
+            ]:
+                counts[f"{item_type}_{stat}"] = (
+                    f"repo:{self.repo_owner}/{self.repo_name} is:{kind} {qualifier}:>={since}"
+                )
+        query = (
+            "query {\n"
+            + "\n".join(
+                f"{kk}: search(query: {json.dumps(vv)}, type: ISSUE, first: 0) {{ issueCount }}"
+                for kk, vv in counts.items()
+            )
+            + "\n}"
+        )
+        data, _ = self.query_graphql(query, {})
+
+        stats = {}
+        for item_type in ["issues", "pullRequests"]:
+            stats[item_type] = {
+                "age_recent": age_recent,
+                "recent_open": data[f"{item_type}_recent_open"]["issueCount"],
+                "recent_close": data[f"{item_type}_recent_close"]["issueCount"],
+            }
+
+        return stats
+
+    @traced("process")
+    def process_issues_PRs(self, results, items, labels, age_recent=90):
+        """
+        Process (obtain statistics for) and aggregate issue and pull request data in 'results'.
+
+        Arguments
+        ---------
+        results : list of (dict of array or list of dict)
+            Cached columns for each issue or pull request in the history (see `Git_metrics.get_issues_PRs`), or a dictionary entry for each item as returned by the GraphQL API
+        items : list of str
+            Names for the dictionary entries in the return 'issues_prs'
+        labels : list of str
+            GitHub labels (those added to an issue or pull request) to obtain additional statistics for
+        age_recent : int, default=90
+            Days before present used to categorize recent issue and pull request statistics
+
+        Returns
+        -------
+        issues_prs : list of dict
+            Statistics for issues and separately for pull requests:
+                - 'age_recent': the input arg 'age_recent'
+                - 'recent_open': number of items (issues or pull requests) opened in 'age_recent'
+                - 'recent_close': number of items closed in 'age_recent'
+                - 'open_per_month': number of items opened per month, over time
+                - 'close_per_month': number of items closed per month, over time
+                - 'label_open': the input arg 'labels' and the number of currently open items with each label
+        """
+        issues_prs = {}
+
+        # index of each label in 'labels'
+        label_index = {x: i for i, x in enumerate(labels)}
+        today = np.datetime64(datetime.now(timezone.utc).date(), "D")
+
+        results = [
+            (
+                ii
+                if isinstance(ii, dict)
+                else to_columns("issues", ii, self.issue_PR_columns)
+            )
+            for ii in results
+        ]
+        # dates as 'datetime64[D]'
+        all_created = [
+            np.asarray(ii["createdAt"], dtype="U10").astype("datetime64[D]")
+            for ii in results
+        ]
+        # all monthly series span the same months (first item opened to present)
+        month_start = min(
+            (month_index(x).min() for x in all_created if len(x) > 0), default=None
+        )
+
+        for hh, ii in enumerate(results):
+            created = all_created[hh]
+            # missing 'closedAt' as NaT
+            closed = np.asarray(ii["closedAt"], dtype="U10").astype("datetime64[D]")
+            is_open = np.asarray(ii["state"]) == "OPEN"
+            has_closed = ~np.isnat(closed)
+
+            # age as days before present
+            recent_open = int(np.sum(today - created <= age_recent))
+            recent_close = int(np.sum(today - closed[has_closed] <= age_recent))
+
+            # not every month has newly opened/closed issues/PRs,
+            # so months without any have a count of 0
+            open_per_month = monthly_counts(month_index(created), start=month_start)
+            close_per_month = monthly_counts(
+                month_index(closed[~is_open & has_closed]), start=month_start
+            )
+
+            # labels of currently open items
+            label_idx = [
+                label_index[kk]
+                for item_labels in ii["labels"][is_open]
+                if item_labels is not None
+                for kk in item_labels
+                if kk in label_index
+            ]
+            label_open_items = np.bincount(
+                np.array(label_idx, dtype=int), minlength=len(labels)
+            ).astype(float)
 
             issues_prs[items[hh]] = {
                 "age_recent": age_recent,
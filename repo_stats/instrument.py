@@ -0,0 +1,293 @@
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:
+    # Unix only; without it, peak memory isn't reported
+    resource = None
+
+
+class Tracer:
+    def __init__(self):
+        """
+        Class for instrumenting a run: timed spans around its stages (e.g. fetching, cache reads and writes, processing, rendering)
+        and named metrics (e.g. request counts and bytes transferred), summarized as a JSON run report or a Chrome trace.
+        Nothing is recorded until `Tracer.enable` is called, so instrumented code has negligible overhead otherwise.
+        """
+        self.enabled = False
+        self.spans = []
+        self.metrics = {}
+        self.start = None
+        self._lock = threading.Lock()
+
+    def enable(self):
+        """Start recording (clearing anything already recorded)"""
+        with self._lock:
+            self.enabled = True
+            self.spans = []
+            self.metrics = {}
+            self.start = time.time()
+
+    def disable(self):
+        """Stop recording"""
+        self.enabled = False
+
+    @contextmanager
+    def span(self, name, category="run", **args):
+        """
+        Time the enclosed block as a span
+
+        Arguments
+        ---------
+        name : str
+            Span name, e.g. "fetch issues"
+        category : str, default="run"
+            Span category, e.g. "fetch", "cache", "process" or "render"
+        **args
+            Details to record with the span, e.g. the number of items processed
+        """
+        if not self.enabled:
+            yield args
+            return
+
+        start = time.time()
+        try:
+            # the caller can add details (e.g. the number of items fetched) to 'args' within the span
+            yield args
+        finally:
+            self.add_span(name, category, start, time.time() - start, args=args)
+
+    def add_span(self, name, category, start, duration, pid=None, tid=None, args=None):
+        """
+        Record a span timed elsewhere, e.g. in a worker process
+
+        Arguments
+        ---------
+        name : str
+            Span name
+        category : str
+            Span category
+        start : float
+            Start time, as seconds since the epoch
+        duration : float
+            Duration in seconds
+        pid, tid : int, default=None
+            Process and thread that ran the span. If None, the current process and thread
+        args : dict, default=None
+            Details to record with the span
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self.spans.append(
+                {
+                    "name": name,
+                    "category": category,
+                    "start": start,
+                    "duration": duration,
+                    "pid": os.getpid() if pid is None else pid,
+                    "tid": threading.get_ident() if tid is None else tid,
+                    "args": {} if args is None else args,
+                }
+            )
+
+    def record(self, name, values):
+        """
+        Record named metrics, e.g. request counts and bytes transferred by an `client.APIClient` (see `APIClient.summary`)
+
+        Arguments
+        ---------
+        name : str
+            Name of the metrics, e.g. "github"
+        values : dict
+            Metric values, updating any already recorded under 'name'
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self.metrics.setdefault(name, {}).update(values)
+
+    def record_client(self, name, client):
+        """
+        Record the request metrics (see `APIClient.summary`) and rate limit consumption (including the cost reported by
+        GraphQL responses, see `RateLimitBudget.update_graphql`) of a `client.APIClient`
+
+        Arguments
+        ---------
+        name : str
+            Name of the metrics, e.g. "github"
+        client : `client.APIClient` instance
+            Client whose requests are recorded
+        """
+        values = client.summary()
+        if client.budget is not None:
+            values.update(
+                {
+                    "rate_limit_queries": client.budget.n_queries,
+                    "rate_limit_used": client.budget.used,
+                    "rate_limit_remaining": client.budget.remaining,
+                    "rate_limit_limit": client.budget.limit,
+                    "rate_limit_cost": client.budget.cost,
+                }
+            )
+        self.record(name, values)
+
+    def report(self):
+        """
+        Summarize the run
+
+        Returns
+        -------
+        report : dict
+            Run start and duration; total, count and maximum duration of the spans with each name (in order of first start);
+            recorded metrics; peak resident memory (MB, None if unavailable) of this process and of its (finished) child processes; and all spans
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda x: x["start"])
+            metrics = {kk: dict(vv) for kk, vv in self.metrics.items()}
+
+        stages = {}
+        for ss in spans:
+            stage = stages.setdefault(
+                ss["name"],
+                {"category": ss["category"], "count": 0, "total": 0.0, "max": 0.0},
+            )
+            stage["count"] += 1
+            stage["total"] += ss["duration"]
+            stage["max"] = max(stage["max"], ss["duration"])
+
+        report = {
+            "start": datetime.fromtimestamp(self.start, tz=timezone.utc).strftime(
+                "%Y-%m-%dT%H:%M:%SZ"
+            ),
+            "duration": time.time() - self.start,
+            "stages": stages,
+            "metrics": metrics,
+            "peak_rss": {
+                "self": peak_rss("self"),
+                "children": peak_rss("children"),
+            },
+            "spans": spans,
+        }
+
+        return report
+
+    def write_report(self, report_file):
+        """
+        Save the run report (see `Tracer.report`) as JSON
+
+        Arguments
+        ---------
+        report_file : str
+            Path to .json file
+        """
+        with open(report_file, "w") as f:
+            json.dump(self.report(), f, indent=4, default=str)
+        print(f"\nSaved run report as {report_file}")
+
+    def write_chrome_trace(self, trace_file):
+        """
+        Save the spans in the Chrome trace event format, viewable in chrome://tracing or https://ui.perfetto.dev
+        (see https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU)
+
+        Arguments
+        ---------
+        trace_file : str
+            Path to .json file
+        """
+        with self._lock:
+            events = [
+                {
+                    "name": ss["name"],
+                    "cat": ss["category"],
+                    # complete event, with times in microseconds
+                    "ph": "X",
+                    "ts": (ss["start"] - self.start) * 1e6,
+                    "dur": ss["duration"] * 1e6,
+                    "pid": ss["pid"],
+                    "tid": ss["tid"],
+                    "args": ss["args"],
+                }
+                for ss in self.spans
+            ]
+
+        with open(trace_file, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+        print(f"\nSaved Chrome trace as {trace_file}")
+
+
+def peak_rss(who="self"):
+    """
+    Peak resident memory
+
+    Arguments
+    ---------
+    who : str, default="self"
+        "self" for this process, or "children" for the largest of its finished child processes
+
+    Returns
+    -------
+    rss : float
+        Peak resident memory in MB (None if unavailable, e.g. on Windows)
+    """
+    if resource is None:
+        return None
+
+    usage = {"self": resource.RUSAGE_SELF, "children": resource.RUSAGE_CHILDREN}[who]
+    rss = resource.getrusage(usage).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return rss / 1e6 if sys.platform == "darwin" else rss / 1e3
+
+
+# shared by all instrumented code in a run
+tracer = Tracer()
+
+
+def span(name, category="run", **args):
+    """Time the enclosed block as a span of the shared tracer (see `Tracer.span`)"""
+    return tracer.span(name, category, **args)
+
+
+def traced(category, detail=None):
+    """
+    Decorator timing each call of a function (or method) as a span of the shared tracer, named by the function
+
+    Arguments
+    ---------
+    category : str
+        Span category, e.g. "fetch" or "process"
+    detail : str, default=None
+        Name of an argument of the function whose value is added to the span name, e.g. "item_type" for
+        'GitMetrics.get_issues_PRs(issues)'
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+
+            name = func.__qualname__
+            if detail is not None:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                name += f"({bound.arguments[detail]})"
+
+            with tracer.span(name, category):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -1,6 +1,7 @@
 from datetime import datetime, timezone
 
-import matplotlib.pyplot as plt
+import matplotlib as mpl
+from matplotlib.figure import Figure
 from matplotlib.lines import Line2D
 
 from repo_stats.utilities import rolling_average
@@ -8,12 +9,41 @@ from repo_stats.utilities import rolling_average
 ms = [".", "+", "^", "*", "x", "o"]
 cs = ["#ff8300", "#23d361", "#bf177a", "#20c8ed"]
 
-plt.rcParams['font.size'] = 11
+mpl.rcParams['font.size'] = 11
 
 now = datetime.now(timezone.utc).strftime("%B %d, %Y")
 
 
-def author_time_plot(commit_stats, repo_owner, repo_name, cache_dir, window_avg=7):
+def new_axes(fig=None):
+    """
+    Prepare a figure and its axes to plot on. Figures are created with the object-oriented API rather than 'pyplot',
+    so they aren't retained by 'pyplot' and are freed once no longer referenced.
+
+    Arguments
+    ---------
+    fig : `matplotlib.figure.Figure` instance, default=None
+        Figure to reuse, cleared of its current contents. If None, a new figure
+
+    Returns
+    -------
+    fig : `matplotlib.figure.Figure` instance
+        The figure
+    ax : `matplotlib.axes.Axes` instance
+        The figure's axes
+    """
+    if fig is None:
+        fig = Figure(figsize=(10, 6))
+    else:
+        fig.clear()
+
+    ax = fig.subplots()
+
+    return fig, ax
+
+
+def author_time_plot(
+    commit_stats, repo_owner, repo_name, cache_dir, window_avg=7, fig=None
+):
     """
     Plot respository commit authors over time.
 
@@ -29,10 +59,12 @@ def author_time_plot(commit_stats, repo_owner, repo_name, cache_dir, window_avg=
         Name of directory in which to cache figure
     window_avg : int, default=7
         Number of months for rolling average of commit data. Enforced to be odd.
+    fig : `matplotlib.figure.Figure` instance, default=None
+        Figure to draw into, cleared first (e.g. to reuse one figure across calls). If None, a new figure
 
     Returns
     -------
-    fig : `plt.figure` instance
+    fig : `matplotlib.figure.Figure` instance
         The generated figure
     """
     print("\nMaking figure: commit authors over time")
@@ -53,50 +85,49 @@ def author_time_plot(commit_stats, repo_owner, repo_name, cache_dir, window_avg=
     roll_avg_multi, window_avg = rolling_average(multi_authors, window_avg)
     cut_idx = window_avg // 2
 
-    fig = plt.figure(figsize=(10, 6))
-    plt.plot(months, authors, "k", alpha=0.2, label="Authors / month")
+    fig, ax = new_axes(fig)
+    ax.plot(months, authors, "k", alpha=0.2, label="Authors / month")
 
-    plt.plot(
+    ax.plot(
         months[cut_idx:-cut_idx],
         roll_avg,
         "k",
         label=f"Authors / month: {window_avg} month rolling average",
     )
 
-    plt.plot(
+    ax.plot(
         months_multi_authors,
         multi_authors,
         "r",
         alpha=0.2,
         label="Authors with >1 commit / month",
     )
-    plt.plot(
+    ax.plot(
         months[cut_idx:-cut_idx],
         roll_avg_multi,
         "r",
         label=f"Authors with >1 commit / month: {window_avg} month rolling average",
     )
 
-    plt.plot(months_new_authors, new_authors, cs[3], label="New authors / month")
+    ax.plot(months_new_authors, new_authors, cs[3], label="New authors / month")
 
-    plt.axhline(0, c="k", ls="--")
+    ax.axhline(0, c="k", ls="--")
 
-    plt.xticks(ticks=months[::12], labels=[x[:4] for x in months[::12]])#, rotation=90)
+    ax.set_xticks(ticks=months[::12], labels=[x[:4] for x in months[::12]])#, rotation=90)
 
-    plt.title(
+    ax.set_title(
         f"Unique authors of commits to {repo_owner}/{repo_name} (generated on {now})"
     )
-    plt.legend()
-    plt.xlabel(f"Date ({datetime.strptime(months[0], '%Y-%m').strftime('%B')} of each year)")
-    plt.ylabel("N")
-    plt.tight_layout()
-    plt.savefig(f"{cache_dir}/{repo_name}_authors.png", dpi=300)
-    # plt.show(block=False)
+    ax.legend()
+    ax.set_xlabel(f"Date ({datetime.strptime(months[0], '%Y-%m').strftime('%B')} of each year)")
+    ax.set_ylabel("N")
+    fig.tight_layout()
+    fig.savefig(f"{cache_dir}/{repo_name}_authors.png", dpi=300)
 
     return fig
 
 
-def citation_plot(cite_stats, repo_name, cache_dir, names=None):
+def citation_plot(cite_stats, repo_name, cache_dir, names=None, fig=None):
     """
     Plot citations to referenced papers over time.
 
@@ -110,25 +141,28 @@ def citation_plot(cite_stats, repo_name, cache_dir, names=None):
         Name of directory in which to cache figure
     names : list of str, optional
         Name of referenced papers (for plot legend)
+    fig : `matplotlib.figure.Figure` instance, default=None
+        Figure to draw into, cleared first (e.g. to reuse one figure across calls). If None, a new figure
 
     Returns
     -------
-    fig : `plt.figure` instance
+    fig : `matplotlib.figure.Figure` instance
         The generated figure
     """
     print("\nMaking figure: citations over time")
 
     days_passed = datetime.today().month * 30.437 + datetime.today().day
 
-    fig = plt.figure(figsize=(10, 6))
+    fig, ax = new_axes(fig)
     for ii, xx in enumerate(cite_stats):
-        cites = cite_stats[xx]["cite_per_year"]
+        # copy, so the stats aren't modified below
+        cites = list(cite_stats[xx]["cite_per_year"])
 
         # remove one citation that has wrong year in ADS database
         if names[ii] == "Astropy paper II (2018)":
             cites[0], cites[1] = cites[0][1:], cites[1][1:]
 
-        (line,) = plt.plot(
+        (line,) = ax.plot(
             cites[0][:-1],
             cites[1][:-1],
             marker=ms[ii],
@@ -139,13 +173,13 @@ def citation_plot(cite_stats, repo_name, cache_dir, names=None):
         if names[ii] == "All unique citations":
             line.set_linestyle("--")
 
-        plt.plot(
+        ax.plot(
             cites[0][-1],
             cites[1][-1],
             marker=ms[-2],
             c=cs[ii],
         )
-        plt.plot(
+        ax.plot(
             cites[0][-1],
             int(cites[1][-1] * 365 / days_passed),
             marker=ms[-1],
@@ -153,7 +187,7 @@ def citation_plot(cite_stats, repo_name, cache_dir, names=None):
             mfc="none",
         )
 
-    handles, _ = plt.gca().get_legend_handles_labels()
+    handles, _ = ax.get_legend_handles_labels()
     point0 = Line2D(
         [0], [0], linestyle="", marker=ms[-2], label="Year-to-date", color="#a4a4a4"
     )
@@ -167,19 +201,18 @@ def citation_plot(cite_stats, repo_name, cache_dir, names=None):
         markerfacecolor="none",
     )
     handles.extend([point0, point1])
-    plt.legend(handles=handles)
+    ax.legend(handles=handles)
 
-    plt.title(f"Refereed citations to {repo_name} (via ADS) (generated on {now})")
-    plt.xlabel("Year")
-    plt.ylabel("N")
-    plt.tight_layout()
-    plt.savefig(f"{cache_dir}/{repo_name}_citations.png", dpi=300)
-    # plt.show(block=False)
+    ax.set_title(f"Refereed citations to {repo_name} (via ADS) (generated on {now})")
+    ax.set_xlabel("Year")
+    ax.set_ylabel("N")
+    fig.tight_layout()
+    fig.savefig(f"{cache_dir}/{repo_name}_citations.png", dpi=300)
 
     return fig
 
 
-def open_issue_PR_plot(issue_pr_stats, repo_name, cache_dir):
+def open_issue_PR_plot(issue_pr_stats, repo_name, cache_dir, fig=None):
     """
     Plot a bar chart of a repository's currently open issues and pull requests.
 
@@ -192,9 +225,12 @@ def open_issue_PR_plot(issue_pr_stats, repo_name, cache_dir):
     cache_dir : str
         Name of directory in which to cache figure
 
+    fig : `matplotlib.figure.Figure` instance, default=None
+        Figure to draw into, cleared first (e.g. to reuse one figure across calls). If None, a new figure
+
     Returns
     -------
-    fig : `plt.figure` instance
+    fig : `matplotlib.figure.Figure` instance
         The generated figure
     """
     print("\nMaking figure: currently open issues and pull requests")
@@ -203,25 +239,26 @@ def open_issue_PR_plot(issue_pr_stats, repo_name, cache_dir):
     open_issues = issue_pr_stats["issues"]["label_open"].values()
     open_prs = issue_pr_stats["pullRequests"]["label_open"].values()
 
-    fig = plt.figure(figsize=(10, 6))
+    fig, ax = new_axes(fig)
 
-    plt.bar(labels, open_issues, color=cs[3], label="Open issues")
-    plt.bar(labels, open_prs, color="r", alpha=0.4, label="Open PRs")
+    ax.bar(labels, open_issues, color=cs[3], label="Open issues")
+    ax.bar(labels, open_prs, color="r", alpha=0.4, label="Open PRs")
 
-    plt.xticks(rotation=90)
+    ax.tick_params(axis="x", labelrotation=90)
 
-    plt.title(f"Open issues and PRs per {repo_name} subpackage (generated on {now})")
-    plt.legend()
-    plt.xlabel("Subpackage")
-    plt.ylabel("N")
-    plt.tight_layout()
-    plt.savefig(f"{cache_dir}/{repo_name}_open_items.png", dpi=300)
-    # plt.show(block=False)
+    ax.set_title(f"Open issues and PRs per {repo_name} subpackage (generated on {now})")
+    ax.legend()
+    ax.set_xlabel("Subpackage")
+    ax.set_ylabel("N")
+    fig.tight_layout()
+    fig.savefig(f"{cache_dir}/{repo_name}_open_items.png", dpi=300)
 
     return fig
 
 
-def issue_PR_time_plot(issue_pr_stats, repo_owner, repo_name, cache_dir, window_avg=7):
+def issue_PR_time_plot(
+    issue_pr_stats, repo_owner, repo_name, cache_dir, window_avg=7, fig=None
+):
     """
     Plot a repository's number of issues and pull requests open and closed over time.
 
@@ -237,10 +274,12 @@ def issue_PR_time_plot(issue_pr_stats, repo_owner, repo_name, cache_dir, window_
         Name of directory in which to cache figure
     window_avg : int, default=7
         Number of months for rolling average of commit data. Enforced to be odd.
+    fig : `matplotlib.figure.Figure` instance, default=None
+        Figure to draw into, cleared first (e.g. to reuse one figure across calls). If None, a new figure
 
     Returns
     -------
-    fig : `plt.figure` instance
+    fig : `matplotlib.figure.Figure` instance
         The generated figure
     """
     print("\nMaking figure: issues and pull requests over time")
@@ -270,29 +309,28 @@ def issue_PR_time_plot(issue_pr_stats, repo_owner, repo_name, cache_dir, window_
         "Issues closed / month",
     ]
 
-    fig = plt.figure(figsize=(10, 6))
+    fig, ax = new_axes(fig)
     for i, j in enumerate(events):
-        plt.plot(months[i], j, cs[i], alpha=0.2, label=labels[i])
+        ax.plot(months[i], j, cs[i], alpha=0.2, label=labels[i])
 
         roll_avg, window_avg = rolling_average(j, window_avg)
         cut_idx = window_avg // 2
-        plt.plot(
+        ax.plot(
             months[i][cut_idx:-cut_idx],
             roll_avg,
             cs[i],
             label=f"{labels[i]}: {window_avg} month rolling average",
         )
 
-    plt.xticks(ticks=months[i][::12], labels=[x[:4] for x in months[i][::12]])#, rotation=90)
+    ax.set_xticks(ticks=months[i][::12], labels=[x[:4] for x in months[i][::12]])#, rotation=90)
 
-    plt.title(
+    ax.set_title(
         f"Issues and PRs opened and closed in {repo_owner}/{repo_name} (generated on {now})"
     )
-    plt.legend(ncol=2)
-    plt.xlabel(f"Date ({datetime.strptime(months[i][0], '%Y-%m').strftime('%B')} of each year)")
-    plt.ylabel("N")
-    plt.tight_layout()
-    plt.savefig(f"{cache_dir}/{repo_name}_issues_PRs.png", dpi=300)
-    # plt.show(block=False)
+    ax.legend(ncol=2)
+    ax.set_xlabel(f"Date ({datetime.strptime(months[i][0], '%Y-%m').strftime('%B')} of each year)")
+    ax.set_ylabel("N")
+    fig.tight_layout()
+    fig.savefig(f"{cache_dir}/{repo_name}_issues_PRs.png", dpi=300)
 
     return fig
@@ -0,0 +1,260 @@
+import math
+import time
+
+# maximum page size ('first') of a GitHub GraphQL connection
+MAX_FIRST = 100
+
+
+def n_requests(connections, n_parents=1):
+    """
+    Number of requests GitHub counts towards the rate limit cost of a query's connections: each connection counts a request
+    for each of its parent nodes, assuming every connection returns its full page ('first') of nodes
+    (see https://docs.github.com/en/graphql/overview/rate-limits-and-node-limits-for-the-graphql-api#calculating-a-rate-limit-score-before-running-the-call)
+
+    Arguments
+    ---------
+    connections : list of tuple
+        (first, nested connections) of each connection, e.g. [(100, [(25, [])])] for 'issues(first: 100) { labels(first: 25) }'
+    n_parents : int, default=1
+        Number of parent nodes of the connections
+
+    Returns
+    -------
+    n : int
+        Number of requests
+    """
+    return sum(
+        n_parents + n_requests(nested, n_parents * first)
+        for first, nested in connections
+    )
+
+
+def query_cost(connections):
+    """
+    Rate limit cost of a GitHub GraphQL query in points: its number of requests (see `n_requests`) divided by 100
+    and rounded to the nearest whole number, and at least 1
+
+    Arguments
+    ---------
+    connections : list of tuple
+        (first, nested connections) of each top-level connection in the query
+
+    Returns
+    -------
+    cost : int
+        Rate limit points
+    """
+    return max(1, math.floor(n_requests(connections) / 100 + 0.5))
+
+
+def plan_page_sizes(connections, remaining=None, max_first=MAX_FIRST):
+    """
+    Choose the page size ('first') of each connection queried at once (e.g. the commit, issue and pull request histories in
+    `GitMetrics.get_histories`) that maximizes the number of nodes per rate limit point. Each connection's page costs a request,
+    plus its nested connections' requests for each node (e.g. labels of each issue), so pages of connections without nested ones
+    are free up to 'max_first', while the others share the requests that round to the same number of points.
+
+    Arguments
+    ---------
+    connections : dict
+        Nested connections of each node of each connection, e.g. {'commits': [], 'issues': [(25, [])]} (see `n_requests`)
+    remaining : dict, default=None
+        Number of nodes not yet fetched for each connection (None if unknown), which bounds its page size
+    max_first : int, default=MAX_FIRST
+        Maximum page size
+
+    Returns
+    -------
+    page_sizes : dict
+        Page size for each connection
+    cost : int
+        Rate limit cost of the query (see `query_cost`)
+    """
+    if remaining is None:
+        remaining = {}
+    caps = {}
+    for name in connections:
+        cap = remaining.get(name)
+        caps[name] = max_first if cap is None else max(min(cap, max_first), 1)
+    # requests per node of each connection
+    per_node = {name: n_requests(nested) for name, nested in connections.items()}
+
+    def full_query(page_sizes):
+        return [(page_sizes[name], connections[name]) for name in connections]
+
+    max_cost = query_cost(full_query(caps))
+    best, best_cost = None, None
+    for cost in range(1, max_cost + 1):
+        # most requests that round to 'cost' points, less a request for each connection's page
+        available = 100 * cost + 49 - len(connections)
+
+        # free connections take full pages; the others share 'available' requests evenly (fewest requests per node first)
+        page_sizes = {name: caps[name] for name in connections if per_node[name] == 0}
+        for rr in sorted({x for x in per_node.values() if x > 0}):
+            names = sorted(
+                (name for name in connections if per_node[name] == rr),
+                key=lambda x: caps[x],
+            )
+            for ii, name in enumerate(names):
+                share = available // rr // (len(names) - ii)
+                page_sizes[name] = max(min(caps[name], share), 1)
+                available -= page_sizes[name] * rr
+
+        nodes = sum(page_sizes.values())
+        points = query_cost(full_query(page_sizes))
+        # most nodes per point, then fewest queries
+        if best is None or (nodes / points, nodes) > (
+            sum(best.values()) / best_cost,
+            sum(best.values()),
+        ):
+            best, best_cost = page_sizes, points
+
+    return best, best_cost
+
+
+def predict_crawl_cost(connections, remaining, max_first=MAX_FIRST):
+    """
+    Predict the rate limit cost of fetching the 'remaining' nodes of connections queried at once, with page sizes chosen by `plan_page_sizes`
+    (once a connection has no nodes remaining, it's dropped from the query)
+
+    Arguments
+    ---------
+    connections : dict
+        Nested connections of each node of each connection (see `plan_page_sizes`)
+    remaining : dict
+        Number of nodes not yet fetched for each connection
+    max_first : int, default=MAX_FIRST
+        Maximum page size
+
+    Returns
+    -------
+    cost : int
+        Rate limit points
+    n_queries : int
+        Number of queries
+    """
+    remaining = {name: remaining[name] for name in connections if remaining[name] > 0}
+
+    cost, n_queries = 0, 0
+    while len(remaining) > 0:
+        page_sizes, query_points = plan_page_sizes(
+            {name: connections[name] for name in remaining}, remaining, max_first
+        )
+        cost += query_points
+        n_queries += 1
+        remaining = {
+            name: nn - page_sizes[name]
+            for name, nn in remaining.items()
+            if nn - page_sizes[name] > 0
+        }
+
+    return cost, n_queries
+
+
+def remaining_items(total, n_fetched):
+    """
+    Number of nodes of a connection not yet fetched, from its 'totalCount'
+
+    Arguments
+    ---------
+    total : int
+        Total number of nodes ('totalCount')
+    n_fetched : int
+        Number of nodes already fetched (e.g. cached, and retrieved by a crawl so far)
+
+    Returns
+    -------
+    remaining : int
+        Number of nodes not yet fetched, or None if unknown (e.g. nodes were added since 'total' was counted)
+    """
+    remaining = total - n_fetched
+    if remaining <= 0:
+        return None
+
+    return remaining
+
+
+class CrawlPlan:
+    def __init__(self, connections, budget=None):
+        """
+        Class for planning the queries of a crawl of one or more connections queried at once (e.g. a repository's commit, issue and
+        pull request histories): the page sizes of each query (see `plan_page_sizes`), the predicted cost of the rest of the crawl
+        once the number of nodes remaining is known (e.g. from a connection's 'totalCount', see `predict_crawl_cost`), and pacing of
+        the queries so that crawls predicted to cost more than the rate limit budget left spread their queries until the reset.
+
+        Use as a context manager: while active, the crawl's predicted cost is registered with 'budget' (see `RateLimitBudget.plan_crawl`),
+        so that concurrent crawls sharing it are paced by their combined cost.
+
+        Arguments
+        ---------
+        connections : dict
+            Nested connections of each node of each connection (see `plan_page_sizes`)
+        budget : `rate_limit.RateLimitBudget` instance, default=None
+            Rate limit budget the crawl is paced within. If None, queries aren't paced
+        """
+        self.connections = connections
+        self.budget = budget
+        # nodes not yet fetched of each connection still queried (None if unknown)
+        self.remaining = {name: None for name in connections}
+        # predicted cost of the rest of the crawl, and cost of the next query
+        self.planned_cost = None
+        self.planned_queries = None
+        self.cost = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        if self.budget is not None:
+            self.budget.plan_crawl(self, None)
+
+    def next_query(self):
+        """
+        Plan the next query, waiting before it if needed to pace the crawl within the rate limit budget (see `RateLimitBudget.pacing_delay`)
+
+        Returns
+        -------
+        page_sizes : dict
+            Page size for each connection still queried
+        """
+        page_sizes, self.cost = plan_page_sizes(
+            {name: self.connections[name] for name in self.remaining}, self.remaining
+        )
+
+        if self.planned_cost is not None and self.budget is not None:
+            delay = self.budget.pacing_delay(
+                self.cost, max(self.planned_cost, self.cost), self
+            )
+            if delay > 0:
+                time.sleep(delay)
+
+        return page_sizes
+
+    def update(self, remaining):
+        """
+        Update the plan from the response to the last query
+
+        Arguments
+        ---------
+        remaining : dict
+            Nodes not yet fetched of each connection still queried (None if unknown)
+
+        Returns
+        -------
+        predicted : bool
+            Whether the cost of the rest of the crawl was first predicted by this update (i.e. once all of 'remaining' is known)
+        """
+        self.remaining = remaining
+        predicted = False
+        if self.planned_cost is not None:
+            self.planned_cost = max(self.planned_cost - self.cost, 0)
+        elif len(remaining) > 0 and all(x is not None for x in remaining.values()):
+            self.planned_cost, self.planned_queries = predict_crawl_cost(
+                {name: self.connections[name] for name in remaining}, remaining
+            )
+            predicted = True
+
+        if self.budget is not None and self.planned_cost is not None:
+            self.budget.plan_crawl(self, self.planned_cost)
+
+        return predicted
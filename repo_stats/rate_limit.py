@@ -0,0 +1,155 @@
+import threading
+import time
+
+
+class RateLimitBudget:
+    def __init__(self, reserve=50):
+        """
+        Class for sharing the GitHub API rate limit between concurrent queries. The budget is updated from the 'X-RateLimit-*'
+        headers of each response, and queries wait for the rate limit to reset once only 'reserve' points remain.
+
+        Arguments
+        ---------
+        reserve : int, default=50
+            Number of rate limit points to leave unused (e.g. for other jobs using the same token)
+        """
+        self.reserve = reserve
+        self.limit = None
+        self.remaining = None
+        self.reset = None
+        self.used = None
+        self.n_queries = 0
+        # rate limit points reported in GraphQL responses (see `RateLimitBudget.update_graphql`)
+        self.cost = 0
+        # predicted cost of the rest of each active crawl sharing the budget (see `RateLimitBudget.plan_crawl`)
+        self.planned = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, cost=1):
+        """
+        Reserve 'cost' rate limit points for a query, waiting for the rate limit to reset if the budget is spent
+
+        Arguments
+        ---------
+        cost : int, default=1
+            Rate limit points expected to be used by the query
+        """
+        while True:
+            with self._lock:
+                if self.reset is not None and time.time() >= self.reset:
+                    # new rate limit window; the next response gives its budget
+                    self.remaining = None
+
+                if self.remaining is None or self.remaining - cost >= self.reserve:
+                    if self.remaining is not None:
+                        # count queries in flight, whose responses haven't yet updated the budget
+                        self.remaining -= cost
+                    self.n_queries += 1
+                    return
+
+                wait = self.reset - time.time() + 1
+
+            print(
+                f"\n  Rate limit budget spent ({self.remaining} of {self.limit} remaining) - waiting {wait:.0f} s for reset"
+            )
+            time.sleep(wait)
+
+    def update(self, headers):
+        """
+        Update the budget from the rate limit headers of a query response
+
+        Arguments
+        ---------
+        headers : dict
+            Response headers
+        """
+        if "X-RateLimit-Remaining" not in headers:
+            return
+
+        remaining = int(headers["X-RateLimit-Remaining"])
+        reset = int(headers["X-RateLimit-Reset"])
+
+        with self._lock:
+            # responses of concurrent queries can arrive out of order,
+            # so within a rate limit window keep the lowest 'remaining'
+            if self.reset is None or reset > self.reset:
+                self.remaining = remaining
+            elif reset == self.reset and self.remaining is not None:
+                self.remaining = min(remaining, self.remaining)
+            elif reset == self.reset:
+                self.remaining = remaining
+            else:
+                return
+
+            self.reset = reset
+            self.limit = int(headers["X-RateLimit-Limit"])
+            self.used = int(headers.get("X-RateLimit-Used", self.limit - remaining))
+
+    def update_graphql(self, rate_limit):
+        """
+        Record the rate limit cost of a GraphQL query from the 'rateLimit' field of its response
+        (see https://docs.github.com/en/graphql/reference/objects#ratelimit)
+
+        Arguments
+        ---------
+        rate_limit : dict
+            The response's 'rateLimit' entry, with at least 'cost'. If None, the query didn't request it
+        """
+        if rate_limit is None:
+            return
+
+        with self._lock:
+            self.cost += rate_limit["cost"]
+
+    def plan_crawl(self, crawl, planned_cost):
+        """
+        Set the predicted cost of the rest of an active crawl (e.g. a `query_plan.CrawlPlan`), so that concurrent crawls
+        are paced by their combined cost (see `RateLimitBudget.pacing_delay`)
+
+        Arguments
+        ---------
+        crawl : object
+            The crawl, e.g. its `query_plan.CrawlPlan`
+        planned_cost : int
+            Rate limit points expected to be used by the rest of the crawl. If None, the crawl has ended
+        """
+        with self._lock:
+            if planned_cost is None:
+                self.planned.pop(crawl, None)
+            else:
+                self.planned[crawl] = planned_cost
+
+    def pacing_delay(self, cost, planned_cost, crawl=None):
+        """
+        Time to wait before a query, so that crawls that together would spend the budget before the rate limit resets instead
+        spread their queries over the time to reset, rather than hitting the limit mid-crawl (e.g. while other jobs share the token)
+
+        Arguments
+        ---------
+        cost : int
+            Rate limit points expected to be used by the query
+        planned_cost : int
+            Rate limit points expected to be used by the rest of the crawl, including this query (see `query_plan.predict_crawl_cost`)
+        crawl : object, default=None
+            The crawl, if registered with `RateLimitBudget.plan_crawl`. The rest of the budget is shared with the other registered crawls
+
+        Returns
+        -------
+        delay : float
+            Seconds to wait before the query (0 if the crawls fit within the budget, or the budget isn't yet known)
+        """
+        with self._lock:
+            if self.remaining is None or self.reset is None:
+                return 0.0
+
+            usable = self.remaining - self.reserve
+            total_cost = planned_cost + sum(
+                vv for kk, vv in self.planned.items() if kk is not crawl
+            )
+            if total_cost <= usable:
+                return 0.0
+
+            # this crawl's share of the queries the budget allows, in proportion to its planned cost, evenly spaced until the reset
+            share = max(usable, 0) * planned_cost / total_cost
+            time_to_reset = max(self.reset - time.time(), 0)
+            return time_to_reset / max(share // cost, 1)
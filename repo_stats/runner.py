@@ -1,20 +1,28 @@
 import argparse
 import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
 
+import matplotlib
+
 import repo_stats
 
 # from dotenv import load_dotenv
 from repo_stats.citation_metrics import ADSCitations
+from repo_stats.collect import collect_git_stats
 from repo_stats.git_metrics import GitMetrics
+from repo_stats.instrument import span, tracer
 from repo_stats.plot import (
     author_time_plot,
     citation_plot,
     issue_PR_time_plot,
     open_issue_PR_plot,
 )
-from repo_stats.user_stats import StatsImage
+from repo_stats.user_stats import StatsImage, template_theme
+from repo_stats.utilities import content_hash
 
 repo_stats_path = os.path.dirname(repo_stats.__file__)
 
@@ -105,58 +113,317 @@ def main(*args):
     # params['ads_token'] = os.getenv('ADS_TOKEN')
     # params['git_token'] = os.getenv('GIT_TOKEN')
     params = parse_parameters(*args)
+    tracer.enable()
+
+    if params.get("dashboard_only", False):
+        jobs = dashboard_only_jobs(params)
+    else:
+        jobs = analysis_jobs(params)
+
+    cache_dir = params["cache_dir"]
+    manifest_file = None
+    if params.get("skip_unchanged", True):
+        manifest_file = f"{cache_dir}/outputs_manifest.json"
+    with span("render"):
+        render_outputs(jobs, params.get("render_workers", 4), manifest_file)
+
+    if params.get("run_report", True):
+        tracer.write_report(f"{cache_dir}/run_report.json")
+    if params.get("chrome_trace", False):
+        tracer.write_chrome_trace(f"{cache_dir}/run_trace.json")
+    tracer.disable()
+
+
+def analysis_jobs(params):
+    """
+    Get and process the full citation and repository histories, and list the figures and dashboard images to render from them
+
+    Parameters
+    ----------
+    params : dict
+        Parameters used by the analysis (see `runner.parse_parameters`)
+
+    Returns
+    -------
+    jobs : dict
+        Each figure and dashboard image to render (see `runner.render_outputs`)
+    """
+    Cites = ADSCitations(
+        params["ads_token"],
+        params["cache_dir"],
+        params.get("cache_backend", "sqlite"),
+        max_workers=params.get("ads_workers", 4),
+    )
+    with span("citations"):
+        cite_stats = Cites.aggregate_citations(params["bibs"], params["ads_metrics"])
+    tracer.record_client("ads", Cites.client)
+
+    # the repository in the dashboard, followed by any others to aggregate statistics over
+    repos = [f"{params['repo_owner']}/{params['repo_name']}"]
+    repos += [rr for rr in params.get("repos", []) if rr not in repos]
+
+    with span("git"):
+        per_repo_stats, aggregate_stats = collect_git_stats(
+            repos,
+            params["git_token"],
+            params["cache_dir"],
+            params["labels"],
+            params["age_recent_commit"],
+            params["age_recent_issue_pr"],
+            params.get("fetch_workers", 4),
+            params.get("cache_backend", "sqlite"),
+            params.get("incremental_sync", True),
+            params.get("batch_queries", True),
+            params.get("commit_source", "graphql"),
+            params.get("repo_dir"),
+            params.get("branches"),
+            params.get("partitioned_crawl", False),
+        )
+    git_stats = per_repo_stats[repos[0]]
+
+    all_stats = {**cite_stats, **git_stats}
+
+    # each figure and dashboard image (path) as (function, arguments, files it's made from, other files it writes),
+    # rendered concurrently
+    cache_dir = params["cache_dir"]
+    jobs = dashboard_jobs(params, all_stats)
+    jobs[f"{cache_dir}/{params['repo_name']}_citations.png"] = (
+        citation_plot,
+        (cite_stats, params["repo_name"], cache_dir, params["bib_names"]),
+        [],
+        [],
+    )
+    # the repository in the dashboard, and the combined repositories if there are others
+    figure_stats = [(git_stats, params["repo_name"])]
+    if len(repos) > 1:
+        figure_stats.append((aggregate_stats, "all_repos"))
+    for stats, name in figure_stats:
+        jobs[f"{cache_dir}/{name}_authors.png"] = (
+            author_time_plot,
+            (stats, params["repo_owner"], name, cache_dir, params["window_avg"]),
+            [],
+            [],
+        )
+        jobs[f"{cache_dir}/{name}_open_items.png"] = (
+            open_issue_PR_plot,
+            (stats, name, cache_dir),
+            [],
+            [],
+        )
+        jobs[f"{cache_dir}/{name}_issues_PRs.png"] = (
+            issue_PR_time_plot,
+            (stats, params["repo_owner"], name, cache_dir, params["window_avg"]),
+            [],
+            [],
+        )
+
+    return jobs
+
+
+def dashboard_only_jobs(params):
+    """
+    Obtain only the statistics shown in dashboard images, with count queries rather than the full citation and repository histories
+    (see `citation_metrics.ADSCitations.count_citations`, `git_metrics.GitMetrics.count_recent_authors` and
+    `git_metrics.GitMetrics.count_issues_PRs`), and list the dashboard images to render from them. Figures need the full histories,
+    so are left as they are.
 
-    Cites = ADSCitations(params["ads_token"], params["cache_dir"])
-    cite_stats = Cites.aggregate_citations(params["bibs"], params["ads_metrics"])
+    Parameters
+    ----------
+    params : dict
+        Parameters used by the analysis (see `runner.parse_parameters`)
 
+    Returns
+    -------
+    jobs : dict
+        Each dashboard image to render (see `runner.render_outputs`)
+    """
+    Cites = ADSCitations(
+        params["ads_token"], params["cache_dir"], params.get("cache_backend", "sqlite")
+    )
+    with span("citations"):
+        cite_stats = Cites.count_citations(params["bibs"])
+    tracer.record_client("ads", Cites.client)
+
+    repo = f"{params['repo_owner']}/{params['repo_name']}"
     Gits = GitMetrics(
         params["git_token"],
         params["repo_owner"],
         params["repo_name"],
         params["cache_dir"],
+        params.get("cache_backend", "sqlite"),
+        branch=(params.get("branches") or {}).get(repo),
     )
+    with span("git"):
+        git_stats = {
+            **Gits.count_recent_authors(params["age_recent_commit"]),
+            **Gits.count_issues_PRs(params["age_recent_issue_pr"]),
+        }
+    tracer.record_client("github", Gits.client)
 
-    commits = Gits.get_commits()
-    commit_stats = Gits.process_commits(commits, params["age_recent_commit"])
+    jobs = dashboard_jobs(params, {**cite_stats, **git_stats})
+
+    return jobs
 
-    issues = Gits.get_issues_PRs("issues")
-    prs = Gits.get_issues_PRs("pullRequests")
-    issue_pr_stats = Gits.process_issues_PRs(
-        [issues, prs],
-        ["issues", "pullRequests"],
-        params["labels"],
-        params["age_recent_issue_pr"],
-    )
 
-    all_stats = {**cite_stats, **commit_stats, **issue_pr_stats}
+def dashboard_jobs(params, stats):
+    """
+    List the dashboard images to render, one per template image (theme), with text laid out once (see `user_stats.StatsImage.layout`)
 
-    print("\nUpdating dashboard image with stats")
+    Parameters
+    ----------
+    params : dict
+        Parameters used by the analysis (see `runner.parse_parameters`)
+    stats : dict
+        Citation and repository statistics shown in the dashboard
+
+    Returns
+    -------
+    jobs : dict
+        Each dashboard image to render (see `runner.render_outputs`)
+    """
+    cache_dir = params["cache_dir"]
+    # each image (path) as (function, arguments, files it's made from, other files it writes)
+    jobs = {}
+    # dashboard text is laid out once and drawn on the template of each theme
+    with span("dashboard layout", "render"):
+        layout = StatsImage(params["template_image"][0], params["font"]).layout(
+            stats, params["repo_name"]
+        )
+    sizes = params.get("dashboard_sizes") or {}
     for ii in params["template_image"]:
-        UserStatsImage = StatsImage(ii, params["font"])
-        UserStatsImage.update_image(all_stats, params["repo_name"], params["cache_dir"])
+        savename = f"{cache_dir}/{params['repo_name']}_user_stats_{template_theme(ii)}"
+        jobs[f"{savename}.png"] = (
+            dashboard_image,
+            (ii, params["font"], layout, params["repo_name"], cache_dir, sizes),
+            [ii, params["font"]],
+            # the image at each additional size
+            [f"{savename}_{suffix}.png" for suffix in sizes],
+        )
 
-    citation_plot(
-        cite_stats, params["repo_name"], params["cache_dir"], params["bib_names"]
-    )
+    return jobs
 
-    author_time_plot(
-        commit_stats,
-        params["repo_owner"],
-        params["repo_name"],
-        params["cache_dir"],
-        params["window_avg"],
-    )
 
-    open_issue_PR_plot(issue_pr_stats, params["repo_name"], params["cache_dir"])
+def dashboard_image(template_image, font, layout, repo_name, cache_dir, sizes=None):
+    """
+    Draw a text layout of citation and repository statistics on a dashboard template image (see `user_stats.StatsImage.update_image`)
+
+    Arguments
+    ---------
+    template_image : str
+        Template image to be updated
+    font : str
+        Font file (.tff) to be used
+    layout : list of dict
+        Text layout (see `user_stats.StatsImage.layout`)
+    repo_name : str
+        Name of repository (for image savename)
+    cache_dir : str
+        Name of directory in which to save image
+    sizes : dict, default=None
+        Additional sizes to save the image at (see `user_stats.StatsImage.update_image`)
+    """
+    print(f"\nUpdating dashboard image {os.path.basename(template_image)} with stats")
+    UserStatsImage = StatsImage(template_image, font)
+    UserStatsImage.update_image(None, repo_name, cache_dir, layout, sizes)
 
-    issue_PR_time_plot(
-        issue_pr_stats,
-        params["repo_owner"],
-        params["repo_name"],
-        params["cache_dir"],
-        params["window_avg"],
+
+def _render(job):
+    """
+    Render a figure or image 'job' (function, arguments) in a worker process,
+    returning the process ID and the start time and duration (s) of rendering
+    """
+    func, args = job
+    start = time.time()
+    func(*args)
+
+    return os.getpid(), start, time.time() - start
+
+
+def render_outputs(jobs, max_workers=4, manifest_file=None):
+    """
+    Render figures and dashboard images in a pool of processes. Rendering is CPU-bound and each output is independent,
+    so this scales with the number of CPU cores (up to the number of outputs).
+
+    With a 'manifest_file', a hash of what each output is made from (the function and its arguments, e.g. statistics and parameters;
+    the content of its files, e.g. template image and font; the other files it writes, e.g. the dashboard at each configured size;
+    the date, shown in outputs; and the package version) is recorded, and outputs whose hash is unchanged since they were last
+    rendered are skipped, provided every file they write still exists.
+
+    Arguments
+    ---------
+    jobs : dict
+        Outputs to render, each with its path as key and (function, arguments, files it's made from, other files it writes)
+        as value, e.g. (`plot.author_time_plot`, (stats, owner, name, cache_dir), [], [])
+    max_workers : int, default=4
+        Maximum number of processes rendering at once. If 1, outputs are rendered one after another in this process
+    manifest_file : str, default=None
+        Path to JSON file recording the hash of each rendered output. If None, all outputs are rendered
+
+    Returns
+    -------
+    rendered : list of str
+        Path of each rendered output
+    """
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    hashes = {}
+    for path, (func, args, files, outputs) in jobs.items():
+        file_contents = []
+        for ff in files:
+            with open(ff, "rb") as f:
+                file_contents.append(f.read())
+        hashes[path] = content_hash(
+            func.__name__, args, file_contents, outputs, today, repo_stats.__version__
+        )
+
+    manifest = {}
+    if manifest_file is not None and os.path.exists(manifest_file):
+        with open(manifest_file, "r") as f:
+            manifest = json.load(f)
+
+    rendered = [
+        path
+        for path, job in jobs.items()
+        if manifest.get(path) != hashes[path]
+        or not all(os.path.exists(ff) for ff in [path, *job[3]])
+    ]
+    to_render = [jobs[path][:2] for path in rendered]
+
+    max_workers = max(min(max_workers, len(to_render)), 1)
+    print(
+        f"\nRendering {len(to_render)} figures and images ({len(jobs) - len(to_render)} unchanged) with {max_workers} workers"
     )
 
+    if max_workers == 1:
+        timings = [_render(job) for job in to_render]
+    else:
+        # non-interactive backend, safe to use outside the main process
+        with ProcessPoolExecutor(
+            max_workers=max_workers, initializer=matplotlib.use, initargs=("Agg",)
+        ) as pool:
+            # raise any error from a worker
+            timings = list(pool.map(_render, to_render))
+
+    # spans are timed in the worker processes, so are recorded here
+    for path, (pid, start, duration) in zip(rendered, timings):
+        tracer.add_span(
+            os.path.basename(path),
+            "render",
+            start,
+            duration,
+            pid=pid,
+            tid=pid,
+            args={"function": jobs[path][0].__name__},
+        )
+
+    if manifest_file is not None and len(rendered) > 0:
+        manifest.update({path: hashes[path] for path in rendered})
+        # replace atomically, so an interrupted write doesn't leave a corrupt manifest
+        with open(f"{manifest_file}.tmp", "w") as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(f"{manifest_file}.tmp", manifest_file)
+
+    return rendered
+
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,51 @@
 import textwrap
 from datetime import datetime, timezone
+from functools import lru_cache
 
 from PIL import Image, ImageDraw, ImageFont
 
 
+@lru_cache(maxsize=None)
+def load_font(font, size):
+    """
+    Load a font at a given size, cached so each font file is read and parsed once per size
+
+    Arguments
+    ---------
+    font : str
+        Font file (.tff)
+    size : int
+        Font size
+
+    Returns
+    -------
+    font_instance : 'PIL.ImageFont' instance
+        The font
+    """
+    return ImageFont.truetype(font, size)
+
+
+def template_theme(template_image):
+    """
+    Get the theme of a template image from its file name
+
+    Arguments
+    ---------
+    template_image : str
+        Template image
+
+    Returns
+    -------
+    theme : str
+        'dark' or 'light' if the file name contains this, otherwise 'transparent'
+    """
+    if "dark" in template_image:
+        return "dark"
+    if "light" in template_image:
+        return "light"
+    return "transparent"
+
+
 class StatsImage:
     def __init__(self, template_image, font):
         """
@@ -17,22 +59,20 @@ class StatsImage:
             Font file (.tff) to be used
         """
 
-        if "dark" in template_image:
-            self.theme = "dark"
-            self.text_color = "#ffffff"
-        elif "light" in template_image:
-            self.theme = "light"
-            self.text_color = "#000000"
-        else:
-            self.theme = "transparent"
-            self.text_color = "#999999"
-
-        self.img = Image.open(template_image)
+        self.theme = template_theme(template_image)
+        self.text_color = {
+            "dark": "#ffffff",
+            "light": "#000000",
+            "transparent": "#999999",
+        }[self.theme]
+
+        self.template = Image.open(template_image)
+        self.img = self.template.copy()
         self.draw = ImageDraw.Draw(self.img)
 
         self.font = font
         self.font_size = 54
-        self.font_instance = ImageFont.truetype(font, self.font_size)
+        self.font_instance = load_font(font, self.font_size)
 
     def draw_text(self, coords, text, text_color=None, font=None, **kwargs):
         """
@@ -56,83 +96,198 @@ class StatsImage:
 
         self.draw.text(coords, str(text), fill=text_color, font=font, **kwargs)
 
-    def update_image(self, stats, repo_name, cache_dir):
+    def fit_text(self, coords, text, max_bbox, wrap_widths=(70,)):
         """
-        Update the provided template image with text summarizing respository and citation statistics.
+        Find the largest font size (up to 'self.font_size') at which 'text', wrapped to lines, fits in a bounding box.
+        Font sizes are binary searched, so only a few text bounding boxes are measured.
+
+        Arguments
+        ---------
+        coords : tuple of int
+            (x,y) coordinates of text location
+        text : str
+            Text to be drawn
+        max_bbox : tuple of int
+            Bounding box (left, top, right, bottom) that the text must not exceed
+        wrap_widths : tuple of int, default=(70,)
+            Line widths (in characters) to try wrapping 'text' to. The width allowing the largest font size is used
+
+        Returns
+        -------
+        text_wrap : str
+            The wrapped text
+        font : 'PIL.ImageFont' instance
+            Font at the largest size at which the text fits (size 1 if it doesn't fit at any size)
+        """
+
+        def fits(text_wrap, size):
+            text_bbox = self.draw.textbbox(
+                coords, text_wrap, font=load_font(self.font, size)
+            )
+            return all(x <= max_bbox[i] for i, x in enumerate(text_bbox))
+
+        best_size, best_wrap = 0, None
+        for width in wrap_widths:
+            text_wrap = "\n".join(textwrap.wrap(text, width=width))
+
+            # largest fitting size in (best_size, self.font_size]; text grows with font size
+            lo, hi = best_size, self.font_size
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                if fits(text_wrap, mid):
+                    lo = mid
+                else:
+                    hi = mid - 1
+
+            if lo > best_size or best_wrap is None:
+                best_size, best_wrap = lo, text_wrap
+
+        return best_wrap, load_font(self.font, max(best_size, 1))
+
+    def layout(self, stats, repo_name):
+        """
+        Lay out text summarizing respository and citation statistics. The layout is independent of the template image's theme,
+        so it can be computed once and drawn on each template (see `StatsImage.draw_layout`).
 
         Arguments
         ---------
         stats : dict
-            A dictionary entry for each issue or pull request in the history (see `Git_metrics.get_issues_PRs`)
+            Citation and repository statistics (see `runner.main`)
         repo_name : str
             Name of repository on GitHub (for drawn text)
-        cache_dir : str
-            Name of directory in which to cache updated image
 
         Returns
         -------
-        self.img : 'PIL.Image' instance
-            The provided template image updated with text
+        layout : list of dict
+            Each text block to draw, with its 'coords', 'text', font 'size' and other 'kwargs' for 'PIL.ImageDraw.Draw.text'
         """
-        self.draw_text(
-            (70, 404),
-            f"{stats['n_recent_authors']} total contributors in last {stats['age_recent_commit']} days",
-        )
-
-        self.draw_text(
-            (70, 30),
-            f"{len(stats['new_authors'])} new contributors in last {stats['age_recent_commit']} days:",
-        )
+        layout = [
+            {
+                "coords": (70, 404),
+                "text": f"{stats['n_recent_authors']} total contributors in last {stats['age_recent_commit']} days",
+            },
+            {
+                "coords": (70, 30),
+                "text": f"{len(stats['new_authors'])} new contributors in last {stats['age_recent_commit']} days:",
+            },
+        ]
         # case-insensitive sort
         text_authors = sorted(stats["new_authors"], key=str.lower)
 
         # bound text block to fit in available space.
         # see Image.getbbox - https://pillow.readthedocs.io/en/stable/reference/Image.html
-        max_bbox = (70, 113, 1100, 320)
-        out_of_bounds = [True]
-        fs = self.font_size * 1
-        while True in out_of_bounds:
-            text_authors_wrap = "\n".join(textwrap.wrap(", ".join(text_authors)))
-
-            text_bbox = self.draw.textbbox(
-                (70, 100),
-                text_authors_wrap,
-                font=ImageFont.truetype(self.font, fs),
-            )
-            # print(f"Font size {fs}, bounding box {text_bbox}")
-
-            out_of_bounds = [True for i, x in enumerate(text_bbox) if x > max_bbox[i]]
-            fs -= 1
-
-        self.draw_text(
-            (70, 100),
-            text_authors_wrap,
-            font=ImageFont.truetype(self.font, fs),
+        text_authors_wrap, font = self.fit_text(
+            (70, 100), ", ".join(text_authors), (70, 113, 1100, 320)
+        )
+        layout.append(
+            {"coords": (70, 100), "text": text_authors_wrap, "size": font.size}
         )
 
-        self.draw_text(
-            (1258, 51),
-            f"last {stats['issues']['age_recent']} days: {stats['issues']['recent_close']} issues closed, {stats['issues']['recent_open']} opened\n{stats['pullRequests']['recent_close']} PRs closed, {stats['pullRequests']['recent_open']} opened",
-            align="right",
+        layout.append(
+            {
+                "coords": (1258, 51),
+                "text": f"last {stats['issues']['age_recent']} days: {stats['issues']['recent_close']} issues closed, {stats['issues']['recent_open']} opened\n{stats['pullRequests']['recent_close']} PRs closed, {stats['pullRequests']['recent_open']} opened",
+                "kwargs": {"align": "right"},
+            }
         )
 
-        self.draw_text(
-            (1390, 285),
-            f"papers citing {repo_name}: {stats['aggregate']['cite_month']} last month\n{stats['aggregate']['cite_year']} this year\n{stats['aggregate']['cite_all']} all-time",
-            align="right",
+        layout.append(
+            {
+                "coords": (1390, 285),
+                "text": f"papers citing {repo_name}: {stats['aggregate']['cite_month']} last month\n{stats['aggregate']['cite_year']} this year\n{stats['aggregate']['cite_all']} all-time",
+                "kwargs": {"align": "right"},
+            }
         )
 
         # package name
-        # self.draw_text((1158, 405), repo_name, font=ImageFont.truetype(self.font, 36), anchor='ms')
+        # layout.append({"coords": (1158, 405), "text": repo_name, "size": 36, "kwargs": {"anchor": "ms"}})
 
         now = datetime.now(timezone.utc).strftime("%B %d, %Y")
-        self.draw_text(
-            (1210, 465),
-            f"Generated on {now}",
-            font=ImageFont.truetype(self.font, 34),
+        layout.append(
+            {"coords": (1210, 465), "text": f"Generated on {now}", "size": 34}
         )
 
+        for item in layout:
+            item.setdefault("size", self.font_size)
+            item.setdefault("kwargs", {})
+
+        return layout
+
+    def draw_layout(self, layout, scale=1):
+        """
+        Draw a text layout on a copy of the template image
+
+        Arguments
+        ---------
+        layout : list of dict
+            Text layout (see `StatsImage.layout`)
+        scale : float, default=1
+            Scale of the image relative to the template (e.g. 2 for high-resolution displays, 0.25 for a thumbnail).
+            Text is drawn at the scaled font size, rather than the image being resampled after drawing
+
+        Returns
+        -------
+        img : 'PIL.Image' instance
+            The template image (resized by 'scale') with text
+        """
+        img = self.template.copy()
+        if scale != 1:
+            img = img.resize(
+                (round(img.width * scale), round(img.height * scale)),
+                Image.Resampling.LANCZOS,
+            )
+        draw = ImageDraw.Draw(img)
+
+        for item in layout:
+            draw.text(
+                tuple(round(x * scale) for x in item["coords"]),
+                item["text"],
+                fill=self.text_color,
+                font=load_font(self.font, max(round(item["size"] * scale), 1)),
+                # line spacing (default 4 pixels) also scales
+                spacing=round(4 * scale),
+                **item["kwargs"],
+            )
+
+        return img
+
+    def update_image(self, stats, repo_name, cache_dir, layout=None, sizes=None):
+        """
+        Update the provided template image with text summarizing respository and citation statistics.
+
+        Arguments
+        ---------
+        stats : dict
+            Citation and repository statistics (see `runner.main`). Not used if 'layout' is given
+        repo_name : str
+            Name of repository on GitHub (for drawn text and image savename)
+        cache_dir : str
+            Name of directory in which to cache updated image
+        layout : list of dict, default=None
+            Text layout, e.g. shared by the templates of all themes (see `StatsImage.layout`). If None, obtained from 'stats'
+        sizes : dict, default=None
+            Additional sizes to save the image at, each with its savename suffix as key and scale as value
+            (e.g. {"2x": 2, "thumbnail": 0.25}; see `StatsImage.draw_layout`)
+
+        Returns
+        -------
+        self.img : 'PIL.Image' instance
+            The provided template image updated with text
+        """
+        if layout is None:
+            layout = self.layout(stats, repo_name)
+
+        self.img = self.draw_layout(layout)
+        self.draw = ImageDraw.Draw(self.img)
+
         # img.show()
         self.img.save(f"{cache_dir}/{repo_name}_user_stats_{self.theme}.png")
 
+        if sizes is None:
+            sizes = {}
+        for suffix, scale in sizes.items():
+            self.draw_layout(layout, scale).save(
+                f"{cache_dir}/{repo_name}_user_stats_{self.theme}_{suffix}.png"
+            )
+
         return self.img
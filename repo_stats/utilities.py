@@ -1,9 +1,13 @@
 import os
-import ast
+import hashlib
+import itertools
+from collections import deque
 from datetime import datetime, timezone
 import numpy as np
 from PIL import Image
 
+from repo_stats.instrument import traced
+
 
 def rolling_average(unaveraged, window):
     """
@@ -32,6 +36,79 @@ def rolling_average(unaveraged, window):
     return roll_avg, window
 
 
+def month_index(dates):
+    """
+    Convert dates to integer month ordinals (months since 1970-01), so that monthly series can be built with array operations
+
+    Arguments
+    ---------
+    dates : str, array of str or array of 'np.datetime64'
+        Dates, as strings of the format '2024-01...' or as datetimes
+
+    Returns
+    -------
+    months : int or array of int
+        Month ordinal of each date
+    """
+    dates = np.asarray(dates)
+    if not np.issubdtype(dates.dtype, np.datetime64):
+        dates = dates.astype("U7")
+
+    months = dates.astype("datetime64[M]").astype(np.int64)
+
+    return months
+
+
+def monthly_counts(months, start=None, end=None, weights=None):
+    """
+    Count the entries in 'months' in each month from 'start' to 'end', including months without entries (count of 0).
+    Series built with the same 'start' and 'end' are aligned.
+
+    Arguments
+    ---------
+    months : array of int
+        Month ordinals (see `month_index`)
+    start : int or str, default=None
+        First month of the series, as a month ordinal or '2024-01'. If None, the oldest month in 'months'
+    end : int or str, default=None
+        Last month of the series, as a month ordinal or '2024-01'. If None, the current month
+    weights : array, default=None
+        If not None, sum these weights (one per entry in 'months') in each month rather than counting entries
+
+    Returns
+    -------
+    month_counts : list of array
+        Each month from 'start' to 'end' as '2024-01', and its count
+    """
+    months = np.asarray(months, dtype=np.int64)
+
+    now = datetime.now(timezone.utc)
+    if end is None:
+        end = f"{now.year}-{now.month:02d}"
+    if start is None:
+        start = months.min() if len(months) > 0 else end
+    start, end = [
+        x if isinstance(x, (int, np.integer)) else month_index(x) for x in (start, end)
+    ]
+
+    in_range = (months >= start) & (months <= end)
+    if weights is not None:
+        weights = np.asarray(weights)
+        counts = np.bincount(
+            months[in_range] - start,
+            weights=weights[in_range],
+            minlength=end - start + 1,
+        ).astype(weights.dtype)
+    else:
+        counts = np.bincount(months[in_range] - start, minlength=end - start + 1)
+
+    dates = np.datetime_as_string(
+        np.arange(start, end + 1).astype("datetime64[M]")
+    ).astype("U7")
+
+    return [dates, counts]
+
+
 def fill_missed_months(unique_output):
     """
     For an output of 'np.unique(x, return_counts=True)' where 'x' is a list of dates of the format '2024-01', fill in months missing in this list and set their count to 0.
@@ -44,88 +121,164 @@ def fill_missed_months(unique_output):
     Returns
     -------
     unique_output : list of array
-        The input updated with inserted entries for missing months
+        The input updated with inserted entries for missing months, up to the current month (see `monthly_counts`)
     """
-    unique_output = list(unique_output)
+    unique_output = monthly_counts(
+        month_index(unique_output[0]), weights=unique_output[1]
+    )
 
-    now = datetime.now(timezone.utc)
+    return unique_output
 
-    # build list of 'year-month' from oldest entry in 'unique_output' to current month
-    oldest, newest = min(unique_output[0]), f"{now.year}-{now.month:02d}"
-    years = [str(y) for y in list(range(int(oldest[:4]), int(newest[:4]) + 1))]
-    months = [f"{m:02d}" for m in list(range(1, 13))]
-    dates = []
-    for y in years:
-        for m in months:
-            dates.append(f"{y}-{m}")
-    dates = dates[dates.index(oldest) : dates.index(newest) + 1]
-
-    # insert missing dates into 'unique_output'
-    missed_months = [i for i in dates if i not in unique_output[0]]
-    for i in missed_months:
-        idx = np.searchsorted(unique_output[0], i)
-        unique_output[0] = np.insert(unique_output[0], idx, i)
-        unique_output[1] = np.insert(unique_output[1], idx, 0)
 
-    return unique_output
+def content_hash(*objects):
+    """
+    Hash the content of 'objects', e.g. the statistics a figure is made from, to detect whether any have changed
 
+    Arguments
+    ---------
+    *objects
+        Any nesting of dict, list and tuple of arrays, str, bytes and numbers
 
-def update_cache(cache_file, old_items, new_items):
+    Returns
+    -------
+    digest : str
+        SHA-256 hex digest, equal for equal content (independent of the order of dict entries)
     """
-    Update 'cache_file' with 'new_items' entries, one per line
+    h = hashlib.sha256()
+    _update_hash(h, objects)
+
+    return h.hexdigest()
+
+
+def _update_hash(h, obj):
+    """Update hash 'h' with the content of 'obj', recursively for containers. Each entry is tagged with its type and length"""
+    if isinstance(obj, dict):
+        h.update(b"dict%d:" % len(obj))
+        for kk in sorted(obj, key=str):
+            _update_hash(h, kk)
+            _update_hash(h, obj[kk])
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"list%d:" % len(obj))
+        for x in obj:
+            _update_hash(h, x)
+    elif isinstance(obj, np.ndarray) and obj.dtype != object:
+        h.update(f"array{obj.dtype.str}{obj.shape}:".encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, np.ndarray):
+        _update_hash(h, obj.tolist())
+    else:
+        if not isinstance(obj, bytes):
+            obj = f"{type(obj).__name__}:{obj!r}".encode()
+        h.update(b"%d:" % len(obj))
+        h.update(obj)
+
+
+def ordered_map(pool, func, items, max_pending):
+    """
+    Call 'func' on each of 'items' in an executor 'pool', as 'pool.map', but with at most 'max_pending' calls submitted at once,
+    so that results aren't held in memory ahead of their (in order) consumer. Calls not yet started when the consumer stops
+    (e.g. on an error) are cancelled.
 
     Arguments
     ---------
-    cache_file : str
-        Path to existing ASCII cache file
-    old_items, new_items : str or list of str
-        Existing and new cache entries
+    pool : 'concurrent.futures.Executor' instance
+        Executor the calls are submitted to
+    func : callable
+        Function of a single item
+    items : iterable
+        Arguments of each call
+    max_pending : int
+        Maximum number of calls submitted (running, queued or done but not yet consumed) at once, e.g. the number of workers of 'pool'
 
     Returns
     -------
-    all_items : list of str
-        Combined 'old_items' and 'new_items'
+    results : generator
+        Result of each call, in the order of 'items'
     """
-    with open(cache_file, "a+") as f:
-        # add initial new line only when appending to existing entries in cache
-        if len(old_items) != 0 and new_items != []:
-            f.writelines("\n")
+    items = iter(items)
+    pending = deque(pool.submit(func, x) for x in itertools.islice(items, max_pending))
+    try:
+        while pending:
+            result = pending.popleft().result()
+            # submit the next call before the consumer takes this result
+            for x in itertools.islice(items, 1):
+                pending.append(pool.submit(func, x))
+            yield result
+    finally:
+        for ff in pending:
+            ff.cancel()
 
-        f.writelines("\n".join([str(i) for i in new_items]))
 
-        if new_items == []:
-            print(f"  No new entries found - cache not updated")
-        else:
-            print(f"\n  Updated cache at {cache_file} with {len(new_items)} entries")
+def transparent_image(image, color=(0, 0, 0), tolerance=0):
+    """
+    Make a chosen color in an image transparent, returning the resulting image (without saving it)
 
-    with open(cache_file, "r") as f:
-        all_items = f.readlines()
-        all_items = [ast.literal_eval(i.rstrip("\n")) for i in all_items]
+    Arguments
+    ---------
+    image : str or 'PIL.Image' instance
+        Path to image file, or image
+    color : tuple, default=(0,0,0)
+        RGB values of color to be made transparent
+    tolerance : int, default=0
+        Maximum difference in each of R, G and B from 'color' for a pixel to be made transparent (e.g. to include anti-aliased edges)
+
+    Returns
+    -------
+    rgba : 'PIL.Image' instance
+        The image in RGBA mode, with matching pixels transparent
+    """
+    if isinstance(image, str):
+        image = Image.open(image)
+    # (height, width, 4) array of pixels
+    pixels = np.array(image.convert("RGBA"))
+
+    # compare a channel at a time, to avoid large temporary arrays for large images
+    mask = np.ones(pixels.shape[:2], dtype=bool)
+    for ii, cc in enumerate(color):
+        mask &= np.abs(pixels[..., ii].astype(np.int16) - cc) <= tolerance
 
-    return all_items
+    # in RGBA, transparent in (255, 255, 255, 0).
+    # set each pixel's 4 bytes at once, viewed as a single uint32
+    transparent = np.array([255, 255, 255, 0], dtype=np.uint8).view(np.uint32)
+    np.copyto(pixels.view(np.uint32)[..., 0], transparent, where=mask)
 
+    return Image.fromarray(pixels, "RGBA")
 
-def make_transparent(image, color=(0,0,0)):
+
+def make_transparent(image, color=(0, 0, 0), tolerance=0):
     """
-    Make a chosen color in an image transparent, save resulting image as .png
+    Make a chosen color in an image, or in each image in a directory, transparent; save resulting image(s) as .png
+    (see `transparent_image`)
 
     Arguments
     ---------
     image : str
-        Path to image file
+        Path to image file, or to a directory of image files (.png, .jpg, .jpeg; excluding already transparent '*_transparent.png')
     color : tuple, default=(0,0,0)
         RGB values of color to be made transparent
-    """    
-    im = Image.open(image) 
-    rgba = im.convert("RGBA") 
-    pixel_colors = rgba.getdata() 
-  
-    # in RGBA, transparent in (255, 255, 255, 0)
-    t = (255, 255, 255, 0)
-    pixel_colors_trans = [t if x[:3] == color else x for x in pixel_colors]
-    rgba.putdata(pixel_colors_trans) 
-
-    savename = f"{os.path.splitext(image)[0]}_transparent.png"
-    print(f"Saving updated image as {savename}")
-    rgba.save(savename, "PNG") 
-    
\ No newline at end of file
+    tolerance : int, default=0
+        Maximum difference in each of R, G and B from 'color' for a pixel to be made transparent
+
+    Returns
+    -------
+    savenames : list of str
+        Path of each saved image, '{image}_transparent.png'
+    """
+    if os.path.isdir(image):
+        images = [
+            os.path.join(image, x)
+            for x in sorted(os.listdir(image))
+            if x.lower().endswith((".png", ".jpg", ".jpeg"))
+            and not x.endswith("_transparent.png")
+        ]
+    else:
+        images = [image]
+
+    savenames = []
+    for ii in images:
+        savename = f"{os.path.splitext(ii)[0]}_transparent.png"
+        print(f"Saving updated image as {savename}")
+        transparent_image(ii, color, tolerance).save(savename, "PNG")
+        savenames.append(savename)
+
+    return savenames
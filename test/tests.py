@@ -1,6 +1,50 @@
-import numpy as np 
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs, urlparse
 
-from repo_stats.utilities import rolling_average
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+import requests
+from PIL import Image
+
+from repo_stats.cache import Cache, SQLiteCache, commit_record, to_columns
+from repo_stats.citation_metrics import ADSCitations
+from repo_stats.client import APIClient
+from repo_stats.collect import collect_git_stats
+from repo_stats.git_metrics import GitMetrics
+from repo_stats.instrument import traced, tracer
+from repo_stats.plot import open_issue_PR_plot
+from repo_stats.query_plan import CrawlPlan, plan_page_sizes, predict_crawl_cost, query_cost
+from repo_stats.rate_limit import RateLimitBudget
+from repo_stats.runner import analysis_jobs, dashboard_only_jobs, main, parse_parameters, render_outputs
+from repo_stats.user_stats import StatsImage, load_font
+from repo_stats.utilities import (
+    content_hash,
+    fill_missed_months,
+    monthly_counts,
+    ordered_map,
+    rolling_average,
+    transparent_image,
+)
+
+# the offline mock of the GitHub and ADS APIs and synthetic histories of the benchmark suite
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+from mock_server import MockAPIServer  # noqa: E402
+from synthetic import (  # noqa: E402
+    commit_nodes,
+    issue_PR_nodes,
+    synthetic_citations,
+    synthetic_commits,
+    synthetic_issues_PRs,
+)
 
 def test_rolling_average():
     x = np.arange(10)
@@ -11,4 +55,1072 @@ def test_rolling_average():
         rtol=1e0,
     )
     
-    
\ No newline at end of file
+    
+
+def test_sqlite_cache(tmp_path):
+    # backends implement the whole interface
+    with pytest.raises(TypeError):
+        Cache()
+
+    edges = [
+        {
+            "node": {
+                "oid": "a1",
+                "authoredDate": "2024-01-02T00:00:00Z",
+                "author": {"name": "A", "email": "a@x", "user": {"databaseId": 1}},
+            }
+        },
+        {
+            "node": {
+                "oid": "b2",
+                "authoredDate": "2023-12-01T00:00:00Z",
+                "author": {"name": "B", "email": "b@x", "user": None},
+            },
+            "endCursor": "cursor1",
+        },
+    ]
+
+    # legacy ASCII cache, one 'str(dict)' per line
+    text_file = tmp_path / "repo_commits.txt"
+    text_file.write_text("\n".join(str(e) for e in edges))
+
+    cache = SQLiteCache(str(tmp_path))
+    assert cache.migrate_text_cache(str(text_file), "commits", "repo") == 2
+    # migration is one-time
+    assert cache.migrate_text_cache(str(text_file), "commits", "repo") == 0
+    assert cache.last_cursor("commits", "repo") == "cursor1"
+
+    # re-adding an item updates it in place
+    cache.append("commits", "repo", [commit_record(edges[0])])
+    data = cache.load("commits", "repo", ["oid", "databaseId"])
+    assert list(data["oid"]) == ["a1", "b2"]
+    assert list(data["databaseId"]) == [1, -1]
+
+
+def test_sync_issues_PRs(tmp_path, monkeypatch):
+    def item(number, state, updated):
+        return {
+            "node": {
+                "number": number,
+                "state": state,
+                "createdAt": "2024-01-01T00:00:00Z",
+                "updatedAt": updated,
+                "closedAt": None if state == "OPEN" else updated,
+                "labels": {"edges": []},
+            }
+        }
+
+    Gits = GitMetrics("token", "owner", "repo", str(tmp_path))
+    Gits.cache.append(
+        "issues", Gits.dataset, [], state={"issues_synced_at": "2024-02-01T00:00:00Z"}
+    )
+    Gits.update_cache(
+        "issues",
+        [
+            {"number": 1, "state": "OPEN", "createdAt": "2024-01-01T00:00:00Z"},
+            {"number": 2, "state": "OPEN", "createdAt": "2024-01-01T00:00:00Z"},
+        ],
+    )
+
+    # most recently updated first: #2 was closed and #3 opened after the last sync
+    page = {
+        "pageInfo": {"hasNextPage": True, "endCursor": "c"},
+        "edges": [
+            item(3, "OPEN", "2024-03-02T00:00:00Z"),
+            item(2, "CLOSED", "2024-03-01T00:00:00Z"),
+            item(1, "OPEN", "2024-01-15T00:00:00Z"),
+        ],
+    }
+    headers = {"X-RateLimit-Reset": "0", "X-RateLimit-Used": 1, "X-RateLimit-Limit": 1}
+    calls = []
+
+    def query_graphql(query, variables):
+        calls.append(variables)
+        return {"repository": {"issues": page}}, headers
+
+    monkeypatch.setattr(Gits, "query_graphql", query_graphql)
+
+    issues = Gits.get_issues_PRs("issues", columns=["number", "state"])
+    # stops paging at the first item older than the last sync
+    assert len(calls) == 1
+    assert list(issues["number"]) == [1, 2, 3]
+    assert list(issues["state"]) == ["OPEN", "CLOSED", "OPEN"]
+    assert Gits.cache.get_state(Gits.dataset, "issues_synced_at") > "2024-03-02"
+
+
+def test_sync_open_labels(tmp_path, monkeypatch):
+    Gits = GitMetrics("token", "owner", "repo", str(tmp_path))
+    Gits.update_cache(
+        "issues",
+        [
+            {"number": 1, "state": "OPEN", "labels": ["bug"]},
+            {"number": 2, "state": "OPEN"},
+            {"number": 3, "state": "CLOSED"},
+        ],
+        state={"issues_labels_synced_at": "2024-02-01T00:00:00Z"},
+    )
+    # history pages (without labels) don't overwrite cached labels
+    Gits.update_cache("issues", [{"number": 1, "state": "OPEN"}])
+
+    # most recently updated open items first: #2 was relabelled after the last label sync, #1 before it
+    page = {
+        "pageInfo": {"hasNextPage": True, "endCursor": "c"},
+        "nodes": [
+            {"number": 2, "updatedAt": "2024-03-01T00:00:00Z", "labels": {"nodes": [{"name": "docs"}]}},
+            {"number": 1, "updatedAt": "2024-01-15T00:00:00Z", "labels": {"nodes": []}},
+        ],
+    }
+    headers = {"X-RateLimit-Reset": "0", "X-RateLimit-Used": 1, "X-RateLimit-Limit": 1}
+    queries = []
+
+    def query_graphql(query, variables):
+        queries.append(query)
+        return {"repository": {"issues": page}}, headers
+
+    monkeypatch.setattr(Gits, "query_graphql", query_graphql)
+
+    assert Gits.sync_open_labels("issues", "2024-03-02T00:00:00Z") == 1
+    assert len(queries) == 1 and "states: OPEN" in queries[0]
+    assert Gits.cache.load("issues", Gits.dataset, ["labels"])["labels"].tolist() == [["bug"], ["docs"], None]
+    assert Gits.cache.get_state(Gits.dataset, "issues_labels_synced_at") == "2024-03-02T00:00:00Z"
+
+
+def test_crawl_checkpoints(tmp_path, monkeypatch):
+    def page(start, n_items=2, n_pages=3):
+        end = start + n_items
+        nodes = [
+            {
+                "number": ii,
+                "state": "OPEN",
+                "createdAt": "2024-01-01T00:00:00Z",
+                "updatedAt": "2024-01-01T00:00:00Z",
+                "closedAt": None,
+                "labels": {"edges": []},
+            }
+            for ii in range(start, end)
+        ]
+        return {
+            "totalCount": n_items * n_pages,
+            "pageInfo": {"hasNextPage": end < n_items * n_pages, "endCursor": str(end)},
+            "edges": [{"node": x} for x in nodes],
+        }
+
+    headers = {"X-RateLimit-Reset": "0", "X-RateLimit-Used": 1, "X-RateLimit-Limit": 1}
+    afters = []
+
+    def query_graphql(query, variables):
+        afters.append(variables["after"])
+        if variables["after"] == "4" and len(afters) == 3:
+            raise Exception("Query failed")
+        return {"repository": {"issues": page(int(variables["after"] or 0))}}, headers
+
+    Gits = GitMetrics("token", "owner", "repo", str(tmp_path))
+    Gits.checkpoint_size = 2
+    monkeypatch.setattr(Gits, "query_graphql", query_graphql)
+
+    # the crawl fails on its 3rd page, after the first 2 are written to the cache
+    with pytest.raises(Exception, match="Query failed"):
+        Gits.get_issues_PRs("issues")
+    assert Gits.cache.count("issues", Gits.dataset) == 4
+    assert Gits.cache.get_state(Gits.dataset, "issues_synced_at") is None
+    crawl_start = Gits.cache.get_state(Gits.dataset, "issues_crawl_started")
+
+    # and is resumed (not synced) from the last page written
+    issues = Gits.get_issues_PRs("issues", columns=["number"])
+    assert afters[3:] == ["4"]
+    assert list(issues["number"]) == list(range(6))
+    assert Gits.cache.get_state(Gits.dataset, "issues_synced_at") == crawl_start
+    assert Gits.cache.get_state(Gits.dataset, "issues_crawl_started") is None
+    # a repository of another owner with the same name is cached separately
+    assert GitMetrics("token", "other", "repo", str(tmp_path)).cache.count("issues", "other/repo") == 0
+    assert Gits.cache.count("issues", "owner/repo") == 6
+
+
+def test_backfill_issues_PRs(tmp_path, monkeypatch):
+    nodes = [
+        {
+            "number": ii + 1,
+            "state": "CLOSED",
+            "createdAt": f"2024-01-0{ii + 1}T00:00:00Z",
+            "updatedAt": f"2024-01-0{ii + 1}T00:00:00Z",
+            "closedAt": f"2024-01-0{ii + 1}T00:00:00Z",
+            "labels": {"edges": []},
+        }
+        for ii in range(5)
+    ]
+
+    def search(query):
+        start, end = (
+            datetime.fromisoformat(x)
+            for x in re.search(r"created:(\S+)\.\.(\S+)", query).groups()
+        )
+        return [
+            x for x in nodes if start <= datetime.fromisoformat(x["createdAt"]) <= end
+        ]
+
+    headers = {"X-RateLimit-Reset": "0", "X-RateLimit-Used": 1, "X-RateLimit-Limit": 1}
+    n_counts, page_sizes = [], []
+
+    def query_graphql(query, variables):
+        if "query" not in variables:
+            # counts of windows
+            counts = re.findall(r'(w\d+): search\(query: ("[^"]*")', query)
+            n_counts.append(len(counts))
+            return {kk: {"issueCount": len(search(json.loads(q)))} for kk, q in counts}, headers
+
+        page_sizes.append(variables["first"])
+        found = search(variables["query"])
+        page = {"hasNextPage": False, "endCursor": None}
+        connection = {"issueCount": len(found), "pageInfo": page, "edges": [{"node": x} for x in found]}
+        return {"search": connection}, headers
+
+    Gits = GitMetrics("token", "owner", "repo", str(tmp_path))
+    Gits.search_limit = 2
+    monkeypatch.setattr(Gits, "query_graphql", query_graphql)
+
+    assert Gits.backfill_issues_PRs("issues", max_workers=2) == 5
+    # windows are split until each has at most 'search_limit' items
+    assert len(n_counts) > 1
+    issues = Gits.cache.load("issues", Gits.dataset, ["number"])
+    assert list(issues["number"]) == [1, 2, 3, 4, 5]
+    assert Gits.cache.get_state(Gits.dataset, "issues_synced_at") is not None
+    # page sizes of window crawls are planned (see `query_plan.CrawlPlan`)
+    assert set(page_sizes) == {100}
+
+    # a complete crawl isn't repeated
+    assert Gits.backfill_issues_PRs("issues") == 0
+
+
+def fake_github(repos, page_size=2):
+    """
+    A `GitMetrics.query_graphql` serving the histories in 'repos' (each "owner/name" as key and a dict of commit, issue and
+    pull request nodes as value, commits newest first) in pages of up to 'page_size' items, and the queries it was sent
+    """
+    headers = {"X-RateLimit-Reset": "0", "X-RateLimit-Used": 1, "X-RateLimit-Limit": 1}
+    queries = []
+
+    def page(nodes, first, after):
+        start = int(after or 0)
+        end = start + min(first, page_size)
+        return {
+            "totalCount": len(nodes),
+            "pageInfo": {"hasNextPage": end < len(nodes), "endCursor": str(end)},
+            "edges": [{"node": x} for x in nodes[start:end]],
+        }
+
+    def query_graphql(query, variables):
+        queries.append((query, dict(variables)))
+        history = repos[f"{variables['owner']}/{variables['name']}"]
+        # most recently updated first in syncs
+        ordered = {
+            kk: sorted(vv, key=lambda x: x["updatedAt"], reverse="orderBy" in query) if kk != "commits" else vv
+            for kk, vv in history.items()
+        }
+
+        data = {}
+        if "states: OPEN" in query:
+            item_type = re.search(r"(\w+)\(states: OPEN", query).group(1)
+            connection = page(
+                [x for x in ordered[item_type] if x["state"] == "OPEN"], variables["first"], variables["after"]
+            )
+            connection["nodes"] = [
+                {**x["node"], "labels": {"nodes": [{"name": ll} for ll in x["node"]["labels"]]}}
+                for x in connection.pop("edges")
+            ]
+            data[item_type] = connection
+        else:
+            # histories queried together (see `GitMetrics.get_histories`), or one at a time
+            if "include_commits" in variables:
+                for item_type, nodes in ordered.items():
+                    if variables[f"include_{item_type}"]:
+                        data[item_type] = page(
+                            nodes, variables[f"first_{item_type}"], variables[f"after_{item_type}"]
+                        )
+            else:
+                item_type = "commits" if "history(" in query else re.search(r"(issues|pullRequests)\(", query).group(1)
+                data[item_type] = page(ordered[item_type], variables["first"], variables["after"])
+            # labels are synced for open items only (see `GitMetrics.sync_open_labels`)
+            for connection in data.values():
+                for ee in connection["edges"]:
+                    ee["node"] = {kk: vv for kk, vv in ee["node"].items() if kk != "labels"}
+
+        if "commits" in data:
+            data["branch"] = {"target": {"history": data.pop("commits")}}
+        return {"repository": data}, headers
+
+    return query_graphql, queries
+
+
+def commit_node(name, user_id, date):
+    return {"oid": f"{name}{date}", "authoredDate": date, "author": {"name": name, "user": {"databaseId": user_id}}}
+
+
+def issue_PR_node(number, created, closed=None, labels=()):
+    return {
+        "number": number,
+        "state": "OPEN" if closed is None else "CLOSED",
+        "createdAt": created,
+        "updatedAt": closed or created,
+        "closedAt": closed,
+        "labels": list(labels),
+    }
+
+
+def test_get_histories(tmp_path, monkeypatch):
+    history = {
+        "commits": [
+            commit_node("B", 2, "2024-03-01T00:00:00Z"),
+            commit_node("A", 1, "2024-02-01T00:00:00Z"),
+            commit_node("A", 1, "2024-01-01T00:00:00Z"),
+        ],
+        "issues": [issue_PR_node(1, "2024-01-05T00:00:00Z", labels=["bug"])],
+        "pullRequests": [
+            issue_PR_node(1, "2024-01-10T00:00:00Z", "2024-01-11T00:00:00Z"),
+            issue_PR_node(2, "2024-02-10T00:00:00Z", "2024-02-11T00:00:00Z"),
+            issue_PR_node(3, "2024-03-10T00:00:00Z", labels=["docs"]),
+        ],
+    }
+    query_graphql, queries = fake_github({"owner/repo": history})
+    Gits = GitMetrics("token", "owner", "repo", str(tmp_path))
+    monkeypatch.setattr(Gits, "query_graphql", query_graphql)
+
+    histories = Gits.get_histories()
+    # all three histories are paged through with the same queries, and each is dropped from them once complete
+    history_queries = [vv for qq, vv in queries if "include_commits" in vv]
+    assert len(history_queries) == 2
+    assert "@include(if: $include_issues)" in queries[0][0]
+    assert [vv["include_issues"] for vv in history_queries] == [True, False]
+    assert [vv["include_pullRequests"] for vv in history_queries] == [True, True]
+
+    np.testing.assert_array_equal(histories["commits"]["author_name"], ["B", "A", "A"])
+    assert histories["issues"]["labels"].tolist() == [["bug"]]
+    assert histories["pullRequests"]["labels"].tolist() == [None, None, ["docs"]]
+    assert Gits.cache.get_state(Gits.dataset, "pullRequests_synced_at") is not None
+
+    # issues and pull requests are then synced, and commits resumed from the last page
+    queries.clear()
+    histories = Gits.get_histories()
+    history_queries = [(qq, vv) for qq, vv in queries if "include_commits" in vv]
+    assert len(history_queries) == 1
+    assert "orderBy" in history_queries[0][0] and history_queries[0][1]["after_issues"] is None
+    assert history_queries[0][1]["after_commits"] == "3"
+    assert len(histories["commits"]["author_name"]) == 3
+
+
+def test_collect_git_stats(tmp_path, monkeypatch):
+    # repositories of different owners with the same name
+    repos = {
+        "a/repo": {
+            "commits": [commit_node("A", 1, "2024-02-01T00:00:00Z"), commit_node("A", 1, "2024-01-01T00:00:00Z")],
+            "issues": [issue_PR_node(1, "2024-01-05T00:00:00Z", labels=["bug"])],
+            "pullRequests": [issue_PR_node(1, "2024-02-10T00:00:00Z", "2024-02-11T00:00:00Z")],
+        },
+        "b/repo": {
+            "commits": [commit_node("A", 1, "2024-03-01T00:00:00Z"), commit_node("B", 2, "2024-02-15T00:00:00Z")],
+            "issues": [
+                issue_PR_node(1, "2024-02-05T00:00:00Z", "2024-03-05T00:00:00Z"),
+                issue_PR_node(2, "2024-03-05T00:00:00Z", labels=["bug", "docs"]),
+            ],
+            "pullRequests": [],
+        },
+    }
+    query_graphql, queries = fake_github(repos)
+    monkeypatch.setattr(GitMetrics, "query_graphql", lambda self, query, variables: query_graphql(query, variables))
+
+    # the same statistics with histories fetched together or separately
+    for batch_queries in [True, False]:
+        cache_dir = tmp_path / str(batch_queries)
+        cache_dir.mkdir()
+        queries.clear()
+        repo_stats, aggregate_stats = collect_git_stats(
+            list(repos), "token", str(cache_dir), ["bug", "docs"], batch_queries=batch_queries
+        )
+        assert any("include_commits" in vv for _, vv in queries) == batch_queries
+        assert list(repo_stats) == ["a/repo", "b/repo"]
+        np.testing.assert_array_equal(repo_stats["a/repo"]["unique_authors"][2], [2])
+        np.testing.assert_array_equal(repo_stats["b/repo"]["unique_authors"][2], [1, 1])
+        assert repo_stats["b/repo"]["issues"]["label_open"] == {"bug": 1, "docs": 1}
+
+        # combined histories, with monthly series from the first commit and item of any repository
+        np.testing.assert_array_equal(aggregate_stats["unique_authors"][0], ["A", "B"])
+        np.testing.assert_array_equal(aggregate_stats["unique_authors"][2], [3, 1])
+        np.testing.assert_array_equal(aggregate_stats["authors_per_month"][1][:3], [1, 2, 1])
+        np.testing.assert_array_equal(aggregate_stats["issues"]["open_per_month"][1][:3], [1, 1, 1])
+        np.testing.assert_array_equal(aggregate_stats["pullRequests"]["close_per_month"][1][:3], [0, 1, 0])
+        assert aggregate_stats["issues"]["label_open"] == {"bug": 2, "docs": 1}
+
+
+def test_dashboard_counts(tmp_path, monkeypatch):
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%dT00:00:00Z")
+    # recent commits, newest first; 'Old' authored before the period, and bots aren't counted
+    commits = [
+        ("A. Person", "a@x", {"id": "U1"}, today),
+        ("dependabot[bot]", "bot@x", {"id": "B1"}, today),
+        ("Guest", "guest@x", None, today),
+        ("Anne Person", "a@y", {"id": "U1"}, today),
+        ("New", "new@x", {"id": "U2"}, today),
+        ("Old", "old@x", {"id": "U3"}, "2000-01-01T00:00:00Z"),
+    ]
+    # authors with commits before the period
+    earlier = {'{id: "U1"}': 10, '{emails: ["guest@x"]}': 0, '{id: "U2"}': 0}
+    queries = []
+
+    def query_graphql(query, variables):
+        queries.append(query)
+        if "search(" in query:
+            aliases = re.findall(r"(\w+): search", query)
+            return {kk: {"issueCount": ii} for ii, kk in enumerate(aliases)}, {}
+        if "$since" in query:
+            edges = [
+                {"node": {"authoredDate": date, "author": {"name": name, "email": email, "user": user}}}
+                for name, email, user, date in commits
+            ]
+            assert variables["first"] == 100
+            history = {
+                "totalCount": len(edges),
+                "pageInfo": {"hasNextPage": False, "endCursor": None},
+                "edges": edges,
+            }
+        else:
+            history = {
+                alias: {"totalCount": earlier[author]}
+                for alias, author in re.findall(r"(a\d+): history\(.*author: (\{.*\})\)", query)
+            }
+        return {"repository": {"branch": {"target": {"history": history, **history}}}}, {}
+
+    Gits = GitMetrics("token", "owner", "repo", str(tmp_path))
+    monkeypatch.setattr(Gits, "query_graphql", query_graphql)
+
+    stats = Gits.count_recent_authors(90)
+    assert stats["n_recent_authors"] == 3
+    assert sorted(stats["new_authors"]) == ["Guest", "New"]
+
+    stats = Gits.count_issues_PRs(90)
+    assert stats["issues"] == {"age_recent": 90, "recent_open": 0, "recent_close": 1}
+    assert stats["pullRequests"]["recent_open"] == 2
+    # all 4 counts in a single query
+    assert len(queries) == 3
+
+
+def test_rate_limit_budget():
+    budget = RateLimitBudget(reserve=10)
+    headers = {
+        "X-RateLimit-Limit": "5000",
+        "X-RateLimit-Remaining": "100",
+        "X-RateLimit-Reset": "9999999999",
+    }
+    budget.update(headers)
+    # a late response from earlier in the same window doesn't raise the budget
+    budget.update({**headers, "X-RateLimit-Remaining": "200"})
+    assert budget.remaining == 100
+
+    budget.acquire(cost=5)
+    assert budget.remaining == 95
+
+
+def test_query_plan():
+    labels = [(25, [])]
+    # 100 issues with their labels take 101 requests (1 point); with 100 commits and 100 pull requests, 203 (2 points)
+    assert query_cost([(100, labels)]) == 1
+    assert query_cost([(100, []), (100, labels), (100, labels)]) == 2
+
+    # a full page of commits is free, while issues and pull requests share what rounds to 1 point
+    page_sizes, cost = plan_page_sizes({"commits": [], "issues": labels, "pullRequests": labels})
+    assert page_sizes == {"commits": 100, "issues": 73, "pullRequests": 73}
+    assert cost == 1
+    # the few items remaining bound the page sizes
+    page_sizes, _ = plan_page_sizes({"commits": [], "issues": labels}, {"commits": 10, "issues": None})
+    assert page_sizes == {"commits": 10, "issues": 100}
+
+    # once a history is fetched, it's dropped from the queries
+    assert predict_crawl_cost(
+        {"commits": [], "issues": labels, "pullRequests": labels},
+        {"commits": 17000, "issues": 7000, "pullRequests": 9000},
+    ) == (170, 170)
+
+    budget = RateLimitBudget(reserve=10)
+    budget.update(
+        {
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Remaining": "110",
+            "X-RateLimit-Reset": str(int(time.time()) + 1000),
+        }
+    )
+    # a crawl that fits within the budget isn't paced, while one that doesn't spreads the budget's 100 queries until the reset
+    assert budget.pacing_delay(1, 100) == 0
+    assert 9 < budget.pacing_delay(1, 500) <= 10
+
+
+def test_concurrent_crawl_pacing():
+    budget = RateLimitBudget(reserve=10)
+    budget.update(
+        {
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Remaining": "110",
+            "X-RateLimit-Reset": str(int(time.time()) + 1000),
+        }
+    )
+
+    with CrawlPlan({"issues": []}, budget) as plan_a, CrawlPlan({"issues": []}, budget) as plan_b:
+        # 8000 issues each take 80 queries of 100
+        plan_a.update({"issues": 8000})
+        plan_b.update({"issues": 8000})
+        assert budget.planned == {plan_a: 80, plan_b: 80}
+
+        # each crawl fits within the 100 usable points, but together they don't, so each paces its half of them until the reset
+        assert 19 < budget.pacing_delay(1, 80, plan_a) <= 20
+
+    # ended crawls no longer share the budget
+    assert budget.planned == {}
+    assert budget.pacing_delay(1, 80) == 0
+
+
+def test_api_client_retry(monkeypatch):
+    def response(status, headers=None):
+        r = requests.Response()
+        r.status_code = status
+        r._content = b"{}"
+        r.headers.update(headers or {})
+        return r
+
+    responses = [response(503), response(403, {"Retry-After": "0"}), response(200)]
+    client = APIClient(backoff=0)
+    monkeypatch.setattr(client.session, "request", lambda *a, **k: responses.pop(0))
+
+    assert client.get("https://example.com").status_code == 200
+    assert client.summary()["n_requests"] == 3
+    assert client.summary()["n_failed"] == 2
+
+
+def test_citation_checkpoints(tmp_path, monkeypatch):
+    docs = [{"bibcode": f"c{ii}", "pubdate": "2024-01-00"} for ii in range(10)]
+    starts, fail_at = [], [6]
+
+    def query_citations(bib, metric, start):
+        starts.append(start)
+        if start in fail_at:
+            raise Exception("Query failed")
+        return {"numFound": len(docs), "docs": docs[start : start + Cites.rows]}
+
+    Cites = ADSCitations("token", str(tmp_path), max_workers=2)
+    Cites.rows, Cites.checkpoint_size = 2, 2
+    monkeypatch.setattr(Cites, "query_citations", query_citations)
+
+    # the fetch fails on its 4th page, after the pages before it are written to the cache in order
+    with pytest.raises(Exception, match="Query failed"):
+        Cites.get_citations("paper", "bibcode, pubdate")
+    assert Cites.cache.count("citations", "paper") == 6
+    # at most 'max_workers' pages are fetched ahead of those written
+    assert max(starts) <= 6 + 2 * Cites.rows
+
+    # and is resumed from the first citation not in the cache, without gaps or duplicates
+    starts.clear()
+    fail_at.clear()
+    cites = Cites.get_citations("paper", "bibcode, pubdate")
+    assert starts == [6, 8]
+    np.testing.assert_array_equal(cites["bibcode"], [x["bibcode"] for x in docs])
+
+
+def test_citation_query_slots(tmp_path, monkeypatch):
+    citations = {f"paper{ii}": [f"p{ii}c{jj}" for jj in range(5 + ii)] for ii in range(3)}
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def get(url):
+        params = parse_qs(urlparse(url).query)
+        bib = re.fullmatch(r"citations\((.*)\)", params["q"][0]).group(1)
+        start, rows = int(params["start"][0]), int(params["rows"][0])
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+
+        docs = [{"bibcode": x, "pubdate": "2024-01-00"} for x in citations[bib]]
+        r = requests.Response()
+        r.status_code = 200
+        r._content = json.dumps({"response": {"numFound": len(docs), "docs": docs[start : start + rows]}}).encode()
+        return r
+
+    Cites = ADSCitations("token", str(tmp_path), max_workers=2)
+    Cites.rows = 2
+    monkeypatch.setattr(Cites.client, "get", get)
+
+    stats = Cites.aggregate_citations(list(citations))
+    # papers and their pages are fetched concurrently, with at most 'max_workers' queries at once
+    assert running[1] == 2
+    assert list(stats) == list(citations) + ["aggregate"]
+    for bb, cc in citations.items():
+        assert stats[bb]["cite_bibcodes"] == cc
+    assert stats["aggregate"]["cite_all"] == 18
+
+
+def test_count_citations(tmp_path):
+    now = datetime.now(timezone.utc)
+    this_month = now.strftime("%Y-%m")
+    last_month = (now.replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+    citations = {
+        "paper1": [
+            {"bibcode": "c1", "pubdate": f"{last_month}-00"},
+            {"bibcode": "c2", "pubdate": f"{this_month}-00"},
+            {"bibcode": "c3", "pubdate": "2000-01-00"},
+        ],
+        # 'c1' and 'c3' cite both papers
+        "paper2": [
+            {"bibcode": "c1", "pubdate": f"{last_month}-00"},
+            {"bibcode": "c3", "pubdate": "2000-01-00"},
+            {"bibcode": "c4", "pubdate": "2001-01-00"},
+        ],
+    }
+
+    Cites = ADSCitations("token", str(tmp_path))
+    with MockAPIServer(citations=citations) as server:
+        Cites.search_url = f"{server.url}/search/query"
+        stats = Cites.count_citations(list(citations))
+
+    # unique citing papers, as in 'aggregate_citations'
+    assert stats["aggregate"] == {
+        "cite_all": 4,
+        "cite_year": 1 + (last_month[:4] == this_month[:4]),
+        "cite_month": 1,
+    }
+
+
+def test_aggregate_citations(tmp_path, monkeypatch):
+    citations = {
+        "paper1": [("c1", "2020-01-00"), ("c2", "2021-05-00"), ("c3", "2021-06-00")],
+        "paper2": [("c2", "2021-05-00"), ("c3", "2021-06-00"), ("c4", "2022-12-00")],
+        "paper3": [("c3", "2021-06-00")],
+    }
+
+    Cites = ADSCitations("token", str(tmp_path))
+    monkeypatch.setattr(
+        Cites,
+        "get_citations",
+        lambda bib, metric: to_columns(
+            "citations",
+            [{"bibcode": b, "pubdate": p} for b, p in citations[bib]],
+            Cites.citation_columns,
+        ),
+    )
+
+    stats = Cites.aggregate_citations(list(citations))
+    assert stats["aggregate"]["cite_all"] == 4
+    assert list(stats["aggregate"]["cite_per_year"][0]) == [2020, 2021, 2022]
+    assert list(stats["aggregate"]["cite_per_year"][1]) == [1, 2, 1]
+    assert stats["aggregate"]["cite_overlap"] == {1: 2, 2: 1, 3: 1}
+    assert stats["paper1"]["cite_shared"] == 2
+
+
+def test_dashboard_only(tmp_path, monkeypatch):
+    repos = {
+        ("owner", "repo"): {
+            "commits": commit_nodes(synthetic_commits(500)),
+            "issues": issue_PR_nodes(synthetic_issues_PRs(200)),
+            "pullRequests": issue_PR_nodes(synthetic_issues_PRs(100, seed=1)),
+        }
+    }
+    citations = synthetic_citations(300)
+
+    template = os.path.join(os.path.dirname(__file__), "..", "dashboard_template")
+    with open(os.path.join(os.path.dirname(__file__), "..", "repo_stats", "parameters.json")) as f:
+        params = json.load(f)
+    params.update(
+        repo_owner="owner",
+        repo_name="repo",
+        bibs=list(citations),
+        template_image=[f"{template}/user_stats_template_dark.png"],
+        dashboard_only=True,
+        render_workers=1,
+    )
+    with open(tmp_path / "parameters.json", "w") as f:
+        json.dump(params, f)
+    args = ["-a", "token", "-g", "token", "-p", str(tmp_path / "parameters.json"), "-c", str(tmp_path)]
+
+    with MockAPIServer(repos=repos, citations=citations) as server:
+        monkeypatch.setattr(GitMetrics, "graphql_url", f"{server.url}/graphql")
+        monkeypatch.setattr(ADSCitations, "search_url", f"{server.url}/search/query")
+
+        # count queries give the dashboard the same text as the full histories
+        params = parse_parameters(args)
+        jobs = dashboard_only_jobs(params)
+        assert list(jobs) == [f"{tmp_path}/repo_user_stats_dark.png"]
+        full_jobs = analysis_jobs(params)
+        for path, (_, job_args, _, _) in jobs.items():
+            assert job_args[2] == full_jobs[path][1][2]
+
+        main(args)
+
+    assert os.path.exists(tmp_path / "repo_user_stats_dark.png")
+    # figures need the full histories, so aren't rendered
+    assert not os.path.exists(tmp_path / "repo_authors.png")
+    with open(tmp_path / "outputs_manifest.json") as f:
+        assert list(json.load(f)) == [f"{tmp_path}/repo_user_stats_dark.png"]
+
+
+def test_process_commits(tmp_path):
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%dT00:00:00Z")
+    # newest first, as (author name, user ID, date); 'A. Person' later renamed, 'Guest' without a user
+    commits = [
+        ("New", 3, today),
+        ("Anne Person", 1, "2024-03-10T00:00:00Z"),
+        ("dependabot[bot]", 4, "2024-03-05T00:00:00Z"),
+        ("B", 2, "2024-03-01T12:00:00Z"),
+        ("B", 2, "2024-03-01T00:00:00Z"),
+        ("A. Person", 1, "2024-01-20T00:00:00Z"),
+        ("A. Person", 1, "2024-01-10T00:00:00Z"),
+        ("Guest", -1, "2024-01-05T00:00:00Z"),
+    ]
+    results = {
+        "author_name": [x[0] for x in commits],
+        "databaseId": [x[1] for x in commits],
+        "authoredDate": [x[2] for x in commits],
+    }
+
+    stats = GitMetrics("token", "owner", "repo", str(tmp_path)).process_commits(results)
+
+    # the bot isn't an author, and each user is counted once under one of their names
+    names, idx_first_commit, n_commits = stats["unique_authors"]
+    np.testing.assert_array_equal(names, ["A. Person", "B", "Guest", "New"])
+    np.testing.assert_array_equal(n_commits, [3, 2, 1, 1])
+    # in the reversed (chronological) history
+    np.testing.assert_array_equal(idx_first_commit, [1, 3, 0, 6])
+    assert stats["new_authors"] == ["New"]
+    assert stats["n_recent_authors"] == 1
+
+    # monthly series from the first commit to the current month, with months without commits
+    months = monthly_counts([], start="2024-01")[0]
+    for key, counts in [
+        ("authors_per_month", [2, 0, 2]),
+        ("new_authors_per_month", [2, 0, 1]),
+        ("multi_authors_per_month", [1, 0, 1]),
+    ]:
+        expected = np.zeros(len(months), dtype=int)
+        expected[:3] = counts
+        # 'New' in the current month
+        expected[-1] += key != "multi_authors_per_month"
+        np.testing.assert_array_equal(stats[key][0], months)
+        np.testing.assert_array_equal(stats[key][1], expected)
+
+
+def test_process_issues_PRs(tmp_path):
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%dT00:00:00Z")
+
+    def item(number, state, created, closed, labels):
+        if labels is not None:
+            labels = {"edges": [{"node": {"name": x}} for x in labels]}
+        return {
+            "node": {"number": number, "state": state, "createdAt": created, "closedAt": closed, "labels": labels}
+        }
+
+    # labels of closed items aren't synced, and the labels of an open item may not be yet
+    issues = [
+        item(1, "CLOSED", "2024-01-15T00:00:00Z", "2024-03-02T00:00:00Z", ["bug"]),
+        item(2, "OPEN", "2024-01-20T00:00:00Z", None, ["bug", "docs"]),
+        item(3, "OPEN", "2024-03-05T00:00:00Z", None, None),
+        item(4, "CLOSED", today, today, []),
+    ]
+    PRs = [
+        item(1, "MERGED", "2024-02-10T00:00:00Z", "2024-02-11T00:00:00Z", ["bug"]),
+        item(2, "OPEN", "2024-03-01T00:00:00Z", None, ["docs"]),
+    ]
+
+    Gits = GitMetrics("token", "owner", "repo", str(tmp_path))
+    stats = Gits.process_issues_PRs(
+        [issues, PRs], ["issues", "pullRequests"], ["bug", "docs", "help"]
+    )
+
+    assert (stats["issues"]["recent_open"], stats["issues"]["recent_close"]) == (1, 1)
+    assert (stats["pullRequests"]["recent_open"], stats["pullRequests"]["recent_close"]) == (0, 0)
+    assert stats["issues"]["label_open"] == {"bug": 1, "docs": 1, "help": 0}
+    assert stats["pullRequests"]["label_open"] == {"bug": 0, "docs": 1, "help": 0}
+
+    # issue and pull request series are aligned, from the first item opened to the current month
+    months = monthly_counts([], start="2024-01")[0]
+    for item_type, key, counts, current in [
+        ("issues", "open_per_month", [2, 0, 1], 1),
+        ("issues", "close_per_month", [0, 0, 1], 1),
+        ("pullRequests", "open_per_month", [0, 1, 1], 0),
+        ("pullRequests", "close_per_month", [0, 1, 0], 0),
+    ]:
+        expected = np.zeros(len(months), dtype=int)
+        expected[:3] = counts
+        expected[-1] += current
+        np.testing.assert_array_equal(stats[item_type][key][0], months)
+        np.testing.assert_array_equal(stats[item_type][key][1], expected)
+
+
+def test_monthly_counts():
+    dates, counts = monthly_counts([648, 651, 651], start="2023-12", end="2024-04")
+
+    np.testing.assert_array_equal(
+        dates, ["2023-12", "2024-01", "2024-02", "2024-03", "2024-04"]
+    )
+    np.testing.assert_array_equal(counts, [0, 1, 0, 0, 2])
+
+    # same output as filling the months missed by np.unique
+    x = np.array(["2024-01", "2024-04", "2024-04"])
+    filled = fill_missed_months(np.unique(x, return_counts=True))
+    expected = monthly_counts([648, 651, 651])
+    np.testing.assert_array_equal(filled[0], expected[0])
+    np.testing.assert_array_equal(filled[1], expected[1])
+
+
+def test_git_log_stream(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    git = ["git", "-C", str(repo), "-c", "user.email=a@x"]
+    subprocess.run(git[:3] + ["init", "-q"], check=True)
+    for ii, name in enumerate(["Doe, Jane", "Doe, Jane", "O'Neil, \"Bob\" B"]):
+        subprocess.run(
+            git + ["-c", f"user.name={name}", "commit", "-q", "--allow-empty", "-m", f"{ii}"],
+            check=True,
+        )
+
+    gits = GitMetrics("token", "owner", "repo", str(tmp_path))
+    batches = list(gits.stream_git_log(str(repo), batch_size=2))
+    assert [len(x["oid"]) for x in batches] == [2, 1]
+    np.testing.assert_array_equal(
+        batches[0]["author_name"], ["O'Neil, \"Bob\" B", "Doe, Jane"]
+    )
+
+    commits = gits.get_commits_via_git_log(str(repo), batch_size=2)
+    assert len(commits["author_name"]) == 3
+
+    # incremental run reads only the new commit
+    subprocess.run(
+        git + ["-c", "user.name=New", "commit", "-q", "--allow-empty", "-m", "3"],
+        check=True,
+    )
+    head = gits.cache.get_state("owner/repo@git", "git_log_head")
+    assert len(next(gits.stream_git_log(str(repo), last_hash=head))["oid"]) == 1
+    commits = gits.get_commits_via_git_log(str(repo))
+    assert commits["author_name"][0] == "New"
+    assert len(commits["author_name"]) == 4
+
+
+def test_collect_git_stats_git_log(tmp_path, monkeypatch):
+    repo = tmp_path / "clones" / "repo"
+    repo.mkdir(parents=True)
+    git = ["git", "-C", str(repo), "-c", "user.email=a@x"]
+    subprocess.run(git[:3] + ["init", "-q"], check=True)
+    for ii, name in enumerate(["Jane", "Bob", "Jane"]):
+        subprocess.run(
+            git + ["-c", f"user.name={name}", "commit", "-q", "--allow-empty", "-m", f"{ii}"],
+            check=True,
+        )
+
+    history = {
+        "commits": [commit_node("Remote", 1, "2024-01-01T00:00:00Z")],
+        "issues": [issue_PR_node(1, "2024-01-05T00:00:00Z", labels=["bug"])],
+        "pullRequests": [],
+    }
+    query_graphql, queries = fake_github({"owner/repo": history})
+    monkeypatch.setattr(GitMetrics, "query_graphql", lambda self, query, variables: query_graphql(query, variables))
+
+    with pytest.raises(ValueError, match="repo_dir"):
+        collect_git_stats(["owner/repo"], "token", str(tmp_path), ["bug"], commit_source="git")
+
+    for batch_queries in [True, False]:
+        cache_dir = tmp_path / str(batch_queries)
+        cache_dir.mkdir()
+        queries.clear()
+        repo_stats, _ = collect_git_stats(
+            ["owner/repo"],
+            "token",
+            str(cache_dir),
+            ["bug"],
+            batch_queries=batch_queries,
+            commit_source="git",
+            repo_dir=str(tmp_path / "clones"),
+        )
+        # commits are read from the local copy, and only issues and pull requests are queried
+        assert not any(
+            vv["include_commits"] if "include_commits" in vv else "history(" in qq for qq, vv in queries
+        )
+        assert any("issues(" in qq for qq, _ in queries)
+        np.testing.assert_array_equal(repo_stats["owner/repo"]["unique_authors"][0], ["Bob", "Jane"])
+        np.testing.assert_array_equal(repo_stats["owner/repo"]["unique_authors"][2], [1, 2])
+        assert repo_stats["owner/repo"]["n_recent_authors"] == 2
+        assert repo_stats["owner/repo"]["issues"]["label_open"] == {"bug": 1}
+
+
+def test_plot_figure_reuse(tmp_path):
+    stats = {
+        "issues": {"label_open": {"units": 3, "time": 1}},
+        "pullRequests": {"label_open": {"units": 1, "time": 0}},
+    }
+    fig = open_issue_PR_plot(stats, "repo", str(tmp_path))
+    # redrawn into the same figure, rather than adding axes
+    assert open_issue_PR_plot(stats, "repo", str(tmp_path), fig=fig) is fig
+    assert len(fig.axes) == 1
+    # not retained by pyplot
+    assert plt.get_fignums() == []
+    assert (tmp_path / "repo_open_items.png").exists()
+
+
+def test_ordered_map():
+    drawn = []
+
+    def items():
+        for x in range(10):
+            drawn.append(x)
+            yield x
+
+    def double(x):
+        if x == 7:
+            raise ValueError("failed call")
+        return 2 * x
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = ordered_map(pool, double, items(), 2)
+        assert next(results) == 0
+        # with a result consumed, at most 2 more calls are submitted
+        assert drawn == [0, 1, 2]
+        assert [next(results) for _ in range(6)] == [2, 4, 6, 8, 10, 12]
+        with pytest.raises(ValueError, match="failed call"):
+            next(results)
+        # calls after the failure that weren't submitted never are
+        assert drawn == list(range(9))
+
+
+def test_content_hash():
+    stats = {"a": np.arange(3), "b": {"units": 2.0}, "c": (np.array(["x", "y"]), [1])}
+
+    # independent of dict order
+    assert content_hash({"b": stats["b"], "c": stats["c"], "a": stats["a"]}) == content_hash(stats)
+    assert content_hash(stats) != content_hash({**stats, "a": np.arange(1, 4)})
+    assert content_hash(stats) != content_hash({**stats, "a": np.arange(3.0)})
+    assert content_hash(["ab", "c"]) != content_hash(["a", "bc"])
+
+
+def write_sizes(savename, sizes):
+    for ff in [f"{savename}.png"] + [f"{savename}_{x}.png" for x in sizes]:
+        with open(ff, "w") as f:
+            f.write("image")
+
+
+def test_render_outputs(tmp_path):
+    savename = str(tmp_path / "image")
+    manifest_file = str(tmp_path / "manifest.json")
+
+    def jobs(sizes):
+        outputs = [f"{savename}_{x}.png" for x in sizes]
+        return {f"{savename}.png": (write_sizes, (savename, sizes), [], outputs)}
+
+    assert render_outputs(jobs(["2x"]), 1, manifest_file) == [f"{savename}.png"]
+    assert render_outputs(jobs(["2x"]), 1, manifest_file) == []
+    # a file the job writes is missing
+    os.remove(f"{savename}_2x.png")
+    assert render_outputs(jobs(["2x"]), 1, manifest_file) == [f"{savename}.png"]
+    # the configured sizes changed
+    assert render_outputs(jobs(["2x", "thumbnail"]), 1, manifest_file) == [f"{savename}.png"]
+    assert os.path.exists(f"{savename}_thumbnail.png")
+
+
+def test_render_outputs_pool(tmp_path):
+    # jobs are module-level functions, so they can be sent to worker processes
+    savenames = [str(tmp_path / f"image{ii}") for ii in range(3)]
+    jobs = {
+        f"{x}.png": (write_sizes, (x, ["2x"]), [], [f"{x}_2x.png"]) for x in savenames
+    }
+    manifest_file = str(tmp_path / "manifest.json")
+
+    assert render_outputs(jobs, 2, manifest_file) == list(jobs)
+    assert all(os.path.exists(f"{x}_2x.png") for x in savenames)
+    with open(manifest_file) as f:
+        assert list(json.load(f)) == list(jobs)
+    assert render_outputs(jobs, 2, manifest_file) == []
+
+
+def test_fit_text():
+    template = os.path.join(os.path.dirname(__file__), "..", "dashboard_template")
+    image = StatsImage(
+        f"{template}/user_stats_template_dark.png", f"{template}/Jost[wght].ttf"
+    )
+    text = ", ".join(f"Contributor {ii}" for ii in range(40))
+    max_bbox = (70, 113, 1100, 320)
+
+    text_wrap, font = image.fit_text((70, 100), text, max_bbox)
+    assert all(x <= y for x, y in zip(image.draw.textbbox((70, 100), text_wrap, font=font), max_bbox))
+    # the largest size that fits
+    larger = load_font(image.font, font.size + 1)
+    assert any(x > y for x, y in zip(image.draw.textbbox((70, 100), text_wrap, font=larger), max_bbox))
+
+
+def test_dashboard_layout(tmp_path):
+    template = os.path.join(os.path.dirname(__file__), "..", "dashboard_template")
+    stats = {
+        "n_recent_authors": 12,
+        "age_recent_commit": 90,
+        "new_authors": ["b", "A"],
+        "issues": {"age_recent": 90, "recent_close": 3, "recent_open": 4},
+        "pullRequests": {"recent_close": 5, "recent_open": 6},
+        "aggregate": {"cite_month": 7, "cite_year": 80, "cite_all": 900},
+    }
+
+    images = [
+        StatsImage(f"{template}/user_stats_template_{x}.png", f"{template}/Jost[wght].ttf")
+        for x in ["dark", "light"]
+    ]
+    layout = images[0].layout(stats, "repo")
+    assert layout[2]["text"] == "A, b"
+
+    for image in images:
+        img = image.update_image(None, "repo", str(tmp_path), layout, sizes={"2x": 2})
+        img_2x = Image.open(tmp_path / f"repo_user_stats_{image.theme}_2x.png")
+        assert img_2x.size == (2 * img.width, 2 * img.height)
+
+
+def test_transparent_image():
+    pixels = np.zeros((2, 3, 3), dtype=np.uint8)
+    pixels[0, 1] = (5, 0, 3)
+    pixels[1, 2] = (200, 10, 10)
+    image = Image.fromarray(pixels, "RGB")
+
+    alpha = np.asarray(transparent_image(image))[..., 3]
+    np.testing.assert_array_equal(alpha, [[0, 255, 0], [0, 0, 255]])
+
+    rgba = np.asarray(transparent_image(image, tolerance=5))
+    np.testing.assert_array_equal(rgba[..., 3], [[0, 0, 0], [0, 0, 255]])
+    np.testing.assert_array_equal(rgba[0, 1], [255, 255, 255, 0])
+
+
+def test_tracer(tmp_path):
+    @traced("process", detail="item_type")
+    def work(item_type):
+        return item_type * 2
+
+    # not recorded until enabled (spans of an earlier run are kept until the next is enabled)
+    n_spans = len(tracer.spans)
+    assert work("issues") == "issuesissues"
+    assert len(tracer.spans) == n_spans
+
+    tracer.enable()
+    try:
+        work("issues")
+        work("issues")
+        with tracer.span("fetch", "fetch", n_items=3) as args:
+            args["n_pages"] = 1
+        tracer.record("github", {"n_requests": 4, "bytes": 10})
+        tracer.record("github", {"n_requests": 5})
+        tracer.add_span("figure.png", "render", tracer.start, 0.5, pid=1, tid=1)
+
+        report = tracer.report()
+        tracer.write_chrome_trace(tmp_path / "trace.json")
+    finally:
+        tracer.disable()
+
+    stages = report["stages"]
+    assert list(stages) == ["figure.png", "test_tracer.<locals>.work(issues)", "fetch"]
+    assert stages["test_tracer.<locals>.work(issues)"]["count"] == 2
+    assert stages["figure.png"]["total"] == 0.5
+    assert report["spans"][-1]["args"] == {"n_items": 3, "n_pages": 1}
+    assert report["metrics"] == {"github": {"n_requests": 5, "bytes": 10}}
+    assert report["peak_rss"]["self"] > 0
+
+    events = json.load(open(tmp_path / "trace.json"))["traceEvents"]
+    assert len(events) == 4
+    assert all(x["ph"] == "X" for x in events)
+    assert events[-1]["ts"] == 0 and events[-1]["dur"] == 0.5e6